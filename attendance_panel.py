@@ -0,0 +1,84 @@
+import tkinter as tk
+from tkinter import ttk
+
+
+class AttendancePanel(tk.Frame):
+    """
+    Liste des présences paginée : seules `page_size` lignes existent dans le Treeview,
+    quel que soit le nombre d'étudiants marqués. En mode suivi (dernière page affichée),
+    les nouvelles lignes s'ajoutent en bout de page et la page avance automatiquement.
+    """
+
+    def __init__(self, master, page_size: int = 50, **kwargs):
+        super().__init__(master, **kwargs)
+        self.page_size = page_size
+        self.rows = []  # [(id, name, time)] : toutes les présences de la session
+        self.page = 0
+
+        self.tv = ttk.Treeview(self, columns=("Name","Time"), show="tree headings", height=page_size)
+        self.tv.heading('#0', text='ID')
+        self.tv.heading('Name', text='Name')
+        self.tv.heading('Time', text='First Seen')
+        self.tv.column('#0', width=80)
+        self.tv.column('Name', width=120)
+        self.tv.column('Time', width=120)
+        self.tv.pack(expand=True, fill="both")
+
+        nav = tk.Frame(self)
+        nav.pack(fill="x")
+        tk.Button(nav, text="<", width=3, command=self.prev_page).pack(side="left")
+        self.page_lbl = tk.Label(nav, text="")
+        self.page_lbl.pack(side="left", expand=True)
+        tk.Button(nav, text=">", width=3, command=self.next_page).pack(side="right")
+        self._update_page_label()
+
+    def _last_page(self) -> int:
+        return max(0, (len(self.rows) - 1) // self.page_size)
+
+    def _update_page_label(self):
+        self.page_lbl.config(
+            text=f"Page {self.page + 1}/{self._last_page() + 1} – {len(self.rows)} present"
+        )
+
+    def _render(self):
+        self.tv.delete(*self.tv.get_children())
+        start = self.page * self.page_size
+        for id_str, name_str, tstamp in self.rows[start:start + self.page_size]:
+            self.tv.insert("", "end", text=id_str, values=(name_str, tstamp))
+        self._update_page_label()
+
+    def clear(self):
+        self.rows = []
+        self.page = 0
+        self._render()
+
+    def add_rows(self, rows):
+        """
+        Ajoute un lot de lignes. Le coût Tk est borné par page_size, pas par le nombre total.
+        """
+        if not rows:
+            return
+        following = self.page == self._last_page()
+        first_new = len(self.rows)
+        self.rows.extend(rows)
+        if not following:
+            self._update_page_label()
+            return
+        if self._last_page() != self.page:
+            # La page courante a débordé : afficher la dernière page
+            self.page = self._last_page()
+            self._render()
+            return
+        for id_str, name_str, tstamp in self.rows[first_new:]:
+            self.tv.insert("", "end", text=id_str, values=(name_str, tstamp))
+        self._update_page_label()
+
+    def prev_page(self):
+        if self.page > 0:
+            self.page -= 1
+            self._render()
+
+    def next_page(self):
+        if self.page < self._last_page():
+            self.page += 1
+            self._render()
@@ -1,162 +1,351 @@
-import os, csv, cv2, time, datetime
-import pandas as pd
-import tkinter as tk
-from tkinter import messagebox
-from tkinter import ttk
+import os, json, time, datetime
+
+import diagnostics
+from startup_profile import lazy_import
+from ui_bridge import UIUpdateQueue
+from preview import PreviewBuffer
+from face_preprocessing import FacePreprocessor
+from face_quality import FaceQualityGate, format_skips
+from recognition_context import RecognitionContext
+from attendance_store import AttendanceStore
+from gallery_manager import GalleryManager
+from recognition_log import EventLogWriter, NO_SERIAL, NO_CONF
+from presence_timeline import PresenceTimeline
+from tiled_detection import TiledDetector
+
+# Modules lourds importés au premier usage (prise d'appel)
+cv2 = lazy_import("cv2")
 
 class AttendanceRecorder:
     """
     Gère la prise d’appel automatique pendant une durée paramétrée (par défaut 60s),
     la reconnaissance LBPH et la sauvegarde dans un CSV daily.
     Ne marque “présent” qu’après MIN_PRESENT_SECONDS depuis la première détection.
+    Chaque étudiant reconnu a une PresenceTimeline (plages à la seconde, écarts de moins de
+    PRESENCE_GAP_SECONDS fusionnés) : la durée enregistrée est le temps réellement vu,
+    et l'heure de départ sert à repérer les départs anticipés.
+    Les visages passent par le même FacePreprocessor que FaceTrainer avant predict ;
+    ceux refusés par le FaceQualityGate (flous, mal exposés, trop petits) ne sont pas reconnus.
+    Modèle, détails, détecteur et caméra viennent d'un RecognitionContext résident.
+    Les présences sont écrites dans un AttendanceStore (SQLite) ; le CSV journalier
+    est régénéré à la fin de chaque session pour compatibilité.
+    Si un roster est fourni, les visages sont d'abord comparés à la galerie du cours,
+    puis au modèle complet seulement s'ils n'y sont pas reconnus.
+    Chaque prédiction est journalisée (attendance_dir/events/*.evlog, voir recognition_log)
+    pour pouvoir réévaluer la règle de présence hors ligne avec d'autres seuils.
     """
 
-    def __init__(self, haar_path: str, model_path: str, details_csv: str):
+    CONFIDENCE_THRESHOLD = 70  # distance LBPH par défaut en dessous de laquelle un visage est reconnu
+    MODEL_CHECK_SECONDS = 5    # intervalle de vérification de Trainer.yml / StudentDetails.csv sur disque
+    PRESENCE_GAP_SECONDS = 30  # absence de reconnaissance tolérée sans couper la présence
+
+    def __init__(self, haar_path: str, model_path: str, details_csv: str,
+                 preprocessor: FacePreprocessor = None, context: RecognitionContext = None,
+                 store: AttendanceStore = None, attendance_dir: str = "Attendance",
+                 galleries: GalleryManager = None, event_log: bool = True,
+                 quality: FaceQualityGate = None, threshold: float = None, schedule=None):
+        """
+        threshold: distance LBPH de reconnaissance ("threshold" de la section "recognition",
+        choisi avec lbph_sweep.py) ; CONFIDENCE_THRESHOLD par défaut.
+        schedule: ScheduleManager, pour rattacher aux cours les CSV historiques importés.
+        """
         self.haar_path = haar_path
         self.model_path = model_path
         self.details_csv = details_csv
+        self.preprocessor = preprocessor or FacePreprocessor()
+        self.quality = quality or FaceQualityGate()
+        self.threshold = self.CONFIDENCE_THRESHOLD if threshold is None else float(threshold)
+        self.context = context or RecognitionContext(haar_path, model_path, details_csv)
+        self.attendance_dir = attendance_dir
+        self._store = store
+        self.galleries = galleries
+        self.event_log = event_log
+        self.schedule = schedule
+        self._tiled_detectors = {}  # { config JSON: TiledDetector }, réutilisés entre sessions
         os.makedirs(os.path.dirname(self.details_csv), exist_ok=True)
 
-    def check_haarcascade(self) -> bool:
+    @property
+    def store(self) -> AttendanceStore:
+        # Ouvert au premier usage (pas de SQLite au démarrage de l'application)
+        if self._store is None:
+            self._store = AttendanceStore(os.path.join(self.attendance_dir, "attendance.db"))
+        return self._store
+
+    def check_haarcascade(self, ui: UIUpdateQueue) -> bool:
         if not os.path.isfile(self.haar_path):
-            messagebox.showerror(
+            ui.error(
                 "Missing File",
                 f"{self.haar_path} not found."
             )
             return False
         return True
 
-    def record_attendance(self, treeview: ttk.Treeview, status_label: tk.Label, duration: float = 60):
+    def record_attendance(self, ui: UIUpdateQueue, duration: float = 60,
+                          camera_index: int = 0, stop_event=None, session_name: str = "",
+                          room: str = "", scheduled_start: str = None, roster=None,
+                          preview: PreviewBuffer = None, tiling: dict = None):
         """
-        Lance la session de reconnaissance faciale pendant `duration` secondes.
-        Affiche les ID reconnus dans le Treeview et écrit dans Attendance/YYYY-MM-DD.csv
+        Lance la session de reconnaissance faciale pendant `duration` secondes
+        (ou jusqu'à ce que `stop_event` soit positionné) sur la caméra `camera_index`.
+        Publie les ID reconnus dans `ui` (jamais d'appel Tk depuis ce thread) et les enregistre dans le store
         seulement si chaque étudiant est détecté au moins MIN_PRESENT_SECONDS.
+        `scheduled_start` ("HH:MM:SS") est l'heure de début prévue par le planning.
+        `roster` (ensemble d'ID) restreint la reconnaissance à la galerie du cours.
+        `preview` reçoit, à cadence plafonnée, la frame et les overlays à afficher.
+        `tiling` (section "tiled_detection" de la salle) active la détection par tuiles.
+        Si le profilage "record" est actif (voir diagnostics), la session est profilée.
         """
-        if not self.check_haarcascade():
+        prof = diagnostics.start("record", session_name or room)
+        try:
+            self._record_session(ui, duration, camera_index, stop_event, session_name,
+                                 room, scheduled_start, roster, preview, tiling, prof)
+        finally:
+            folder = prof.finish()
+            if folder:
+                ui.status(f"Profile saved to {folder}", "black")
+
+    def _tiled_detector(self, tiling: dict) -> TiledDetector:
+        key = json.dumps(tiling, sort_keys=True)
+        if key not in self._tiled_detectors:
+            self._tiled_detectors[key] = TiledDetector.from_config(self.haar_path, tiling)
+        return self._tiled_detectors[key]
+
+    def _record_session(self, ui, duration, camera_index, stop_event, session_name,
+                        room, scheduled_start, roster, preview, tiling, prof):
+        if not self.check_haarcascade(ui):
             return
 
         if not os.path.isfile(self.model_path):
-            messagebox.showerror("Error", "Training data missing", parent=status_label)
+            ui.error("Error", "Training data missing")
             return
 
-        # Charger recognizer LBPH
+        # Contexte résident : ne recharge que si Trainer.yml / StudentDetails.csv ont changé
+        ctx = self.context
         try:
-            recognizer = cv2.face.LBPHFaceRecognizer_create()
-        except AttributeError:
+            ctx.ensure_loaded()
+        except (FileNotFoundError, ValueError):
+            ui.error("Error", "Cannot load StudentDetails.csv")
+            return
+        except Exception as e:
+            ui.error("Error", str(e))
+            return
+        recognizer = ctx.recognizer
+        # Grandes salles : détection par tuiles en parallèle, même interface que le Haarcascade
+        detector = self._tiled_detector(tiling) if tiling else ctx.detector
+        # Par tuiles, le seuil de taille du filtre qualité suit la plus petite taille détectée
+        # (même rapport que min_size aux 100 px du détecteur plein cadre)
+        quality_min_size = None
+        if tiling:
+            quality_min_size = int(min(detector.min_sizes) * self.quality.min_size / 100)
+        # Galerie du cours (None => modèle complet uniquement)
+        gallery = None
+        if roster and self.galleries is not None:
             try:
-                recognizer = cv2.createLBPHFaceRecognizer()
-            except Exception as e:
-                messagebox.showerror("Error", str(e), parent=status_label)
-                return
-        recognizer.read(self.model_path)
+                gallery = self.galleries.get_gallery(session_name, roster)
+            except Exception:
+                gallery = None
+        gallery_hits = fallback_hits = 0
+        faces_total = 0
+        quality_skips = {}  # { motif: nombre de visages non soumis au predict }
+        model_swaps = 0
+        next_model_check = time.monotonic() + self.MODEL_CHECK_SECONDS
 
-        # Charger les détails étudiants
-        try:
-            df = pd.read_csv(self.details_csv)
-        except Exception:
-            messagebox.showerror("Error", "Cannot load StudentDetails.csv", parent=status_label)
+        # Caméra partagée (FrameGrabber) : abonnement à la dernière frame, horodatée à la capture
+        camera = ctx.acquire_camera(camera_index)
+        if camera is None:
+            ui.error("Error", "Unable to open camera")
             return
+        cam = camera.subscribe(f"attendance:{room or camera_index}")
 
-        detector = cv2.CascadeClassifier(self.haar_path)
-        cam = cv2.VideoCapture(0)
-        if not cam.isOpened():
-            messagebox.showerror("Error", "Unable to open camera", parent=status_label)
-            return
+        # Nécessaires à la clôture, y compris si la session échoue en cours de route
+        session_id = log = None
+        timelines = {}         # { id_str: PresenceTimeline }
+        marked_present = set() # IDs déjà marqués présent
+        try:
+            today = datetime.date.today().strftime("%Y-%m-%d")
+            os.makedirs(self.attendance_dir, exist_ok=True)
+            attendance_file = os.path.join(self.attendance_dir, f"Attendance_{today}.csv")
 
-        font = cv2.FONT_HERSHEY_SIMPLEX
-        today = datetime.date.today().strftime("%Y-%m-%d")
-        attendance_dir = "Attendance"
-        os.makedirs(attendance_dir, exist_ok=True)
-        attendance_file = f"{attendance_dir}/Attendance_{today}.csv"
+            # Reprendre un CSV du jour écrit avant le passage au store (sans effet s'il est connu)
+            store = self.store
+            if os.path.isfile(attendance_file):
+                try:
+                    store.import_csv(attendance_file, self.schedule)
+                except Exception as e:
+                    # Fichier historique illisible : on le signale sans bloquer la prise d'appel
+                    ui.error("Import Error", f"Cannot import {attendance_file}: {e}")
+            # Origine des timelines = started_at de la session en base (à la seconde)
+            session_started = datetime.datetime.now().replace(microsecond=0)
+            session_id = store.open_session(today, session_name, room, scheduled_start, session_started)
+            origin = session_started.timestamp()
+            prof.mark("session_open")
 
-        # Créer le CSV avec header si nouveau
-        if not os.path.isfile(attendance_file):
-            with open(attendance_file, "w", newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow(["ID","NAME","DATE","TIME"])
+            MIN_PRESENT_SECONDS = 10  # seuil minimal avant de marquer présent
 
-        # Vider Treeview
-        for itm in treeview.get_children():
-            treeview.delete(itm)
+            if self.event_log:
+                log = EventLogWriter(os.path.join(self.attendance_dir, "events"), session_id, {
+                    "date": today, "session_name": session_name, "room": room,
+                    "scheduled_start": scheduled_start, "camera": camera_index,
+                    "threshold": self.threshold, "min_present_seconds": MIN_PRESENT_SECONDS,
+                    "presence_gap_seconds": self.PRESENCE_GAP_SECONDS,
+                    "gallery": gallery is not None
+                }, started_at=origin)
 
-        # Structures pour logique de seuil
-        presence_times = {}    # { id_str: datetime_of_first_detection }
-        marked_present = set() # IDs déjà marqués présent
+            # Vider la liste des présences
+            ui.clear_attendance()
 
-        start_time = time.time()
-        status_label.config(text="Recording attendance...", fg="black")
+            # Structures pour logique de seuil
+            presence_times = {}    # { id_str: datetime_of_first_detection }
 
-        MIN_PRESENT_SECONDS = 10  # seuil minimal avant de marquer présent
+            start_time = time.time()
+            ui.status("Recording attendance...", "black")
 
-        while True:
-            elapsed = time.time() - start_time
-            if elapsed >= duration:
-                break
+            while True:
+                elapsed = time.time() - start_time
+                if elapsed >= duration:
+                    break
+                if stop_event is not None and stop_event.is_set():
+                    break
 
-            ret, frame = cam.read()
-            if not ret:
-                continue
-            gray_full = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            faces = detector.detectMultiScale(
-                gray_full, scaleFactor=1.1, minNeighbors=6, minSize=(100,100)
-            )
+                # Bascule à chaud, entre deux frames, sur un modèle réentraîné. TrainingJob le
+                # charge lui-même dans le contexte ; la vérification périodique (un stat) couvre
+                # les écritures externes, lues en arrière-plan : la boucle ne parse jamais
+                # Trainer.yml. Caméra et présences en cours sont conservées ; la galerie
+                # reste valide (mêmes SERIAL NO.), les nouveaux inscrits passent par le repli.
+                if time.monotonic() >= next_model_check:
+                    next_model_check = time.monotonic() + self.MODEL_CHECK_SECONDS
+                    if ctx.model_stale():
+                        ctx.reload_async()
+                if ctx.recognizer is not recognizer:
+                    recognizer = ctx.recognizer
+                    model_swaps += 1
+                    prof.mark("model_swap")
+
+                t_read = time.perf_counter()
+                frame, captured_at = cam.read_latest(timeout=0.5)
+                if frame is None:
+                    continue
+                t_detect = time.perf_counter()
+                gray_full = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                faces = detector.detectMultiScale(
+                    gray_full, scaleFactor=1.1, minNeighbors=6, minSize=(100,100)
+                )
+                t_recognize = time.perf_counter()
 
-            now = datetime.datetime.now()
+                # Heure de capture (et non de traitement) : first_seen ne dérive pas si on prend du retard
+                now = datetime.datetime.fromtimestamp(captured_at)
+                # Overlays collectés uniquement pour les frames réellement affichées
+                show = preview is not None and preview.due()
+                overlays = []
 
-            for (x, y, w, h) in faces:
-                face_roi = gray_full[y:y+h, x:x+w]
-                sid, conf = recognizer.predict(face_roi)
-                # Ajustez threshold de confiance si besoin
-                if conf < 70:
-                    # Visage reconnu
-                    row = df[df["SERIAL NO."] == sid]
-                    if row.empty:
+                tracks = log.tracker.assign(faces) if log is not None else None
+                skipped = 0
+                for i, (x, y, w, h) in enumerate(faces):
+                    raw_roi = gray_full[y:y+h, x:x+w]
+                    reason = self.quality.check(raw_roi, quality_min_size)
+                    if reason is not None:
+                        # Crop inexploitable : un predict dessus ne produirait que du bruit
+                        quality_skips[reason] = quality_skips.get(reason, 0) + 1
+                        skipped += 1
+                        if show:
+                            overlays.append(((x, y, w, h), reason, (0,165,255)))
                         continue
-                    row0 = row.iloc[0]
-                    id_str, name_str = row0["ID"], row0["NAME"]
+                    face_roi = self.preprocessor.prepare(raw_roi)
+                    g_sid, g_conf = NO_SERIAL, NO_CONF
+                    f_sid, f_conf = NO_SERIAL, NO_CONF
+                    if gallery is not None:
+                        sid, conf = g_sid, g_conf = gallery.predict(face_roi)
+                        if conf < self.threshold:
+                            gallery_hits += 1
+                        else:
+                            # Visage hors roster : repli sur le modèle complet
+                            sid, conf = f_sid, f_conf = recognizer.predict(face_roi)
+                            if conf < self.threshold:
+                                fallback_hits += 1
+                    else:
+                        sid, conf = f_sid, f_conf = recognizer.predict(face_roi)
+                    if log is not None:
+                        log.write(captured_at, tracks[i], g_sid, g_conf, f_sid, f_conf)
+                    if conf < self.threshold:
+                        # Visage reconnu
+                        student = ctx.lookup(sid)
+                        if student is None:
+                            continue
+                        id_str, name_str = student
+
+                        if show:
+                            overlays.append(((x, y, w, h), name_str, (0,255,0)))
 
-                    # Dessiner rectangle vert + nom
-                    cv2.rectangle(frame, (x, y), (x+w, y+h), (0,255,0), 2)
-                    cv2.putText(frame, name_str, (x, y+h+25),
-                                font, 0.8, (0,255,0), 2, cv2.LINE_AA)
+                        timeline = timelines.get(id_str)
+                        if timeline is None:
+                            timeline = timelines[id_str] = PresenceTimeline(origin, self.PRESENCE_GAP_SECONDS)
+                        timeline.mark(captured_at)
 
-                    # Si première détection pour cet ID, mémoriser heure
-                    if id_str not in presence_times:
-                        presence_times[id_str] = now
+                        # Si première détection pour cet ID, mémoriser heure
+                        if id_str not in presence_times:
+                            presence_times[id_str] = now
+                        else:
+                            first_seen = presence_times[id_str]
+                            seconds_seen = (now - first_seen).total_seconds()
+                            if seconds_seen >= MIN_PRESENT_SECONDS and id_str not in marked_present:
+                                # Marquer présent
+                                tstamp = first_seen.strftime("%H:%M:%S")
+                                store.add_mark(session_id, id_str, name_str, first_seen)
+                                ui.add_mark(id_str, name_str, tstamp)
+                                marked_present.add(id_str)
                     else:
-                        first_seen = presence_times[id_str]
-                        seconds_seen = (now - first_seen).total_seconds()
-                        if seconds_seen >= MIN_PRESENT_SECONDS and id_str not in marked_present:
-                            # Marquer présent
-                            tstamp = first_seen.strftime("%H:%M:%S")
-                            with open(attendance_file, "a", newline='') as f:
-                                writer = csv.writer(f)
-                                writer.writerow([id_str, name_str, today, tstamp])
-                            treeview.insert("", "end", text=id_str, values=(name_str, tstamp))
-                            marked_present.add(id_str)
-                else:
-                    # Visage non reconnu
-                    cv2.rectangle(frame, (x, y), (x+w, y+h), (0,0,255), 2)
-                    cv2.putText(frame, "Unknown", (x, y+h+25),
-                                font, 0.8, (0,0,255), 2, cv2.LINE_AA)
-
-            cv2.imshow("Taking Attendance", frame)
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
-
-        cam.release()
-        cv2.destroyAllWindows()
-
-        # Écrire résumé des durées pour ceux marqués présent
-        stop_time = datetime.datetime.now()
-        with open(attendance_file, "a", newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow([])
-            writer.writerow(["ID","DURATION_SECONDS"])
-            for id_str in marked_present:
-                first_seen = presence_times.get(id_str)
-                if first_seen:
-                    secs = int((stop_time - first_seen).total_seconds())
-                    writer.writerow([id_str, secs])
-
-        status_label.config(text="Attendance recorded", fg="green")
+                        # Visage non reconnu
+                        if show:
+                            overlays.append(((x, y, w, h), "Unknown", (0,0,255)))
+
+                if show:
+                    preview.publish(frame, overlays)
+                t_end = time.perf_counter()
+                cam.note_decision(captured_at)
+                prof.frame(
+                    read_ms=(t_detect - t_read) * 1000,
+                    detect_ms=(t_recognize - t_detect) * 1000,
+                    recognize_ms=(t_end - t_recognize) * 1000,
+                    latency_ms=(time.time() - captured_at) * 1000,
+                    faces=len(faces),
+                    quality_skipped=skipped
+                )
+                faces_total += len(faces)
+        finally:
+            # Toujours libérer l'abonnement caméra et clore journal et session, même sur erreur :
+            # sinon la caméra reste lue, le .evlog est tronqué et ended_at reste NULL
+            prof.mark("capture_loop_end")
+            # La caméra reste ouverte dans le contexte (lue seulement s'il reste des abonnés)
+            latency = cam.latency_stats()
+            cam.close()
+            if preview is not None:
+                preview.end()
+
+            # Clôturer la session avec les durées réellement vues de ceux marqués présent
+            stop_time = datetime.datetime.now()
+            if log is not None:
+                log.close(stop_time.timestamp())
+            if session_id is not None:
+                durations, presence = {}, {}
+                for id_str in marked_present:
+                    timeline = timelines.get(id_str)
+                    if timeline:
+                        durations[id_str] = timeline.seen_seconds()
+                        presence[id_str] = (datetime.datetime.fromtimestamp(timeline.last_seen()),
+                                            timeline.to_bytes())
+                store.close_session(session_id, stop_time, durations, presence)
+
+        # Export CSV au format historique
+        store.export_day_csv(today, attendance_file)
+
+        status = "Attendance recorded"
+        if gallery is not None:
+            status += f" (gallery: {gallery_hits}, fallback: {fallback_hits})"
+        skips = format_skips(quality_skips, faces_total)
+        if skips:
+            status += f" – {skips}"
+        if model_swaps:
+            status += f" – model reloaded {model_swaps}x"
+        if "p95_ms" in latency:
+            status += f" – latency p50 {latency['p50_ms']:.0f} ms, p95 {latency['p95_ms']:.0f} ms"
+        ui.status(status, "green")
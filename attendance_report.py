@@ -0,0 +1,71 @@
+import argparse
+import datetime
+import time
+
+from attendance_store import AttendanceStore
+
+
+def scheduled_meetings(schedule_csv: str, start_month: str, end_month: str) -> dict:
+    """
+    Nombre de cours prévus par SessionName entre deux mois (inclus), d'après le planning hebdomadaire.
+    """
+    from schedule_manager import ScheduleManager
+
+    mgr = ScheduleManager()
+    mgr.load_from_csv(schedule_csv)
+    day = datetime.datetime.strptime(start_month, "%Y-%m").date()
+    end_year, end_mon = (int(x) for x in end_month.split("-"))
+    end = datetime.date(end_year + end_mon // 12, end_mon % 12 + 1, 1)
+    counts = {}
+    while day < end:
+        for sess in mgr.index.sessions_for(day.weekday()):
+            counts[sess['SessionName']] = counts.get(sess['SessionName'], 0) + 1
+        day += datetime.timedelta(days=1)
+    return counts
+
+
+def _fmt_duration(seconds) -> str:
+    seconds = int(seconds or 0)
+    return f"{seconds // 3600}h{(seconds % 3600) // 60:02d}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rapport de présence (agrégats incrémentaux).")
+    parser.add_argument("--db", default="Attendance/attendance.db")
+    parser.add_argument("--from", dest="start", help="premier mois YYYY-MM")
+    parser.add_argument("--to", dest="end", help="dernier mois YYYY-MM")
+    parser.add_argument("--student", help="détail pour un seul ID étudiant")
+    parser.add_argument("--schedule", help="CSV de planning, pour comparer cours tenus et prévus")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    store = AttendanceStore(args.db)
+    courses = store.course_summary(args.start, args.end)
+    students = store.student_summary(args.start, args.end, args.student)
+    elapsed = time.perf_counter() - t0
+    planned = {}
+    if args.schedule and args.start and args.end:
+        planned = scheduled_meetings(args.schedule, args.start, args.end)
+
+    period = f"{args.start or '…'} → {args.end or '…'}"
+    print(f"Courses ({period})")
+    print(f"{'course':<28}{'held':>6}{'planned':>9}{'students':>10}{'rate':>8}{'late':>6}{'left':>6}{'presence':>10}")
+    for c in courses:
+        plan = planned.get(c["session_name"], "")
+        print(f"{c['session_name']:<28}{c['meetings']:>6}{plan:>9}{c['students']:>10}"
+              f"{c['attendance_rate']:>8.0%}{c['late']:>6}{c['left_early']:>6}{_fmt_duration(c['total_seconds']):>10}")
+
+    print()
+    print(f"Students ({period})")
+    print(f"{'ID':<10}{'name':<20}{'course':<28}{'attended':>9}{'rate':>8}{'late':>6}{'left':>6}{'presence':>10}")
+    for r in students:
+        print(f"{r['student_id']:<10}{r['name'][:19]:<20}{r['session_name']:<28}"
+              f"{r['attended']:>5}/{r['meetings']:<3}{r['attendance_rate']:>8.0%}{r['late']:>6}{r['left_early']:>6}"
+              f"{_fmt_duration(r['total_seconds']):>10}")
+
+    print(f"\nReport computed in {elapsed*1000:.1f} ms")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
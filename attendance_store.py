@@ -0,0 +1,617 @@
+import os, csv, re, sqlite3, threading, datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    date            TEXT NOT NULL,          -- YYYY-MM-DD
+    session_name    TEXT NOT NULL DEFAULT '',
+    room            TEXT NOT NULL DEFAULT '',
+    scheduled_start TEXT,                   -- HH:MM:SS (planning), NULL si inconnu
+    started_at      TEXT NOT NULL,          -- YYYY-MM-DD HH:MM:SS
+    ended_at        TEXT                    -- NULL tant que la session est ouverte
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_date ON sessions(date);
+
+CREATE TABLE IF NOT EXISTS marks (
+    session_id       INTEGER NOT NULL REFERENCES sessions(id),
+    student_id       TEXT NOT NULL,
+    name             TEXT NOT NULL,
+    date             TEXT NOT NULL,
+    first_seen       TEXT NOT NULL,         -- YYYY-MM-DD HH:MM:SS
+    duration_seconds INTEGER,               -- rempli à la clôture de la session
+    last_seen        TEXT,                  -- dernière reconnaissance (clôture)
+    late_seconds     INTEGER,               -- retard sur scheduled_start, NULL si inconnu
+    left_early_seconds INTEGER,             -- départ avant la fin de session (clôture)
+    timeline         BLOB,                  -- PresenceTimeline.to_bytes(), origine = sessions.started_at
+    PRIMARY KEY (session_id, student_id)
+);
+CREATE INDEX IF NOT EXISTS idx_marks_student_date ON marks(student_id, date);
+CREATE INDEX IF NOT EXISTS idx_marks_date ON marks(date);
+
+CREATE TABLE IF NOT EXISTS csv_files (
+    path     TEXT PRIMARY KEY,              -- CSV journalier déjà importé ou exporté
+    mtime    REAL NOT NULL,
+    exported INTEGER NOT NULL DEFAULT 0     -- écrit par export_day_csv : jamais réimporté
+);
+"""
+
+# Agrégats maintenus incrémentalement, par mois (YYYY-MM) pour des rapports
+# de semestre sans relire l'historique. Un "cours" (meeting) = (date, session_name, room) :
+# les phases avant/après pause comptent pour un seul cours.
+AGGREGATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS course_month (
+    session_name  TEXT NOT NULL,
+    month         TEXT NOT NULL,
+    meetings      INTEGER NOT NULL DEFAULT 0,
+    marks         INTEGER NOT NULL DEFAULT 0,
+    late          INTEGER NOT NULL DEFAULT 0,
+    left_early    INTEGER NOT NULL DEFAULT 0,
+    total_seconds INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (session_name, month)
+);
+CREATE TABLE IF NOT EXISTS student_course_month (
+    student_id    TEXT NOT NULL,
+    session_name  TEXT NOT NULL,
+    month         TEXT NOT NULL,
+    name          TEXT NOT NULL,
+    attended      INTEGER NOT NULL DEFAULT 0,
+    late          INTEGER NOT NULL DEFAULT 0,
+    left_early    INTEGER NOT NULL DEFAULT 0,
+    total_seconds INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (student_id, session_name, month)
+);
+CREATE INDEX IF NOT EXISTS idx_scm_month ON student_course_month(month);
+"""
+
+SCHEMA_VERSION = 4  # 4 : left_early compté une fois par cours
+
+# Colonnes ajoutées après la création de bases existantes : {table: [(colonne, type)]}
+ADDED_COLUMNS = {
+    "marks": [("last_seen", "TEXT"), ("late_seconds", "INTEGER"),
+              ("left_early_seconds", "INTEGER"), ("timeline", "BLOB")],
+    "course_month": [("left_early", "INTEGER NOT NULL DEFAULT 0")],
+    "student_course_month": [("left_early", "INTEGER NOT NULL DEFAULT 0")],
+    "csv_files": [("exported", "INTEGER NOT NULL DEFAULT 0")],
+}
+
+DAY_FILE_RE = re.compile(r"Attendance_(\d{4}-\d{2}-\d{2})\.csv$")
+
+
+class AttendanceStore:
+    """
+    Stockage des présences dans SQLite (sessions, marques, durées), indexé par
+    session, étudiant et date. Remplace l'écriture directe des CSV journaliers :
+      - export_day_csv() régénère Attendance/Attendance_YYYY-MM-DD.csv au format historique,
+      - import_csv() / import_directory() chargent les CSV existants.
+    Les agrégats par cours / étudiant / mois sont mis à jour dans la même transaction
+    que chaque écriture (open_session, add_mark, close_session).
+    Les durées viennent de la timeline de présence de chaque étudiant (presence_timeline) ;
+    retard et départ anticipé sont conservés par marque et comptés dans les agrégats.
+    Une seule connexion partagée entre threads, protégée par un verrou.
+    """
+
+    LATE_GRACE_SECONDS = 300   # retard toléré après StartTime avant de compter "late"
+    LEAVE_GRACE_SECONDS = 300  # départ toléré avant la fin de session avant de compter "left early"
+
+    def __init__(self, db_path: str, late_grace_seconds: int = None, leave_grace_seconds: int = None):
+        self.db_path = db_path
+        if late_grace_seconds is not None:
+            self.LATE_GRACE_SECONDS = late_grace_seconds
+        if leave_grace_seconds is not None:
+            self.LEAVE_GRACE_SECONDS = leave_grace_seconds
+        parent = os.path.dirname(db_path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            self._conn.executescript(AGGREGATE_SCHEMA)
+            self._add_missing_columns()
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < SCHEMA_VERSION:
+            # Base créée avant les agrégats (ou avant left_early, ou avec left_early compté
+            # par phase) : les reconstruire une fois
+            self.rebuild_aggregates()
+            with self._lock, self._conn:
+                self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _add_missing_columns(self):
+        for table, columns in ADDED_COLUMNS.items():
+            existing = {r["name"] for r in self._conn.execute(f"PRAGMA table_info({table})")}
+            for name, decl in columns:
+                if name not in existing:
+                    self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # --- Écriture (prise d'appel) ----------------------------------------
+
+    def open_session(self, date: str, session_name: str = "", room: str = "",
+                     scheduled_start: str = None, started_at: datetime.datetime = None) -> int:
+        """
+        Crée une session et retourne son id.
+        """
+        started_at = started_at or datetime.datetime.now()
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "INSERT INTO sessions (date, session_name, room, scheduled_start, started_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (date, session_name or "", room or "", scheduled_start,
+                 started_at.strftime("%Y-%m-%d %H:%M:%S"))
+            )
+            self._agg_open(cur.lastrowid)
+            return cur.lastrowid
+
+    def add_mark(self, session_id: int, student_id: str, name: str,
+                 first_seen: datetime.datetime) -> bool:
+        """
+        Marque un étudiant présent (une seule fois par session). Retourne True si ajouté.
+        """
+        with self._lock, self._conn:
+            late_seconds = self._late_seconds(self._session_row(session_id), first_seen)
+            cur = self._conn.execute(
+                "INSERT OR IGNORE INTO marks (session_id, student_id, name, date, first_seen, late_seconds) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (session_id, str(student_id), name, first_seen.strftime("%Y-%m-%d"),
+                 first_seen.strftime("%Y-%m-%d %H:%M:%S"), late_seconds)
+            )
+            if cur.rowcount != 1:
+                return False
+            self._agg_mark(session_id, str(student_id), name, first_seen)
+            return True
+
+    def close_session(self, session_id: int, ended_at: datetime.datetime, durations: dict,
+                      presence: dict = None):
+        """
+        Clôture la session : heure de fin et durées {student_id: secondes}.
+        presence: {student_id: (last_seen datetime, timeline bytes)} issu des PresenceTimeline
+        de la session ; le départ anticipé est calculé d'après last_seen et ended_at.
+        """
+        presence = presence or {}
+        left_early = set()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE sessions SET ended_at = ? WHERE id = ?",
+                (ended_at.strftime("%Y-%m-%d %H:%M:%S"), session_id)
+            )
+            self._conn.executemany(
+                "UPDATE marks SET duration_seconds = ? WHERE session_id = ? AND student_id = ?",
+                [(int(secs), session_id, str(sid)) for sid, secs in durations.items()]
+            )
+            rows = []
+            for sid, (last_seen, timeline) in presence.items():
+                early = max(0, int((ended_at - last_seen).total_seconds()))
+                if early > self.LEAVE_GRACE_SECONDS:
+                    left_early.add(str(sid))
+                rows.append((last_seen.strftime("%Y-%m-%d %H:%M:%S"), early, timeline,
+                             session_id, str(sid)))
+            self._conn.executemany(
+                "UPDATE marks SET last_seen = ?, left_early_seconds = ?, timeline = ? "
+                "WHERE session_id = ? AND student_id = ?", rows
+            )
+            self._agg_durations(session_id, durations, left_early)
+
+    # --- Agrégats incrémentaux ---------------------------------------------
+
+    def _session_row(self, session_id: int):
+        return self._conn.execute(
+            "SELECT date, session_name, room, scheduled_start FROM sessions WHERE id = ?",
+            (session_id,)
+        ).fetchone()
+
+    @staticmethod
+    def _late_seconds(sess, first_seen: datetime.datetime):
+        """
+        Retard de first_seen sur l'heure prévue de la session (0 si à l'heure, None si inconnue).
+        """
+        if not sess["scheduled_start"]:
+            return None
+        start = datetime.datetime.strptime(
+            f"{sess['date']} {sess['scheduled_start']}", "%Y-%m-%d %H:%M:%S"
+        )
+        return max(0, int((first_seen - start).total_seconds()))
+
+    def _agg_open(self, session_id: int):
+        sess = self._session_row(session_id)
+        same_meeting = self._conn.execute(
+            "SELECT 1 FROM sessions WHERE date = ? AND session_name = ? AND room = ? AND id < ? LIMIT 1",
+            (sess["date"], sess["session_name"], sess["room"], session_id)
+        ).fetchone()
+        if same_meeting:
+            return
+        self._conn.execute(
+            "INSERT INTO course_month (session_name, month, meetings) VALUES (?, ?, 1) "
+            "ON CONFLICT(session_name, month) DO UPDATE SET meetings = meetings + 1",
+            (sess["session_name"], sess["date"][:7])
+        )
+
+    def _agg_mark(self, session_id: int, student_id: str, name: str, first_seen: datetime.datetime):
+        sess = self._session_row(session_id)
+        # Déjà compté dans une phase antérieure du même cours (avant la pause) ?
+        seen = first_seen.strftime("%Y-%m-%d %H:%M:%S")
+        prior = self._conn.execute(
+            "SELECT 1 FROM marks m JOIN sessions s ON s.id = m.session_id "
+            "WHERE m.student_id = ? AND m.date = ? AND s.session_name = ? AND s.room = ? "
+            "AND m.session_id <> ? AND (m.first_seen < ? OR (m.first_seen = ? AND m.session_id < ?)) "
+            "LIMIT 1",
+            (student_id, sess["date"], sess["session_name"], sess["room"], session_id,
+             seen, seen, session_id)
+        ).fetchone()
+        if prior:
+            return
+        late_seconds = self._late_seconds(sess, first_seen)
+        late = int(late_seconds is not None and late_seconds > self.LATE_GRACE_SECONDS)
+        month = sess["date"][:7]
+        self._conn.execute(
+            "INSERT INTO course_month (session_name, month, marks, late) VALUES (?, ?, 1, ?) "
+            "ON CONFLICT(session_name, month) DO UPDATE SET marks = marks + 1, late = late + excluded.late",
+            (sess["session_name"], month, late)
+        )
+        self._conn.execute(
+            "INSERT INTO student_course_month (student_id, session_name, month, name, attended, late) "
+            "VALUES (?, ?, ?, ?, 1, ?) ON CONFLICT(student_id, session_name, month) DO UPDATE SET "
+            "attended = attended + 1, late = late + excluded.late, name = excluded.name",
+            (student_id, sess["session_name"], month, name, late)
+        )
+
+    def _agg_durations(self, session_id: int, durations: dict, left_early=()):
+        """
+        left_early: student_id partis plus de LEAVE_GRACE_SECONDS avant la fin de la session.
+        Comme pour attended, un départ anticipé compte une fois par cours : ceux déjà comptés
+        dans une phase antérieure (avant la pause) sont ignorés.
+        """
+        if not durations and not left_early:
+            return
+        sess = self._session_row(session_id)
+        month = sess["date"][:7]
+        if left_early:
+            counted = {
+                r[0] for r in self._conn.execute(
+                    "SELECT DISTINCT m.student_id FROM marks m JOIN sessions s ON s.id = m.session_id "
+                    "WHERE s.date = ? AND s.session_name = ? AND s.room = ? AND s.id < ? "
+                    "AND m.left_early_seconds > ?",
+                    (sess["date"], sess["session_name"], sess["room"], session_id,
+                     self.LEAVE_GRACE_SECONDS)
+                )
+            }
+            left_early = {str(sid) for sid in left_early} - counted
+        self._conn.execute(
+            "UPDATE course_month SET total_seconds = total_seconds + ?, left_early = left_early + ? "
+            "WHERE session_name = ? AND month = ?",
+            (int(sum(durations.values())), len(left_early), sess["session_name"], month)
+        )
+        students = set(durations) | set(left_early)
+        self._conn.executemany(
+            "UPDATE student_course_month SET total_seconds = total_seconds + ?, left_early = left_early + ? "
+            "WHERE student_id = ? AND session_name = ? AND month = ?",
+            [(int(durations.get(sid, 0)), int(sid in left_early), str(sid), sess["session_name"], month)
+             for sid in students]
+        )
+
+    def rebuild_aggregates(self):
+        """
+        Recalcule entièrement les agrégats depuis sessions/marks (migration, réparation).
+        """
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM course_month")
+            self._conn.execute("DELETE FROM student_course_month")
+            session_ids = [r[0] for r in self._conn.execute("SELECT id FROM sessions ORDER BY id")]
+            for sid in session_ids:
+                self._agg_open(sid)
+            marks = self._conn.execute(
+                "SELECT session_id, student_id, name, first_seen, duration_seconds, left_early_seconds "
+                "FROM marks ORDER BY first_seen, session_id"
+            ).fetchall()
+            for m in marks:
+                seen = datetime.datetime.strptime(m["first_seen"], "%Y-%m-%d %H:%M:%S")
+                self._agg_mark(m["session_id"], m["student_id"], m["name"], seen)
+            by_session, early_by_session = {}, {}
+            for m in marks:
+                if m["duration_seconds"] is not None:
+                    by_session.setdefault(m["session_id"], {})[m["student_id"]] = m["duration_seconds"]
+                if (m["left_early_seconds"] or 0) > self.LEAVE_GRACE_SECONDS:
+                    early_by_session.setdefault(m["session_id"], set()).add(m["student_id"])
+            for sid in set(by_session) | set(early_by_session):
+                self._agg_durations(sid, by_session.get(sid, {}), early_by_session.get(sid, set()))
+
+    def course_summary(self, start_month: str = None, end_month: str = None):
+        """
+        Par cours sur [start_month, end_month] (YYYY-MM inclus) : cours tenus, présences,
+        retards, départs anticipés, durée totale et taux moyen de présence par étudiant vu.
+        """
+        where, params = self._month_filter(start_month, end_month)
+        with self._lock:
+            courses = [dict(r) for r in self._conn.execute(
+                "SELECT session_name, SUM(meetings) AS meetings, SUM(marks) AS marks, "
+                "SUM(late) AS late, SUM(left_early) AS left_early, SUM(total_seconds) AS total_seconds "
+                f"FROM course_month {where} GROUP BY session_name ORDER BY session_name", params
+            )]
+            students = {r[0]: r[1] for r in self._conn.execute(
+                "SELECT session_name, COUNT(DISTINCT student_id) "
+                f"FROM student_course_month {where} GROUP BY session_name", params
+            )}
+        for c in courses:
+            c["students"] = students.get(c["session_name"], 0)
+            denom = c["meetings"] * c["students"]
+            c["attendance_rate"] = c["marks"] / denom if denom else 0.0
+        return courses
+
+    def student_summary(self, start_month: str = None, end_month: str = None, student_id: str = None):
+        """
+        Par étudiant et par cours : présences, retards, départs anticipés, durée totale et taux
+        (présences / cours tenus sur la période).
+        """
+        where, params = self._month_filter(start_month, end_month, "scm.")
+        if student_id is not None:
+            where += (" AND " if where else "WHERE ") + "scm.student_id = ?"
+            params.append(str(student_id))
+        course_where, course_params = self._month_filter(start_month, end_month)
+        with self._lock:
+            meetings = {r[0]: r[1] for r in self._conn.execute(
+                f"SELECT session_name, SUM(meetings) FROM course_month {course_where} "
+                "GROUP BY session_name", course_params
+            )}
+            rows = [dict(r) for r in self._conn.execute(
+                "SELECT scm.student_id, MAX(scm.name) AS name, scm.session_name, "
+                "SUM(scm.attended) AS attended, SUM(scm.late) AS late, SUM(scm.left_early) AS left_early, "
+                "SUM(scm.total_seconds) AS total_seconds "
+                f"FROM student_course_month scm {where} "
+                "GROUP BY scm.student_id, scm.session_name ORDER BY scm.student_id, scm.session_name",
+                params
+            )]
+        for r in rows:
+            held = meetings.get(r["session_name"], 0)
+            r["meetings"] = held
+            r["attendance_rate"] = r["attended"] / held if held else 0.0
+        return rows
+
+    @staticmethod
+    def _month_filter(start_month, end_month, prefix=""):
+        clauses, params = [], []
+        if start_month:
+            clauses.append(f"{prefix}month >= ?")
+            params.append(start_month)
+        if end_month:
+            clauses.append(f"{prefix}month <= ?")
+            params.append(end_month)
+        return ("WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    # --- Lecture ---------------------------------------------------------
+
+    def sessions_on(self, date: str):
+        with self._lock:
+            return [dict(r) for r in self._conn.execute(
+                "SELECT * FROM sessions WHERE date = ? ORDER BY started_at, id", (date,)
+            )]
+
+    def marks_for_session(self, session_id: int):
+        with self._lock:
+            return [dict(r) for r in self._conn.execute(
+                "SELECT * FROM marks WHERE session_id = ? ORDER BY first_seen", (session_id,)
+            )]
+
+    def student_history(self, student_id: str, start_date: str = None, end_date: str = None):
+        """
+        Présences d'un étudiant (optionnellement entre deux dates incluses),
+        jointes avec le nom de session.
+        """
+        sql = ("SELECT m.date, m.first_seen, m.last_seen, m.duration_seconds, m.late_seconds, "
+               "m.left_early_seconds, s.session_name, s.room "
+               "FROM marks m JOIN sessions s ON s.id = m.session_id WHERE m.student_id = ?")
+        params = [str(student_id)]
+        if start_date:
+            sql += " AND m.date >= ?"
+            params.append(start_date)
+        if end_date:
+            sql += " AND m.date <= ?"
+            params.append(end_date)
+        sql += " ORDER BY m.first_seen"
+        with self._lock:
+            return [dict(r) for r in self._conn.execute(sql, params)]
+
+    # --- Compatibilité CSV -----------------------------------------------
+
+    def _remember_file(self, path: str, exported: bool = False):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO csv_files (path, mtime, exported) VALUES (?, ?, ?)",
+                (os.path.abspath(path), os.path.getmtime(path), int(exported))
+            )
+
+    def _is_known_file(self, path: str) -> bool:
+        """
+        Vrai si le fichier a déjà été importé (même mtime) ou s'il a été écrit par
+        export_day_csv : son contenu est déjà en base, quel que soit son mtime.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT mtime, exported FROM csv_files WHERE path = ?", (os.path.abspath(path),)
+            ).fetchone()
+        return row is not None and (row["exported"] or row["mtime"] == os.path.getmtime(path))
+
+    def export_day_csv(self, date: str, path: str):
+        """
+        Écrit le CSV du jour au format historique : en-tête ID,NAME,DATE,TIME puis,
+        pour chaque session, ses présences suivies d'une ligne vide et d'un bloc
+        ID,DURATION_SECONDS.
+        Les recorders de plusieurs salles exportent le même fichier : l'écriture (fichier
+        temporaire puis os.replace) et son enregistrement comme export se font sous le
+        verrou, si bien qu'import_csv ne voit jamais de fichier partiel ni d'export inconnu.
+        """
+        tmp_path = f"{path}.tmp"
+        with self._lock:
+            try:
+                with open(tmp_path, "w", newline='') as f:
+                    writer = csv.writer(f)
+                    writer.writerow(["ID", "NAME", "DATE", "TIME"])
+                    for sess in self.sessions_on(date):
+                        marks = self.marks_for_session(sess["id"])
+                        for m in marks:
+                            writer.writerow([m["student_id"], m["name"], m["date"], m["first_seen"][11:]])
+                        if sess["ended_at"] is None:
+                            continue
+                        writer.writerow([])
+                        writer.writerow(["ID", "DURATION_SECONDS"])
+                        for m in marks:
+                            if m["duration_seconds"] is not None:
+                                writer.writerow([m["student_id"], m["duration_seconds"]])
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            self._remember_file(path, exported=True)
+
+    IMPORT_EARLY_SECONDS = 900  # un bloc importé peut commencer jusqu'à 15 min avant StartTime
+
+    @classmethod
+    def _match_schedule(cls, schedule, started: datetime.datetime):
+        """
+        Session du planning (ScheduleManager) correspondant à un bloc importé qui commence à
+        `started` : (SessionName, Room, "HH:MM:SS") ou None si aucune ne correspond.
+        """
+        if schedule is None or schedule.index is None:
+            return None
+        current = schedule.get_current_session(started)
+        if current is not None:
+            sess = current
+        else:
+            # Appel lancé un peu avant l'heure : première session qui commence peu après
+            start, phase = schedule.index.next_ongoing_start(started, max_days=0)
+            if start is None or (start - started).total_seconds() > cls.IMPORT_EARLY_SECONDS:
+                return None
+            sess = phase['session']
+        if not sess['SessionName']:
+            return None
+        scheduled = sess['StartTime'].strftime("%H:%M:%S") if sess['StartTime'] else None
+        return sess['SessionName'], sess['Room'], scheduled
+
+    def import_csv(self, path: str, schedule=None) -> int:
+        """
+        Importe un CSV journalier historique (une session par bloc de présences).
+        Chaque bloc est rattaché à la session du planning (ScheduleManager `schedule`) en cours
+        à sa première présence, pour retrouver SessionName, Room et l'heure prévue ; sans
+        correspondance, il est importé comme session "imported".
+        Ignore les fichiers déjà importés (même mtime) et ceux exportés par ce store.
+        Tout l'import se fait sous le verrou (pas d'export concurrent du même fichier).
+        Retourne le nombre de sessions créées. Lève ValueError / csv.Error si le fichier
+        est mal formé.
+        """
+        with self._lock:
+            return self._import_csv(path, schedule)
+
+    def _import_csv(self, path: str, schedule) -> int:
+        if self._is_known_file(path):
+            return 0
+        m = DAY_FILE_RE.search(os.path.basename(path))
+        file_date = m.group(1) if m else None
+
+        blocks = []  # [(marks[(id, name, date, time)], durations{id: secs})]
+        marks, durations, in_durations = [], {}, False
+        with open(path, newline='') as f:
+            for row in csv.reader(f):
+                row = [c.strip() for c in row]
+                if not any(row):
+                    continue
+                if row[:4] == ["ID", "NAME", "DATE", "TIME"]:
+                    continue
+                if row[:2] == ["ID", "DURATION_SECONDS"]:
+                    in_durations = True
+                    continue
+                if len(row) >= 4:
+                    if in_durations:
+                        blocks.append((marks, durations))
+                        marks, durations, in_durations = [], {}, False
+                    marks.append(row[:4])
+                elif len(row) >= 2 and in_durations:
+                    try:
+                        durations[row[0]] = int(float(row[1]))
+                    except ValueError:
+                        pass
+        if marks or durations:
+            blocks.append((marks, durations))
+
+        # Horodatages validés avant toute écriture : un fichier mal formé n'est pas importé à moitié
+        parsed = []
+        for marks, durations in blocks:
+            if not marks:
+                continue
+            date = marks[0][2] or file_date
+            seen = [
+                (student_id, name, datetime.datetime.strptime(f"{mdate or date} {mtime}", "%Y-%m-%d %H:%M:%S"))
+                for student_id, name, mdate, mtime in marks
+            ]
+            parsed.append((date, seen, durations))
+
+        created = 0
+        for date, seen, durations in parsed:
+            started = min(t for _, _, t in seen)
+            match = self._match_schedule(schedule, started)
+            if match is not None:
+                session_name, room, scheduled_start = match
+                sid = self.open_session(date, session_name, room, scheduled_start, started_at=started)
+            else:
+                sid = self.open_session(date, "imported", started_at=started)
+            ended = started
+            for student_id, name, t in seen:
+                self.add_mark(sid, student_id, name, t)
+                if student_id in durations:
+                    ended = max(ended, t + datetime.timedelta(seconds=durations[student_id]))
+            self.close_session(sid, ended, durations)
+            created += 1
+        self._remember_file(path)
+        return created
+
+    def import_directory(self, directory: str = "Attendance", schedule=None) -> int:
+        """
+        Importe tous les Attendance_YYYY-MM-DD.csv d'un dossier (voir import_csv pour `schedule`).
+        Retourne le nombre de sessions.
+        """
+        total = 0
+        if not os.path.isdir(directory):
+            return 0
+        for fname in sorted(os.listdir(directory)):
+            if DAY_FILE_RE.search(fname):
+                total += self.import_csv(os.path.join(directory, fname), schedule)
+        return total
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Stockage des présences FaceAttend.")
+    parser.add_argument("--db", default="Attendance/attendance.db")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_imp = sub.add_parser("import", help="importer les CSV journaliers historiques")
+    p_imp.add_argument("directory", nargs="?", default="Attendance")
+    p_imp.add_argument("--schedule", help="CSV de planning, pour retrouver cours et salle de chaque bloc")
+    p_exp = sub.add_parser("export", help="exporter un jour au format CSV historique")
+    p_exp.add_argument("date", help="YYYY-MM-DD")
+    p_exp.add_argument("--out")
+    p_stu = sub.add_parser("student", help="présences d'un étudiant")
+    p_stu.add_argument("student_id")
+    p_stu.add_argument("--from", dest="start")
+    p_stu.add_argument("--to", dest="end")
+    args = parser.parse_args()
+
+    store = AttendanceStore(args.db)
+    if args.cmd == "import":
+        schedule = None
+        if args.schedule:
+            from schedule_manager import ScheduleManager
+            schedule = ScheduleManager()
+            schedule.load_from_csv(args.schedule)
+        print(f"Imported {store.import_directory(args.directory, schedule)} sessions")
+    elif args.cmd == "export":
+        out = args.out or f"Attendance/Attendance_{args.date}.csv"
+        store.export_day_csv(args.date, out)
+        print(f"Exported {out}")
+    else:
+        for r in store.student_history(args.student_id, args.start, args.end):
+            print(f"{r['first_seen']}  {r['session_name']:<25} {r['duration_seconds'] or 0:>6}s"
+                  f"  late {r['late_seconds'] or 0:>5}s  left early {r['left_early_seconds'] or 0:>5}s")
+    store.close()
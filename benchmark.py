@@ -0,0 +1,363 @@
+import argparse
+import csv
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import diagnostics
+from startup_profile import lazy_import
+from face_preprocessing import FacePreprocessor
+from face_trainer import FaceTrainer
+from recognition_context import RecognitionContext, create_lbph_recognizer
+from schedule_manager import ScheduleManager
+from tiled_detection import TiledDetector
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+DEFAULT_BASELINE = "Benchmarks/baseline.json"
+DEFAULT_THRESHOLD = 0.20  # +20 % par rapport à la référence = régression
+
+
+class _NullLabel:
+    """
+    Remplace le Label de statut de train_model() (pas de fenêtre pendant un benchmark).
+    """
+
+    def config(self, **kwargs):
+        pass
+
+
+def _timed(fn, repeat: int = 1):
+    """
+    Exécute fn() `repeat` fois ; retourne la meilleure durée (s) et le dernier résultat.
+    """
+    best, result = None, None
+    for _ in range(max(1, repeat)):
+        t = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - t
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+# --- Jeux de données synthétiques ------------------------------------------------
+
+def make_dataset(root: str, students: int, images_per_student: int,
+                 face_size=(100, 100), seed: int = 0):
+    """
+    Génère TrainingImage/{ID}/name.serial.id.count.jpg et StudentDetails.csv sous `root`.
+    Chaque étudiant a un motif de base flouté (basses fréquences) ; ses images en sont
+    des variantes bruitées et décalées, ce qui donne un LBPH non trivial.
+    Retourne (training_dir, details_csv).
+    """
+    rng = np.random.default_rng(seed)
+    training_dir = os.path.join(root, "TrainingImage")
+    details_csv = os.path.join(root, "StudentDetails", "StudentDetails.csv")
+    os.makedirs(os.path.dirname(details_csv), exist_ok=True)
+    w, h = face_size
+    rows = []
+    for serial in range(1, students + 1):
+        user_id = f"{1000000 + serial}"
+        name = f"Student{serial}"
+        folder = os.path.join(training_dir, user_id)
+        os.makedirs(folder, exist_ok=True)
+        base = cv2.GaussianBlur(rng.integers(0, 256, (h, w), dtype=np.uint8), (0, 0), 6)
+        base = cv2.normalize(base, None, 0, 255, cv2.NORM_MINMAX)
+        for count in range(1, images_per_student + 1):
+            dx, dy = rng.integers(-3, 4, 2)
+            shifted = np.roll(np.roll(base, int(dx), axis=1), int(dy), axis=0)
+            noise = rng.normal(0, 12, (h, w))
+            img = np.clip(shifted.astype(np.float32) + noise, 0, 255).astype(np.uint8)
+            cv2.imwrite(os.path.join(folder, f"{name}.{serial}.{user_id}.{count}.jpg"), img)
+        rows.append([serial, user_id, name])
+    with open(details_csv, "w", newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["SERIAL NO.", "ID", "NAME"])
+        writer.writerows(rows)
+    return training_dir, details_csv
+
+
+def make_frames(count: int, size=(640, 480), seed: int = 0):
+    """
+    Frames en niveaux de gris à la résolution caméra : le coût de detectMultiScale
+    dépend surtout de la résolution et de minSize, pas du contenu.
+    """
+    rng = np.random.default_rng(seed)
+    w, h = size
+    return [cv2.GaussianBlur(rng.integers(0, 256, (h, w), dtype=np.uint8), (0, 0), 3)
+            for _ in range(count)]
+
+
+def load_frames(frames_dir: str):
+    """
+    Rejoue des frames réelles (jpg/png) enregistrées dans frames_dir.
+    """
+    frames = []
+    for f in sorted(os.listdir(frames_dir)):
+        if f.lower().endswith((".jpg", ".jpeg", ".png")):
+            img = cv2.imread(os.path.join(frames_dir, f), cv2.IMREAD_GRAYSCALE)
+            if img is not None:
+                frames.append(img)
+    return frames
+
+
+def make_schedule(path: str, rooms: int, sessions_per_day: int = 4):
+    """
+    Planning hebdomadaire synthétique : `rooms` salles, 6 jours, sessions de 2 h avec pause.
+    """
+    days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
+    with open(path, "w", newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Day", "SessionName", "StartTime", "EndTime", "BreakStart", "BreakEnd", "Room"])
+        for r in range(rooms):
+            for day in days:
+                for s in range(sessions_per_day):
+                    start = 8 + 2 * s + (r % 2)
+                    if start + 2 > 23:
+                        break
+                    writer.writerow([day, f"Course_{r}_{s}", f"{start}:00", f"{start + 2}:00",
+                                     f"{start}:50", f"{start + 1}:00", f"R{r}"])
+
+
+# --- Benchmarks -----------------------------------------------------------------
+
+def bench_detection(haar_path: str, frames, repeat: int, tiling: dict = None) -> dict:
+    detector = cv2.CascadeClassifier(haar_path)
+    run = lambda: [detector.detectMultiScale(f, scaleFactor=1.1, minNeighbors=6, minSize=(100, 100))
+                   for f in frames]
+    best, _ = _timed(run, repeat)
+    results = {"detect_ms_per_frame": best * 1000 / len(frames)}
+    if tiling:
+        tiled = TiledDetector.from_config(haar_path, tiling)
+        best, _ = _timed(lambda: [tiled.detectMultiScale(f) for f in frames], repeat)
+        results["detect_tiled_ms_per_frame"] = best * 1000 / len(frames)
+        tiled.close()
+    return results
+
+
+def bench_predict(trainer: FaceTrainer, gallery_sizes, repeat: int) -> dict:
+    """
+    Coût d'un predict LBPH selon le nombre d'étudiants du modèle (galerie de cours ou modèle complet).
+    """
+    faces, ids = trainer.collect_training_data()
+    by_serial = {}
+    for face, sid in zip(faces, ids):
+        by_serial.setdefault(sid, []).append(face)
+    serials = sorted(by_serial)
+    results = {}
+    for size in gallery_sizes:
+        chosen = serials[:size]
+        if len(chosen) < size:
+            continue
+        train_faces, train_ids, probes = [], [], []
+        for sid in chosen:
+            imgs = by_serial[sid]
+            # La dernière image de chaque étudiant sert de requête
+            train_faces.extend(imgs[:-1] or imgs)
+            train_ids.extend([sid] * len(imgs[:-1] or imgs))
+            probes.append(imgs[-1])
+        recognizer = create_lbph_recognizer()
+        recognizer.train(train_faces, np.array(train_ids))
+        best, _ = _timed(lambda: [recognizer.predict(p) for p in probes], repeat)
+        results[f"predict_ms_gallery_{size}"] = best * 1000 / len(probes)
+    return results
+
+
+def _train_in_child(haar_path, training_dir, details_csv, preprocessing, chunk_size, max_per_student,
+                    model_path):
+    """
+    Exécuté dans un processus neuf : le pic RSS (ru_maxrss, à l'échelle du processus)
+    n'y est pas déjà relevé par les benchmarks précédents.
+    """
+    # Imports lourds avant la mesure : seul l'entraînement compte
+    import cv2, numpy, PIL.Image  # noqa: F401
+    trainer = FaceTrainer(haar_path, training_dir, details_csv,
+                          FacePreprocessor(**preprocessing), chunk_size=chunk_size,
+                          max_per_student=max_per_student)
+    rss_before = diagnostics.peak_rss_mb()
+    best, _ = _timed(lambda: trainer.train_model(model_path, _NullLabel()))
+    return best, rss_before, diagnostics.peak_rss_mb()
+
+
+def bench_training(trainer: FaceTrainer, model_path: str) -> dict:
+    """
+    Durée de train_model() (chargement des images + train + write) et croissance du pic RSS,
+    mesurées dans un sous-processus.
+    """
+    pre = trainer.preprocessor
+    preprocessing = {"size": pre.size, "clip_limit": pre.clip_limit, "tile_grid_size": pre.tile_grid_size}
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        best, rss_before, rss_after = pool.apply(_train_in_child, (
+            trainer.haar_path, trainer.training_dir, trainer.details_csv,
+            preprocessing, trainer.chunk_size, trainer.max_per_student, model_path
+        ))
+    results = {"train_model_s": best}
+    if rss_before is not None:
+        results["train_model_peak_rss_growth_mb"] = max(0.0, rss_after - rss_before)
+    if os.path.isfile(model_path):
+        results["model_size_mb"] = os.path.getsize(model_path) / (1024 * 1024)
+    return results
+
+
+def bench_details(haar_path: str, model_path: str, details_csv: str, lookups: int = 100000) -> dict:
+    ctx = RecognitionContext(haar_path, model_path, details_csv)
+    load_s, students = _timed(ctx._read_details, 3)
+    ctx.students = students
+    serials = [random.randint(1, len(students) + 10) for _ in range(lookups)]
+    lookup_s, _ = _timed(lambda: [ctx.lookup(s) for s in serials])
+    return {
+        "details_load_ms": load_s * 1000,
+        "details_lookup_us": lookup_s * 1e6 / lookups,
+    }
+
+
+def bench_schedule(schedule_csv: str, queries: int = 5000) -> dict:
+    mgr = ScheduleManager()
+    load_s, _ = _timed(lambda: mgr.load_from_csv(schedule_csv), 3)
+    rooms = sorted(mgr.index.all_rooms())
+    monday = datetime.datetime(2026, 10, 19)
+    rnd = random.Random(0)
+    probes = [(monday + datetime.timedelta(minutes=rnd.randrange(7 * 24 * 60)), rnd.choice(rooms))
+              for _ in range(queries)]
+    current_s, _ = _timed(lambda: [mgr.get_current_session(now, room) for now, room in probes])
+    next_s, _ = _timed(lambda: [mgr.get_next_phase_start(now, room) for now, room in probes])
+    return {
+        "schedule_load_ms": load_s * 1000,
+        "schedule_current_us": current_s * 1e6 / queries,
+        "schedule_next_start_us": next_s * 1e6 / queries,
+    }
+
+
+# --- Références et régressions ------------------------------------------------
+
+def compare(results: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD):
+    """
+    Toutes les mesures sont "plus bas = mieux". Retourne [(nom, référence, actuel, ratio)]
+    pour chaque mesure qui dépasse la référence de plus de `threshold`.
+    """
+    regressions = []
+    for name, value in results.items():
+        ref = baseline.get(name)
+        if ref is None or ref <= 0:
+            continue
+        ratio = value / ref
+        if ratio > 1 + threshold:
+            regressions.append((name, ref, value, ratio))
+    return regressions
+
+
+def run(args) -> dict:
+    only = set(args.only.split(",")) if args.only else None
+    wanted = lambda name: only is None or name in only
+    workdir = tempfile.mkdtemp(prefix="faceattend-bench-")
+    results = {}
+    try:
+        training_dir, details_csv = args.dataset, args.details
+        if not args.dataset and any(wanted(n) for n in ("predict", "train", "details")):
+            t = time.perf_counter()
+            training_dir, details_csv = make_dataset(workdir, args.students, args.images, seed=args.seed)
+            print(f"Synthetic dataset: {args.students} students x {args.images} images "
+                  f"({time.perf_counter() - t:.1f} s)")
+        trainer = FaceTrainer(args.haar, training_dir or os.path.join(workdir, "TrainingImage"),
+                              details_csv, FacePreprocessor())
+        model_path = os.path.join(workdir, "Trainer.yml")
+
+        if wanted("detect"):
+            size = tuple(int(v) for v in args.frame_size.lower().split("x"))
+            frames = load_frames(args.frames) if args.frames else make_frames(20, size, seed=args.seed)
+            tiling = json.loads(args.tiled) if args.tiled else None
+            results.update(bench_detection(args.haar, frames, args.repeat, tiling))
+        if wanted("predict"):
+            sizes = [int(s) for s in args.gallery_sizes.split(",")]
+            results.update(bench_predict(trainer, sizes, args.repeat))
+        if wanted("train"):
+            results.update(bench_training(trainer, model_path))
+        if wanted("details"):
+            results.update(bench_details(args.haar, model_path, details_csv))
+        if wanted("schedule"):
+            schedule_csv = os.path.join(workdir, "schedule.csv")
+            make_schedule(schedule_csv, args.rooms)
+            results.update(bench_schedule(schedule_csv))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmarks sans caméra : détection, predict LBPH, entraînement, StudentDetails, planning."
+    )
+    parser.add_argument("--students", type=int, default=100, help="étudiants du jeu synthétique")
+    parser.add_argument("--images", type=int, default=10, help="images par étudiant")
+    parser.add_argument("--gallery-sizes", default="10,50,100", help="tailles de modèle pour predict")
+    parser.add_argument("--rooms", type=int, default=10, help="salles du planning synthétique")
+    parser.add_argument("--dataset", help="rejouer un TrainingImage/ existant au lieu du jeu synthétique")
+    parser.add_argument("--details", default="StudentDetails/StudentDetails.csv",
+                        help="StudentDetails.csv associé à --dataset")
+    parser.add_argument("--frames", help="dossier de frames réelles pour la détection")
+    parser.add_argument("--frame-size", default="640x480", help="résolution des frames synthétiques, ex. 3840x2160")
+    parser.add_argument("--tiled", help='config de détection par tuiles, ex. \'{"rows": 3, "cols": 4, "min_sizes": [24, 40, 64]}\'')
+    parser.add_argument("--haar", default="haarcascade_frontalface_default.xml")
+    parser.add_argument("--only", help="sous-ensemble : detect,predict,train,details,schedule")
+    parser.add_argument("--repeat", type=int, default=3, help="répétitions (meilleure valeur gardée)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="enregistrer ces résultats comme référence")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--output", help="écrire les résultats JSON dans ce fichier")
+    args = parser.parse_args()
+
+    results = run(args)
+    report = {
+        "meta": {
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "platform": platform.platform(),
+            "students": args.students if not args.dataset else None,
+            "images_per_student": args.images if not args.dataset else None,
+        },
+        "results": results,
+    }
+
+    for name, value in results.items():
+        print(f"{name:<36}{value:>12.3f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.isfile(args.baseline):
+        print(f"\nNo baseline at {args.baseline} (use --save-baseline)")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("meta", {}).get("opencv") != cv2.__version__:
+        print(f"\nNote: baseline recorded with OpenCV {baseline.get('meta', {}).get('opencv')}")
+    regressions = compare(results, baseline.get("results", {}), args.threshold)
+    if not regressions:
+        print(f"\nNo regression above {args.threshold:.0%} against {args.baseline}")
+        return 0
+    print(f"\nRegressions above {args.threshold:.0%}:")
+    for name, ref, value, ratio in regressions:
+        print(f"  {name}: {ref:.3f} -> {value:.3f} (x{ratio:.2f})")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+import collections
+import threading
+import time
+
+from startup_profile import lazy_import
+
+cv2 = lazy_import("cv2")
+
+# Alias acceptés dans config.json -> code FOURCC OpenCV
+_FOURCC_ALIASES = {"MJPEG": "MJPG", "MJPG": "MJPG", "YUYV": "YUYV", "YUY2": "YUYV"}
+
+
+def open_camera(index: int, settings: dict = None):
+    """
+    Ouvre la caméra `index` et applique les réglages de config.json
+    ("cameras": {"0": {"width": 1280, "height": 720, "fps": 30, "buffer_size": 1, "format": "MJPEG"}}).
+    Retourne le cv2.VideoCapture, ou None si la caméra ne s'ouvre pas.
+    """
+    settings = settings or {}
+    cap = cv2.VideoCapture(index)
+    if not cap.isOpened():
+        return None
+    fmt = settings.get("format")
+    if fmt:
+        # Le format doit être fixé avant la résolution (sinon le pilote peut l'ignorer)
+        code = _FOURCC_ALIASES.get(str(fmt).upper(), str(fmt).upper())
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*code[:4].ljust(4)))
+    if settings.get("width"):
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, int(settings["width"]))
+    if settings.get("height"):
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, int(settings["height"]))
+    if settings.get("fps"):
+        cap.set(cv2.CAP_PROP_FPS, float(settings["fps"]))
+    # Limiter le tampon pour ne pas traiter d'images périmées
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, int(settings.get("buffer_size", 1)))
+    return cap
+
+
+class Subscription:
+    """
+    Abonnement d'un consommateur (prise d'appel, enrôlement...) aux frames d'une caméra.
+    Chaque abonné lit la frame la plus récente à son rythme, plafonné à max_fps ;
+    les frames sont partagées sans copie (tableaux en lecture seule).
+    Tient aussi les statistiques de latence capture -> décision de cet abonné.
+    """
+
+    LATENCY_WINDOW = 600  # dernières décisions gardées pour les percentiles
+
+    def __init__(self, grabber, name: str, max_fps: float = None):
+        self.grabber = grabber
+        self.name = name
+        self.interval = 1.0 / max_fps if max_fps else 0.0
+        self.closed = False
+        self.frames_read = 0
+        self.frames_skipped = 0  # frames publiées que cet abonné n'a pas lues
+        self._seq = None
+        self._next_due = 0.0
+        self._latencies = collections.deque(maxlen=self.LATENCY_WINDOW)
+
+    def read_latest(self, timeout: float = 1.0):
+        """
+        Attend une frame plus récente que la dernière lue (et le prochain créneau max_fps),
+        puis retourne (frame, captured_at), ou (None, None) après `timeout` secondes.
+        La frame est partagée : ne pas la modifier en place (copy() pour dessiner dessus).
+        """
+        wait = self._next_due - time.monotonic()
+        if wait > 0:
+            time.sleep(min(wait, timeout))
+        g = self.grabber
+        with g._cond:
+            ready = g._cond.wait_for(
+                lambda: self.closed or g._closed or (g._frame is not None and g._seq != self._seq),
+                timeout
+            )
+            if not ready or self.closed or g._closed:
+                return None, None
+            if self._seq is not None:
+                self.frames_skipped += g._seq - self._seq - 1
+            self._seq = g._seq
+            frame, captured_at = g._frame, g._captured_at
+        self.frames_read += 1
+        self._next_due = time.monotonic() + self.interval
+        return frame, captured_at
+
+    def note_decision(self, captured_at: float):
+        """
+        Enregistre la latence entre la capture d'une frame et la décision prise dessus.
+        """
+        self._latencies.append(time.time() - captured_at)
+
+    def latency_stats(self) -> dict:
+        """
+        {decisions, mean_ms, p50_ms, p95_ms, max_ms, read, skipped} sur la fenêtre récente.
+        """
+        lat = sorted(self._latencies)
+        stats = {"decisions": len(lat), "read": self.frames_read, "skipped": self.frames_skipped}
+        if lat:
+            stats.update({
+                "mean_ms": 1000 * sum(lat) / len(lat),
+                "p50_ms": 1000 * lat[len(lat) // 2],
+                "p95_ms": 1000 * lat[min(len(lat) - 1, int(len(lat) * 0.95))],
+                "max_ms": 1000 * lat[-1],
+            })
+        return stats
+
+    def close(self):
+        """
+        Se désabonne ; sans abonné, la caméra reste ouverte mais n'est plus lue.
+        """
+        if not self.closed:
+            self.closed = True
+            self.grabber._unsubscribe(self)
+
+
+class FrameGrabber:
+    """
+    Propriétaire unique et durable d'une caméra. Un thread de capture ne garde que la
+    frame la plus récente, horodatée au moment de la capture (time.time()), et la diffuse
+    sans copie à tous les abonnés (subscribe()). La caméra n'est lue que tant qu'il y a
+    au moins un abonné ; elle reste ouverte entre deux sessions.
+    """
+
+    def __init__(self, index: int, capture, settings: dict = None):
+        self.index = index
+        self.capture = capture
+        self.settings = settings or {}
+        self._cond = threading.Condition()
+        self._frame = None
+        self._captured_at = None
+        self._seq = 0
+        self._subscribers = []
+        self._running = threading.Event()
+        self._closed = False
+        self._thread = None
+        self._flush = 0
+        self.frames_captured = 0
+
+    def actual_settings(self) -> dict:
+        """
+        Réglages effectivement retenus par le pilote.
+        """
+        fourcc = int(self.capture.get(cv2.CAP_PROP_FOURCC))
+        return {
+            "width": int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            "fps": self.capture.get(cv2.CAP_PROP_FPS),
+            "format": "".join(chr((fourcc >> (8 * i)) & 0xFF) for i in range(4)).strip("\x00"),
+        }
+
+    def isOpened(self) -> bool:
+        return not self._closed and self.capture.isOpened()
+
+    def subscribers(self):
+        with self._cond:
+            return [s.name for s in self._subscribers]
+
+    def subscribe(self, name: str, max_fps: float = None) -> Subscription:
+        """
+        Nouvel abonné ; démarre (ou reprend) la lecture de la caméra.
+        """
+        sub = Subscription(self, name, max_fps)
+        with self._cond:
+            self._subscribers.append(sub)
+            # Ne jamais servir à un nouvel abonné une frame d'avant la reprise
+            if not self._running.is_set():
+                self._frame = None
+                # Les frames restées dans le tampon pilote pendant la pause sont périmées
+                self._flush = int(self.settings.get("buffer_size", 1))
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._loop, daemon=True,
+                                            name=f"camera-{self.index}")
+            self._thread.start()
+        self._running.set()
+        return sub
+
+    def _unsubscribe(self, sub: Subscription):
+        with self._cond:
+            if sub in self._subscribers:
+                self._subscribers.remove(sub)
+            if not self._subscribers:
+                self._running.clear()
+            self._cond.notify_all()
+
+    def _loop(self):
+        while not self._closed:
+            if not self._running.wait(timeout=0.5):
+                continue
+            ok, frame = self.capture.read()
+            captured_at = time.time()
+            if not ok:
+                time.sleep(0.01)
+                continue
+            if self._flush > 0:
+                self._flush -= 1
+                continue
+            # Diffusion sans copie : interdire les modifications en place
+            frame.flags.writeable = False
+            with self._cond:
+                self._frame = frame
+                self._captured_at = captured_at
+                self._seq += 1
+                self.frames_captured += 1
+                self._cond.notify_all()
+
+    def release(self):
+        self._closed = True
+        self._running.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+        self.capture.release()
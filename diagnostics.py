@@ -0,0 +1,239 @@
+import cProfile
+import csv
+import datetime
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Cibles instrumentées : prise d'appel, capture d'enrôlement, entraînement
+TARGETS = ("record", "capture", "train")
+ENV_VAR = "FACEATTEND_PROFILE"  # ex. "record,train" ou "all"
+
+_lock = threading.Lock()
+_settings = {
+    "enabled": set(),          # cibles activées par config.json ou à chaud (menu)
+    "dir": "Diagnostics",
+    "frame_sample_every": 10,  # une frame sur N dans la trace de timing
+    "top": 40,                 # lignes gardées dans les résumés texte
+}
+_tracing_users = 0
+_tracing_owned = False
+
+
+def configure(cfg: dict = None):
+    """
+    Applique la section "profiling" de config.json :
+      {"enabled": ["record", "train"] | true, "dir": "Diagnostics", "frame_sample_every": 10}
+    """
+    cfg = cfg or {}
+    enabled = cfg.get("enabled", [])
+    with _lock:
+        if enabled is True:
+            _settings["enabled"] = set(TARGETS)
+        else:
+            _settings["enabled"] = {t for t in (enabled or []) if t in TARGETS}
+        _settings["dir"] = cfg.get("dir", _settings["dir"])
+        _settings["frame_sample_every"] = max(1, int(cfg.get("frame_sample_every", _settings["frame_sample_every"])))
+
+
+def set_enabled(target: str, enabled: bool):
+    """
+    Active/désactive une cible à chaud ; prise en compte au prochain lancement de session.
+    """
+    with _lock:
+        if enabled:
+            _settings["enabled"].add(target)
+        else:
+            _settings["enabled"].discard(target)
+
+
+def _env_targets():
+    value = os.environ.get(ENV_VAR, "").strip().lower()
+    if not value or value in ("0", "no", "false"):
+        return set()
+    if value in ("1", "all", "yes", "true"):
+        return set(TARGETS)
+    return {t.strip() for t in value.split(",")}
+
+
+def is_enabled(target: str) -> bool:
+    return target in _settings["enabled"] or target in _env_targets()
+
+
+def start(target: str, label: str = ""):
+    """
+    Démarre un ProfileRun si `target` est activé, sinon retourne NULL_RUN (aucun coût).
+    À appeler depuis le thread à profiler : cProfile ne suit que le thread courant.
+    """
+    if not is_enabled(target):
+        return NULL_RUN
+    run = ProfileRun(target, label, _settings["dir"], _settings["frame_sample_every"], _settings["top"])
+    run.begin()
+    return run
+
+
+def peak_rss_mb():
+    """
+    Pic de mémoire résidente du processus depuis son lancement (Mo), ou None si indisponible.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss est en octets sur macOS, en Ko ailleurs
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _tracemalloc_acquire():
+    global _tracing_users, _tracing_owned
+    with _lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing_owned = True
+        _tracing_users += 1
+
+
+def _tracemalloc_release():
+    global _tracing_users, _tracing_owned
+    with _lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and _tracing_owned:
+            tracemalloc.stop()
+            _tracing_owned = False
+
+
+class _NullRun:
+    """
+    Profilage désactivé : toutes les méthodes sont sans effet.
+    """
+
+    enabled = False
+    folder = None
+
+    def frame(self, **timings):
+        pass
+
+    def mark(self, label: str):
+        pass
+
+    def finish(self):
+        return None
+
+
+NULL_RUN = _NullRun()
+
+
+class ProfileRun:
+    """
+    Un enregistrement de diagnostic : dump cProfile, snapshots tracemalloc en début et
+    fin de session, trace de timing échantillonnée par frame et jalons.
+    Écrit dans <dir>/<YYYYmmdd-HHMMSS>-<cible>[-<label>]/ :
+      profile.prof (pstats / snakeviz), profile.txt, tracemalloc_start.txt,
+      tracemalloc_end.txt, tracemalloc_diff.txt, frames.csv, summary.json.
+    """
+
+    enabled = True
+
+    def __init__(self, target: str, label: str, root: str, sample_every: int = 10, top: int = 40):
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in label)
+        self.folder = os.path.join(root, f"{stamp}-{target}" + (f"-{safe}" if safe else ""))
+        self.target = target
+        self.label = label
+        self.sample_every = sample_every
+        self.top = top
+        self.frames = 0
+        self.samples = []     # [dict] : une ligne de frames.csv
+        self.marks = []       # [(label, secondes depuis le début)]
+        self.notes = []
+        self._profile = None
+        self._snap_start = None
+        self._t0 = None
+
+    def begin(self):
+        self._t0 = time.perf_counter()
+        _tracemalloc_acquire()
+        self._snap_start = tracemalloc.take_snapshot()
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+            self._profile = profile
+        except ValueError as e:
+            # Un seul profileur actif à la fois (Python >= 3.12) : garder le reste
+            self.notes.append(f"cProfile unavailable: {e}")
+
+    def frame(self, **timings):
+        """
+        Timings (ms) d'une frame ; seule une frame sur sample_every est conservée.
+        """
+        self.frames += 1
+        if self.frames % self.sample_every:
+            return
+        row = {"frame": self.frames, "t": round(time.perf_counter() - self._t0, 4)}
+        row.update(timings)
+        self.samples.append(row)
+
+    def mark(self, label: str):
+        self.marks.append((label, round(time.perf_counter() - self._t0, 4)))
+
+    def finish(self):
+        """
+        Arrête la collecte et écrit le dossier de diagnostic ; retourne son chemin.
+        """
+        if self._profile is not None:
+            self._profile.disable()
+        elapsed = time.perf_counter() - self._t0
+        snap_end = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        _tracemalloc_release()
+
+        os.makedirs(self.folder, exist_ok=True)
+        if self._profile is not None:
+            self._profile.dump_stats(os.path.join(self.folder, "profile.prof"))
+            out = io.StringIO()
+            pstats.Stats(self._profile, stream=out).sort_stats("cumulative").print_stats(self.top)
+            self._write("profile.txt", out.getvalue())
+
+        self._write("tracemalloc_start.txt", self._format_stats(self._snap_start.statistics("lineno")))
+        self._write("tracemalloc_end.txt", self._format_stats(snap_end.statistics("lineno")))
+        self._write("tracemalloc_diff.txt", self._format_stats(snap_end.compare_to(self._snap_start, "lineno")))
+
+        if self.samples:
+            fields = []
+            for row in self.samples:
+                fields.extend(k for k in row if k not in fields)
+            with open(os.path.join(self.folder, "frames.csv"), "w", newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=fields)
+                writer.writeheader()
+                writer.writerows(self.samples)
+
+        summary = {
+            "target": self.target,
+            "label": self.label,
+            "seconds": round(elapsed, 3),
+            "frames": self.frames,
+            "fps": round(self.frames / elapsed, 2) if elapsed > 0 else None,
+            "frame_sample_every": self.sample_every,
+            "traced_memory_mb": round(current / (1024 * 1024), 2),
+            "traced_peak_mb": round(peak / (1024 * 1024), 2),
+            "marks": self.marks,
+            "notes": self.notes,
+        }
+        self._write("summary.json", json.dumps(summary, indent=2))
+        return self.folder
+
+    def _format_stats(self, stats) -> str:
+        return "\n".join(str(s) for s in stats[:self.top]) + "\n"
+
+    def _write(self, name: str, text: str):
+        with open(os.path.join(self.folder, name), "w") as f:
+            f.write(text)
@@ -0,0 +1,59 @@
+from startup_profile import lazy_import
+
+cv2 = lazy_import("cv2")
+
+class FacePreprocessor:
+    """
+    Étape de prétraitement commune à FaceTrainer et AttendanceRecorder.
+    Chaque crop de visage (niveaux de gris) est :
+      - redimensionné à une taille canonique (par défaut 100x100),
+      - égalisé avec CLAHE (mêmes paramètres à l'enrôlement et à la reconnaissance).
+    Le coût LBPH par visage reste ainsi constant, quelle que soit la distance à la caméra.
+    """
+
+    DEFAULT_SIZE = (100, 100)
+
+    def __init__(self, size=DEFAULT_SIZE, clip_limit: float = 2.0, tile_grid_size=(8, 8)):
+        self.size = (int(size[0]), int(size[1]))
+        self.clip_limit = clip_limit
+        self.tile_grid_size = tuple(tile_grid_size)
+        self._clahe = None  # créé au premier usage (import cv2 différé)
+
+    @classmethod
+    def from_config(cls, cfg: dict):
+        """
+        Construit un préprocesseur depuis la section "preprocessing" de config.json, ex.
+          { "face_size": [100, 100], "clahe_clip_limit": 2.0, "clahe_tile_grid": [8, 8] }
+        """
+        cfg = cfg or {}
+        return cls(
+            size=cfg.get("face_size", cls.DEFAULT_SIZE),
+            clip_limit=cfg.get("clahe_clip_limit", 2.0),
+            tile_grid_size=cfg.get("clahe_tile_grid", (8, 8))
+        )
+
+    def resize(self, gray_face):
+        """
+        Redimensionne un crop à la taille canonique (INTER_AREA en réduction).
+        Retourne le crop tel quel s'il est déjà à la bonne taille.
+        """
+        h, w = gray_face.shape[:2]
+        if (w, h) == self.size:
+            return gray_face
+        interp = cv2.INTER_AREA if w > self.size[0] else cv2.INTER_LINEAR
+        return cv2.resize(gray_face, self.size, interpolation=interp)
+
+    def prepare(self, gray_face):
+        """
+        Prétraitement complet d'un crop brut issu du détecteur : resize + CLAHE.
+        """
+        if self._clahe is None:
+            self._clahe = cv2.createCLAHE(clipLimit=self.clip_limit, tileGridSize=self.tile_grid_size)
+        return self._clahe.apply(self.resize(gray_face))
+
+    def prepare_stored(self, gray_face):
+        """
+        Prétraitement d'une image déjà enregistrée dans TrainingImage/ (CLAHE déjà appliqué
+        à la capture) : seul le redimensionnement est nécessaire.
+        """
+        return self.resize(gray_face)
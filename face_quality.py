@@ -0,0 +1,76 @@
+from startup_profile import lazy_import
+
+cv2 = lazy_import("cv2")
+
+
+class FaceQualityGate:
+    """
+    Filtre de qualité rapide, commun à FaceTrainer (enrôlement) et AttendanceRecorder,
+    appliqué au crop brut avant le prétraitement et le predict LBPH.
+    Les mesures sont faites sur une vignette réduite (sample_size x sample_size) :
+      - taille du visage détecté (côté en pixels >= min_size) : les détections à peine
+        au-dessus du minSize du détecteur (100 px) sont trop petites pour un LBPH fiable,
+      - netteté : variance du Laplacien >= min_sharpness (flou de bougé, mise au point),
+      - luminosité moyenne dans [min_brightness, max_brightness] (contre-jour, surexposition).
+    Un crop refusé n'est ni enregistré à l'enrôlement, ni soumis à la reconnaissance.
+    """
+
+    DEFAULT_MIN_SIZE = 110  # au-dessus du minSize=(100, 100) de detectMultiScale
+
+    def __init__(self, min_size: int = DEFAULT_MIN_SIZE, min_sharpness: float = 15.0,
+                 min_brightness: float = 30.0, max_brightness: float = 225.0,
+                 sample_size: int = 48, enabled: bool = True):
+        self.min_size = int(min_size)
+        self.min_sharpness = float(min_sharpness)
+        self.min_brightness = float(min_brightness)
+        self.max_brightness = float(max_brightness)
+        self.sample_size = int(sample_size)
+        self.enabled = enabled
+
+    @classmethod
+    def from_config(cls, cfg: dict):
+        """
+        Section "quality" de config.json, ex.
+          { "min_size": 110, "min_sharpness": 15, "min_brightness": 30, "max_brightness": 225 }
+        """
+        cfg = cfg or {}
+        return cls(
+            min_size=cfg.get("min_size", cls.DEFAULT_MIN_SIZE),
+            min_sharpness=cfg.get("min_sharpness", 15.0),
+            min_brightness=cfg.get("min_brightness", 30.0),
+            max_brightness=cfg.get("max_brightness", 225.0),
+            sample_size=cfg.get("sample_size", 48),
+            enabled=cfg.get("enabled", True)
+        )
+
+    def check(self, gray_face, min_size: int = None):
+        """
+        Retourne None si le crop est exploitable, sinon le motif du refus
+        ("size", "dark", "bright" ou "blur"). `min_size` remplace self.min_size
+        (détection par tuiles, où les visages du fond sont volontairement plus petits).
+        """
+        if not self.enabled:
+            return None
+        h, w = gray_face.shape[:2]
+        if min(w, h) < (self.min_size if min_size is None else min_size):
+            return "size"
+        small = cv2.resize(gray_face, (self.sample_size, self.sample_size), interpolation=cv2.INTER_AREA)
+        brightness = float(small.mean())
+        if brightness < self.min_brightness:
+            return "dark"
+        if brightness > self.max_brightness:
+            return "bright"
+        if cv2.Laplacian(small, cv2.CV_64F).var() < self.min_sharpness:
+            return "blur"
+        return None
+
+
+def format_skips(skips: dict, total: int) -> str:
+    """
+    "quality skipped 12% (blur 30, dark 4)" pour un compteur {motif: nombre}.
+    """
+    skipped = sum(skips.values())
+    if not total or not skipped:
+        return ""
+    detail = ", ".join(f"{reason} {n}" for reason, n in sorted(skips.items(), key=lambda kv: -kv[1]))
+    return f"quality skipped {100 * skipped / total:.0f}% ({detail})"
@@ -1,20 +1,52 @@
-import os, csv, cv2
-import numpy as np
-from PIL import Image
-import pandas as pd
+import os, csv, time
 import tkinter as tk
 from tkinter import messagebox
 
+import diagnostics
+from startup_profile import lazy_import
+from face_preprocessing import FacePreprocessor
+from face_quality import FaceQualityGate
+from recognition_context import create_lbph_recognizer
+
+# Modules lourds importés au premier usage (capture / entraînement)
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+Image = lazy_import("PIL.Image")
+
+class TrainingCancelled(Exception):
+    """
+    Entraînement interrompu via cancel_event ; le modèle existant est conservé.
+    """
+
+
 class FaceTrainer:
     """
     Gère la capture de 100 images d’un utilisateur via webcam et l’entraînement LBPH.
     Stocke StudentDetails.csv et range les images dans TrainingImage/{user_id}/.
+    Les crops sont normalisés par le FacePreprocessor partagé avec AttendanceRecorder,
+    et filtrés par le même FaceQualityGate (un crop refusé à l'appel l'est aussi ici).
     """
 
-    def __init__(self, haar_path: str, training_dir: str, details_csv: str):
+    CHUNK_SIZE = 1000  # images décodées à la fois pendant l'entraînement
+    # Images gardées par étudiant pour le modèle : LBPH stocke un histogramme par image
+    # (64 Ko en grille 8x8), la mémoire suit donc étudiants x plafond et non l'enrôlement brut
+    MAX_IMAGES_PER_STUDENT = 20
+
+    def __init__(self, haar_path: str, training_dir: str, details_csv: str,
+                 preprocessor: FacePreprocessor = None, chunk_size: int = None,
+                 quality: FaceQualityGate = None, max_per_student: int = None):
+        """
+        chunk_size: taille des lots de l'entraînement en flux (0 = tout charger d'un coup).
+        max_per_student: images par étudiant retenues pour l'entraînement (0 = toutes).
+        """
         self.haar_path = haar_path
         self.training_dir = training_dir
         self.details_csv = details_csv
+        self.preprocessor = preprocessor or FacePreprocessor()
+        self.quality = quality or FaceQualityGate()
+        self.chunk_size = self.CHUNK_SIZE if chunk_size is None else chunk_size
+        self.max_per_student = self.MAX_IMAGES_PER_STUDENT if max_per_student is None else max_per_student
         os.makedirs(self.training_dir, exist_ok=True)
         os.makedirs(os.path.dirname(self.details_csv), exist_ok=True)
 
@@ -39,12 +71,24 @@ class FaceTrainer:
             serials = [int(row[0]) for row in reader if row]
         return max(serials, default=0) + 1
 
-    def capture_images(self, user_id: str, name: str) -> bool:
+    CAPTURE_FPS = 15  # cadence max de l'abonnement d'enrôlement à une caméra partagée
+
+    def capture_images(self, user_id: str, name: str, camera=None) -> bool:
         """
         Capture 100 images du visage de l'utilisateur dans training_dir/{user_id}/.
         Vérifie ID à 7 chiffres et nom alphabétique.
         Met à jour StudentDetails.csv.
+        `camera` (FrameGrabber du RecognitionContext) permet de s'abonner à la caméra
+        partagée, y compris pendant une prise d'appel ; sinon la caméra 0 est ouverte ici.
+        Si le profilage "capture" est actif (voir diagnostics), la capture est profilée.
         """
+        prof = diagnostics.start("capture", user_id)
+        try:
+            return self._capture_images(user_id, name, camera, prof)
+        finally:
+            prof.finish()
+
+    def _capture_images(self, user_id: str, name: str, camera, prof) -> bool:
         if not self.check_haarcascade():
             return False
 
@@ -69,28 +113,53 @@ class FaceTrainer:
         user_folder = os.path.join(self.training_dir, user_id)
         os.makedirs(user_folder, exist_ok=True)
 
-        cam = cv2.VideoCapture(0)
-        if not cam.isOpened():
-            messagebox.showerror("Error", "Unable to open camera")
-            return False
+        sub = cam = None
+        if camera is not None:
+            sub = camera.subscribe("enrollment", max_fps=self.CAPTURE_FPS)
+        else:
+            cam = cv2.VideoCapture(0)
+            if not cam.isOpened():
+                messagebox.showerror("Error", "Unable to open camera")
+                return False
 
         detector = cv2.CascadeClassifier(self.haar_path)
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
 
         count = 0
+        rejected = 0
         total_images = 100
         while count < total_images:
-            ret, frame = cam.read()
+            t_read = time.perf_counter()
+            if sub is not None:
+                frame, _ = sub.read_latest()
+                ret = frame is not None
+            else:
+                ret, frame = cam.read()
             if not ret:
                 continue
+            t_detect = time.perf_counter()
             gray_full = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
             faces = detector.detectMultiScale(
                 gray_full, scaleFactor=1.1, minNeighbors=6, minSize=(100,100)
             )
+            # La frame partagée est en lecture seule : dessiner sur une copie
+            if sub is not None:
+                frame = frame.copy()
+            t_save = time.perf_counter()
+            rejected_before = rejected
             for (x, y, w, h) in faces:
                 face_roi = gray_full[y:y+h, x:x+w]
-                # Appliquer CLAHE
-                face_eq = clahe.apply(face_roi)
+                reason = self.quality.check(face_roi)
+                if reason is not None:
+                    # Crop flou / mal exposé / trop petit : ni enregistré ni compté
+                    rejected += 1
+                    cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 0, 255), 2)
+                    cv2.putText(
+                        frame, reason, (x, y-10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2
+                    )
+                    continue
+                # Resize à la taille canonique + CLAHE
+                face_eq = self.preprocessor.prepare(face_roi)
                 count += 1
                 # Nom du fichier: {name}.{serial}.{user_id}.{count}.jpg
                 path = os.path.join(user_folder, f"{name}.{serial}.{user_id}.{count}.jpg")
@@ -100,15 +169,28 @@ class FaceTrainer:
                     frame, f"{count}/{total_images}", (x, y-10),
                     cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255,0,0), 2
                 )
+            prof.frame(
+                read_ms=(t_detect - t_read) * 1000,
+                detect_ms=(t_save - t_detect) * 1000,
+                save_ms=(time.perf_counter() - t_save) * 1000,
+                faces=len(faces),
+                rejected=rejected - rejected_before
+            )
             cv2.imshow("Capturing Faces", frame)
             if cv2.waitKey(50) & 0xFF == ord('q'):
                 break
 
-        cam.release()
+        if sub is not None:
+            sub.close()
+        else:
+            cam.release()
         cv2.destroyAllWindows()
 
         if count < total_images:
-            messagebox.showwarning("Incomplete", f"Only {count} images captured. Please retry.")
+            messagebox.showwarning(
+                "Incomplete",
+                f"Only {count} images captured ({rejected} rejected as blurry, too dark/bright or too small). Please retry."
+            )
             return False
 
         # Mettre à jour StudentDetails.csv
@@ -131,34 +213,154 @@ class FaceTrainer:
         """
         Entraîne le modèle LBPH sur toutes les images dans training_dir/*/*.jpg.
         Sauvegarde le modèle sous Trainer.yml.
+        Les images sont décodées par lots de chunk_size (train puis update) : seul un lot
+        est en mémoire à la fois. Le modèle LBPH garde un histogramme par image (64 Ko
+        avec la grille 8x8 par défaut) : au plus max_per_student images réparties sur la
+        capture sont retenues par étudiant, ce qui borne le modèle à étudiants x plafond.
+        Retourne {images, skipped, seconds, images_per_second, peak_rss_mb}, ou None en cas d'échec.
+        Si le profilage "train" est actif (voir diagnostics), l'entraînement est profilé.
         """
+        prof = diagnostics.start("train")
+        try:
+            return self._train_model(model_output_path, status_label, prof)
+        finally:
+            prof.finish()
+
+    def _train_model(self, model_output_path: str, status_label: tk.Label, prof):
         if not self.check_haarcascade():
             return
+        try:
+            stats = self.build_model(model_output_path, prof=prof)
+        except RuntimeError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        except ValueError:
+            messagebox.showwarning("No Data", "No images to train. Please register first.")
+            return
+        status_label.config(text=self.training_summary(stats), fg="green")
+        return stats
+
+    def build_model(self, model_output_path: str, progress=None, cancel_event=None,
+                    prof=diagnostics.NULL_RUN) -> dict:
+        """
+        Cœur de l'entraînement, sans interface (utilisable depuis un thread).
+        Le modèle est écrit dans un fichier temporaire puis renommé (os.replace) :
+        un lecteur de Trainer.yml ne voit jamais de fichier partiel.
+        progress(done, total) est appelé après chaque lot ; cancel_event (threading.Event)
+        est vérifié entre les lots et lève TrainingCancelled.
+        Lève RuntimeError si LBPH est indisponible, ValueError s'il n'y a aucune image.
+        """
+        try:
+            recognizer = create_lbph_recognizer()
+        except Exception as e:
+            raise RuntimeError("LBPHFaceRecognizer not found. Install opencv-contrib-python.") from e
 
-        # Créer recognizer LBPH
+        t0 = time.perf_counter()
+        all_paths = self.training_image_paths()
+        paths = self.select_per_student(all_paths, self.max_per_student)
+        expected = len(paths)
+        chunk = self.chunk_size
+        if chunk and expected:
+            # Lots plus petits sur les jeux moyens : progression et annulation plus fines
+            chunk = min(chunk, max(100, expected // 20))
+        total = 0
+        for faces, ids in self.iter_training_data(chunk_size=chunk, paths=paths):
+            if cancel_event is not None and cancel_event.is_set():
+                raise TrainingCancelled()
+            # Premier lot : train ; lots suivants : update (ajout d'histogrammes)
+            if total == 0:
+                recognizer.train(faces, np.array(ids))
+            else:
+                recognizer.update(faces, np.array(ids))
+            total += len(faces)
+            del faces, ids
+            if progress is not None:
+                progress(total, expected)
+        prof.mark("trained")
+
+        if not total:
+            raise ValueError("No images to train")
+        if cancel_event is not None and cancel_event.is_set():
+            raise TrainingCancelled()
+
+        os.makedirs(os.path.dirname(model_output_path) or ".", exist_ok=True)
+        # Même extension que la cible : OpenCV choisit le format d'après elle
+        base, ext = os.path.splitext(model_output_path)
+        tmp_path = f"{base}.tmp{ext}"
         try:
-            recognizer = cv2.face.LBPHFaceRecognizer_create()
-        except AttributeError:
-            try:
-                recognizer = cv2.createLBPHFaceRecognizer()
-            except Exception:
-                messagebox.showerror(
-                    "Error",
-                    "LBPHFaceRecognizer not found. Install opencv-contrib-python."
-                )
-                return
+            recognizer.write(tmp_path)
+            os.replace(tmp_path, model_output_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        prof.mark("written")
+        elapsed = time.perf_counter() - t0
+        return {
+            "images": total,
+            "skipped": len(all_paths) - expected,
+            "seconds": elapsed,
+            "images_per_second": total / elapsed if elapsed > 0 else None,
+            "peak_rss_mb": diagnostics.peak_rss_mb(),
+        }
 
-        # Récupérer tous les chemins d'images JPG
+    @staticmethod
+    def training_summary(stats: dict) -> str:
+        text = f"Training completed: {stats['images']} images"
+        if stats.get("skipped"):
+            text += f" ({stats['skipped']} over the per-student cap)"
+        if stats.get("images_per_second"):
+            text += f", {stats['images_per_second']:.0f} img/s"
+        if stats.get("peak_rss_mb") is not None:
+            text += f", peak RSS {stats['peak_rss_mb']:.0f} MB"
+        return text
+
+    def training_image_paths(self):
+        """
+        Retourne tous les chemins d'images JPG de training_dir.
+        """
         image_paths = []
         for root, _, files in os.walk(self.training_dir):
             for f in files:
                 if f.lower().endswith(".jpg"):
                     image_paths.append(os.path.join(root, f))
+        return image_paths
+
+    @staticmethod
+    def select_per_student(paths, max_per_student: int):
+        """
+        Garde au plus max_per_student images par SERIAL NO., réparties régulièrement
+        sur la capture (numéro d'image croissant) pour conserver la variété des poses.
+        0 garde tout. Les noms hors format name.serial.user_id.count.jpg sont conservés
+        (iter_training_data les ignore).
+        """
+        if not max_per_student:
+            return list(paths)
+        by_serial, others = {}, []
+        for path in paths:
+            parts = os.path.basename(path).split(".")
+            if len(parts) >= 4 and parts[1].isdigit():
+                count = int(parts[3]) if parts[3].isdigit() else 0
+                by_serial.setdefault(parts[1], []).append((count, path))
+            else:
+                others.append(path)
+        selected = []
+        for images in by_serial.values():
+            images.sort()
+            n = len(images)
+            if n > max_per_student:
+                images = [images[i * n // max_per_student] for i in range(max_per_student)]
+            selected.extend(path for _, path in images)
+        return selected + others
 
+    def iter_training_data(self, user_ids=None, chunk_size: int = 0, paths=None):
+        """
+        Charge les images prétraitées et leurs labels (SERIAL NO.) par lots de
+        chunk_size images (0 = un seul lot). Génère des tuples (faces, ids).
+        Si user_ids est fourni, ne garde que les images de ces ID (galeries de cours).
+        paths restreint le parcours à ces fichiers (défaut : tout training_dir).
+        """
         faces, ids = [], []
-        for img_path in image_paths:
-            img = Image.open(img_path).convert("L")
-            np_img = np.array(img, "uint8")
+        for img_path in (self.training_image_paths() if paths is None else paths):
             # Le nom du fichier: name.serial.user_id.count.jpg => split par '.'
             parts = os.path.basename(img_path).split(".")
             if len(parts) >= 4:
@@ -169,14 +371,50 @@ class FaceTrainer:
                     continue
             else:
                 continue
-            faces.append(np_img)
+            if user_ids is not None and parts[2] not in user_ids:
+                continue
+            img = Image.open(img_path).convert("L")
+            faces.append(self.preprocessor.prepare_stored(np.array(img, "uint8")))
             ids.append(sid)
+            if chunk_size and len(faces) >= chunk_size:
+                yield faces, ids
+                faces, ids = [], []
+        if faces:
+            yield faces, ids
 
-        if not faces:
-            messagebox.showwarning("No Data", "No images to train. Please register first.")
-            return
+    def collect_training_data(self, user_ids=None):
+        """
+        Charge toutes les images prétraitées en mémoire (galeries de cours, benchmarks).
+        Retourne (faces, ids).
+        """
+        faces, ids = [], []
+        for chunk_faces, chunk_ids in self.iter_training_data(user_ids):
+            faces.extend(chunk_faces)
+            ids.extend(chunk_ids)
+        return faces, ids
 
-        recognizer.train(faces, np.array(ids))
-        os.makedirs(os.path.dirname(model_output_path), exist_ok=True)
-        recognizer.write(model_output_path)
-        status_label.config(text="Training completed", fg="green")
+    MIGRATE_PROGRESS_EVERY = 200  # images entre deux appels de progress pendant la migration
+
+    def migrate_training_images(self, progress=None, cancel_event=None) -> int:
+        """
+        Migration vers la taille canonique : réécrit sur place chaque image de
+        training_dir qui n'est pas déjà au format du préprocesseur.
+        progress(done, total) est appelé toutes les MIGRATE_PROGRESS_EVERY images ;
+        cancel_event est vérifié entre deux images et lève TrainingCancelled (les images
+        déjà réécrites le restent, une nouvelle migration reprend les autres).
+        Retourne le nombre d'images réécrites. Un réentraînement doit suivre.
+        """
+        paths = self.training_image_paths()
+        migrated = 0
+        for done, path in enumerate(paths, 1):
+            if cancel_event is not None and cancel_event.is_set():
+                raise TrainingCancelled()
+            img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+            if img is not None:
+                resized = self.preprocessor.prepare_stored(img)
+                if resized is not img:
+                    cv2.imwrite(path, resized)
+                    migrated += 1
+            if progress is not None and (done % self.MIGRATE_PROGRESS_EVERY == 0 or done == len(paths)):
+                progress(done, len(paths))
+        return migrated
@@ -0,0 +1,111 @@
+import os, re, json, hashlib, threading
+
+from startup_profile import lazy_import
+from recognition_context import create_lbph_recognizer, lbph_params
+
+np = lazy_import("numpy")
+
+
+class GalleryManager:
+    """
+    Galeries de reconnaissance restreintes au roster d'un cours (SessionName).
+    Chaque galerie est un modèle LBPH entraîné uniquement sur les images des
+    étudiants inscrits : le coût de predict dépend de la taille de la classe et
+    non plus de celle de l'établissement.
+    Les galeries sont mises en cache en mémoire et sur disque (galleries_dir/<cours>.yml
+    + manifeste JSON) et reconstruites quand le roster ou le modèle complet change.
+    """
+
+    def __init__(self, trainer, model_path: str, galleries_dir: str):
+        """
+        trainer: FaceTrainer (fournit collect_training_data et le préprocesseur)
+        model_path: modèle complet (Trainer.yml) ; son mtime sert de version des images.
+        """
+        self.trainer = trainer
+        self.model_path = model_path
+        self.galleries_dir = galleries_dir
+        self._cache = {}  # { session_name: (signature, recognizer) }
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _safe_name(session_name: str) -> str:
+        return re.sub(r"[^A-Za-z0-9_-]+", "_", session_name) or "_"
+
+    def _signature(self, roster) -> str:
+        try:
+            model_mtime = os.path.getmtime(self.model_path)
+        except OSError:
+            model_mtime = None
+        digest = hashlib.sha1("\n".join(sorted(roster)).encode()).hexdigest()
+        # Les paramètres LBPH en font partie : un changement de grille reconstruit les galeries
+        params = "-".join(str(v) for v in lbph_params().values())
+        return f"{digest}:{model_mtime}:{params}"
+
+    def get_gallery(self, session_name: str, roster):
+        """
+        Retourne un recognizer LBPH restreint à `roster` (ensemble d'ID), ou None
+        si aucun étudiant du roster n'a d'images.
+        """
+        if not roster:
+            return None
+        roster = {str(r) for r in roster}
+        signature = self._signature(roster)
+        with self._lock:
+            cached = self._cache.get(session_name)
+            if cached and cached[0] == signature:
+                return cached[1]
+            recognizer = self._load_from_disk(session_name, signature)
+            if recognizer is None:
+                recognizer = self._build(session_name, roster, signature)
+            if recognizer is not None:
+                self._cache[session_name] = (signature, recognizer)
+            return recognizer
+
+    def _paths(self, session_name: str):
+        base = os.path.join(self.galleries_dir, self._safe_name(session_name))
+        return base + ".yml", base + ".json"
+
+    def _load_from_disk(self, session_name: str, signature: str):
+        model_file, manifest_file = self._paths(session_name)
+        try:
+            with open(manifest_file) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get("signature") != signature or not os.path.isfile(model_file):
+            return None
+        recognizer = create_lbph_recognizer()
+        recognizer.read(model_file)
+        return recognizer
+
+    def _build(self, session_name: str, roster, signature: str):
+        faces, ids = self.trainer.collect_training_data(user_ids=roster)
+        if not faces:
+            return None
+        recognizer = create_lbph_recognizer()
+        recognizer.train(faces, np.array(ids))
+        os.makedirs(self.galleries_dir, exist_ok=True)
+        model_file, manifest_file = self._paths(session_name)
+        recognizer.write(model_file)
+        with open(manifest_file, "w") as f:
+            json.dump({
+                "session_name": session_name,
+                "signature": signature,
+                "students": len(roster),
+                "images": len(faces)
+            }, f, indent=2)
+        return recognizer
+
+    def prebuild_async(self, rosters: dict):
+        """
+        Construit en arrière-plan les galeries de tous les cours ({SessionName: roster}).
+        """
+        def run():
+            for session_name, roster in rosters.items():
+                try:
+                    self.get_gallery(session_name, roster)
+                except Exception:
+                    pass
+        th = threading.Thread(target=run, daemon=True)
+        th.start()
+        return th
@@ -1,16 +1,33 @@
 import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog, filedialog
+from tkinter import messagebox, simpledialog, filedialog
 import datetime
 import time
 from pathlib import Path
-from PIL import Image, ImageTk
 import json
+import sys
 import threading
 
+import startup_profile
+import diagnostics
+from startup_profile import lazy_import
+
 from password_manager import PasswordManager
 from face_trainer import FaceTrainer
 from attendance_recorder import AttendanceRecorder
 from schedule_manager import ScheduleManager
+from face_preprocessing import FacePreprocessor
+from face_quality import FaceQualityGate
+from session_scheduler import SessionScheduler
+from recognition_context import RecognitionContext, configure_lbph
+from gallery_manager import GalleryManager
+from ui_bridge import UIUpdateQueue, busy_label
+from attendance_panel import AttendancePanel
+from preview import PreviewBuffer, PreviewPanel
+from training_job import TrainingJob
+
+# PIL n'est importé qu'une fois la fenêtre de login affichée (logo)
+Image = lazy_import("PIL.Image")
+ImageTk = lazy_import("PIL.ImageTk")
 
 class FaceAttendanceApp(tk.Tk):
     """
@@ -37,53 +54,174 @@ class FaceAttendanceApp(tk.Tk):
             except tk.TclError:
                 pass
 
+        # Lecture config.json (réglages + chemin du planning)
+        self.config_path = Path("config.json")
+        self.app_config = self._read_config()
+        # Profilage opt-in ("profiling" dans config.json, FACEATTEND_PROFILE, ou menu Diagnostics)
+        diagnostics.configure(self.app_config.get("profiling"))
+
         # Instancier les gestionnaires
         self.pwd_mgr = PasswordManager("TrainingImageLabel/credentials.json")
+        # Prétraitement commun (taille canonique + CLAHE) pour capture et reconnaissance
+        self.preprocessor = FacePreprocessor.from_config(self.app_config.get("preprocessing"))
+        # Paramètres LBPH et seuil de reconnaissance (choisis avec lbph_sweep.py)
+        recognition_cfg = self.app_config.get("recognition", {})
+        configure_lbph(recognition_cfg)
+        # Même filtre de qualité à l'enrôlement et à l'appel
+        self.quality_gate = FaceQualityGate.from_config(self.app_config.get("quality"))
         self.trainer = FaceTrainer(
             haar_path="haarcascade_frontalface_default.xml",
             training_dir="TrainingImage",
-            details_csv="StudentDetails/StudentDetails.csv"
+            details_csv="StudentDetails/StudentDetails.csv",
+            preprocessor=self.preprocessor,
+            quality=self.quality_gate,
+            chunk_size=self.app_config.get("training", {}).get("chunk_size"),
+            max_per_student=self.app_config.get("training", {}).get("max_per_student")
         )
-        self.recorder = AttendanceRecorder(
+        # Contexte de reconnaissance résident (modèle, détails, cascade, caméras)
+        self.recognition_ctx = RecognitionContext(
             haar_path="haarcascade_frontalface_default.xml",
             model_path="TrainingImageLabel/Trainer.yml",
-            details_csv="StudentDetails/StudentDetails.csv"
+            details_csv="StudentDetails/StudentDetails.csv",
+            camera_settings=self.app_config.get("cameras")
         )
         self.schedule_mgr = ScheduleManager()
+        self.recorder = AttendanceRecorder(
+            haar_path="haarcascade_frontalface_default.xml",
+            model_path="TrainingImageLabel/Trainer.yml",
+            details_csv="StudentDetails/StudentDetails.csv",
+            preprocessor=self.preprocessor,
+            quality=self.quality_gate,
+            context=self.recognition_ctx,
+            event_log=bool(self.app_config.get("event_log", True)),
+            threshold=recognition_cfg.get("threshold"),
+            schedule=self.schedule_mgr,
+            galleries=GalleryManager(
+                self.trainer,
+                model_path="TrainingImageLabel/Trainer.yml",
+                galleries_dir="TrainingImageLabel/galleries"
+            )
+        )
         self.schedule_path = None  # chemin du CSV de planning chargé
-
-        # Chargement config (p. ex. schedule path)
-        self.config_path = Path("config.json")
-        self._load_config()
+        self.rosters_path = None   # chemin du CSV de rosters (SessionName,ID)
+        # Planificateur multi-salles (tas d'événements start/stop, lancement dédupliqué)
+        self.scheduler = SessionScheduler(self.schedule_mgr, self._launch_recorder)
+        self._scheduler_after_id = None
+
+        # Le planning mémorisé (pandas) est chargé après l'affichage du login
+        self._logged_in = False
+        self._deferred_done = False
+
+        # File recorder -> UI, vidée par lots depuis le mainloop
+        self.ui_queue = UIUpdateQueue()
+        # Entraînement en arrière-plan, adopté à chaud par les sessions en cours
+        self.train_job = TrainingJob(
+            self.trainer, "TrainingImageLabel/Trainer.yml", self.ui_queue, self.recognition_ctx
+        )
 
         # Construire (mais masquer) l'interface principale
         self._build_main_interface()
+        self.after(100, self._drain_ui_queue)
         self.withdraw()
 
         # Créer et afficher la fenêtre de login/sign-up
         self._create_login_window()
+        self.login_win.bind("<Map>", self._on_login_visible, add="+")
 
-    def _load_config(self):
+    def _on_login_visible(self, event=None):
         """
-        Charge config JSON (en particulier schedule CSV path) si existant.
+        Premier affichage du login : jalon de démarrage, contrôle du budget,
+        puis chargement différé des ressources lourdes.
+        """
+        if self._deferred_done or (event is not None and event.widget is not self.login_win):
+            return
+        self._deferred_done = True
+        offset = startup_profile.mark("login_visible")
+        budget = float(self.app_config.get("startup_budget_seconds", 2.0))
+        if offset > budget:
+            print(f"[FaceAttend] login window shown after {offset:.2f}s "
+                  f"(budget {budget:.2f}s)", file=sys.stderr)
+        self.after(50, self._deferred_startup)
+        # Pré-chargement du contexte de reconnaissance pendant la saisie du mot de passe
+        self.recognition_ctx.warm_up_async(self._warm_camera_indexes())
+
+    def _warm_camera_indexes(self):
+        """
+        Caméras à ouvrir à l'avance : celles des salles configurées, sinon la caméra 0.
+        """
+        rooms = self.app_config.get("rooms", {})
+        indexes = sorted({int(cfg.get("camera", 0)) for cfg in rooms.values()})
+        return indexes or [0]
+
+    def destroy(self):
+        self.train_job.cancel()
+        self.scheduler.stop_all()
+        self.recognition_ctx.close()
+        super().destroy()
+
+    def _deferred_startup(self):
+        """
+        Ressources non nécessaires à l'affichage du login : logo (PIL), planning (pandas).
+        """
+        self._load_login_logo()
+        self._load_config()
+        self._update_start_button_state()
+        startup_profile.mark("deferred_startup_done")
+        if self._logged_in:
+            self._schedule_auto_attendance()
+
+    def _read_config(self) -> dict:
+        """
+        Lit config.json et retourne son contenu (dict vide si absent ou invalide).
         """
         if self.config_path.exists():
             try:
-                d = json.load(open(self.config_path))
-                sched_path = d.get("schedule_csv")
-                if sched_path and Path(sched_path).exists():
-                    self.schedule_mgr.load_from_csv(sched_path)
-                    self.schedule_path = sched_path
+                with open(self.config_path) as f:
+                    d = json.load(f)
+                if isinstance(d, dict):
+                    return d
+            except Exception:
+                pass
+        return {}
+
+    def _load_config(self):
+        """
+        Charge le planning (clé schedule_csv) et les rosters (clé rosters_csv)
+        référencés par config.json s'ils existent.
+        """
+        sched_path = self.app_config.get("schedule_csv")
+        if sched_path and Path(sched_path).exists():
+            try:
+                self.schedule_mgr.load_from_csv(sched_path)
+                self.schedule_path = sched_path
+            except Exception:
+                pass
+        rosters_path = self.app_config.get("rosters_csv")
+        if rosters_path and Path(rosters_path).exists():
+            try:
+                self.schedule_mgr.load_rosters(rosters_path)
+                self.rosters_path = rosters_path
             except Exception:
                 pass
+        self._prebuild_galleries()
+
+    def _prebuild_galleries(self):
+        """
+        Prépare en arrière-plan les galeries de cours si un modèle existe.
+        """
+        if self.schedule_mgr.rosters and Path(self.recorder.model_path).exists():
+            self.recorder.galleries.prebuild_async(self.schedule_mgr.rosters)
 
     def _save_config(self):
         """
-        Sauvegarde le chemin du schedule CSV si défini.
+        Sauvegarde le chemin du schedule CSV si défini, en conservant les autres réglages.
         """
-        d = {}
+        d = dict(self.app_config)
         if self.schedule_path:
             d['schedule_csv'] = self.schedule_path
+        if self.rosters_path:
+            d['rosters_csv'] = self.rosters_path
+        self.app_config = d
         with open(self.config_path, "w") as f:
             json.dump(d, f, indent=2)
 
@@ -106,15 +244,8 @@ class FaceAttendanceApp(tk.Tk):
         left_frame = tk.Frame(self.login_win, bg="#4A90E2", width=300, height=400)
         left_frame.pack(side="left", fill="y")
 
-        if self.logo_path.exists():
-            try:
-                raw_logo = Image.open(self.logo_path)
-                small_logo = raw_logo.resize((60, 60), Image.ANTIALIAS)
-                self.login_logo_img = ImageTk.PhotoImage(small_logo)
-                logo_lbl = tk.Label(left_frame, image=self.login_logo_img, bg="#4A90E2")
-                logo_lbl.place(x=10, y=10)
-            except Exception:
-                pass
+        # Logo chargé après affichage (voir _load_login_logo)
+        self._login_left_frame = left_frame
 
         lbl_title = tk.Label(
             left_frame,
@@ -167,7 +298,7 @@ class FaceAttendanceApp(tk.Tk):
             self.confirm_pass_ent = tk.Entry(right_frame, show="*", font=entry_font)
             self.confirm_pass_ent.place(x=30, y=235, width=280, height=25)
 
-            tk.Button(
+            self.create_btn = tk.Button(
                 right_frame,
                 text="Create Account",
                 font=btn_font,
@@ -175,7 +306,10 @@ class FaceAttendanceApp(tk.Tk):
                 fg="#ffffff",
                 activebackground="#357ABD",
                 command=self._on_create_user
-            ).place(x=30, y=285, width=280, height=30)
+            )
+            self.create_btn.place(x=30, y=285, width=280, height=30)
+            self.auth_progress_lbl = tk.Label(right_frame, text="", font=("Helvetica", 10), fg="#4A90E2", bg="#ffffff")
+            self.auth_progress_lbl.place(x=30, y=320)
         else:
             # Login form
             data = self.pwd_mgr._load()
@@ -211,7 +345,7 @@ class FaceAttendanceApp(tk.Tk):
             )
             cb.place(x=30, y=205)
 
-            tk.Button(
+            self.login_btn = tk.Button(
                 right_frame,
                 text="Login",
                 font=btn_font,
@@ -219,7 +353,10 @@ class FaceAttendanceApp(tk.Tk):
                 fg="#ffffff",
                 activebackground="#357ABD",
                 command=self._on_verify_login
-            ).place(x=30, y=240, width=280, height=30)
+            )
+            self.login_btn.place(x=30, y=240, width=280, height=30)
+            self.auth_progress_lbl = tk.Label(right_frame, text="", font=("Helvetica", 10), fg="#4A90E2", bg="#ffffff")
+            self.auth_progress_lbl.place(x=30, y=310)
 
             # Forgot password link
             forgot_lbl = tk.Label(
@@ -230,9 +367,33 @@ class FaceAttendanceApp(tk.Tk):
                 bg="#ffffff",
                 cursor="hand2"
             )
-            forgot_lbl.place(x=30, y=285)
+            forgot_lbl.place(x=30, y=280)
             forgot_lbl.bind("<Button-1>", lambda e: self._on_forgot_from_login())
 
+    def _load_login_logo(self):
+        """
+        Place le logo dans le panneau gauche du login (s'il est encore ouvert).
+        """
+        if not self.logo_path.exists() or not self.login_win.winfo_exists():
+            return
+        try:
+            raw_logo = Image.open(self.logo_path)
+            small_logo = raw_logo.resize((60, 60), Image.LANCZOS)
+            self.login_logo_img = ImageTk.PhotoImage(small_logo)
+            logo_lbl = tk.Label(self._login_left_frame, image=self.login_logo_img, bg="#4A90E2")
+            logo_lbl.place(x=10, y=10)
+        except Exception:
+            pass
+
+    def _enter_main_window(self):
+        """
+        Ferme le login, affiche la fenêtre principale et lance l'auto-attendance si dans session.
+        """
+        self._logged_in = True
+        self.login_win.destroy()
+        self.deiconify()
+        self._schedule_auto_attendance()
+
     def _on_create_user(self):
         username = self.new_user_ent.get().strip()
         pw = self.new_pass_ent.get().strip()
@@ -248,29 +409,27 @@ class FaceAttendanceApp(tk.Tk):
             messagebox.showerror("Error", "Passwords do not match.")
             return
 
-        self.pwd_mgr.set_initial_user(username, pw)
-        self.login_win.destroy()
-        self.deiconify()
-        # Lancer auto-attendance si dans session
-        self._schedule_auto_attendance()
+        # Calibrage + hachage bcrypt hors du thread Tk
+        busy = busy_label(self.auth_progress_lbl, [self.create_btn], "Creating account...")
+        self.pwd_mgr.set_initial_user(
+            username, pw, parent=self.login_win, on_done=self._enter_main_window, busy=busy
+        )
 
     def _on_verify_login(self):
         username = self.login_user_ent.get().strip()
         pw = self.login_pass_ent.get().strip()
 
-        if self.pwd_mgr.verify_login(username, pw):
-            data = self.pwd_mgr._load()
-            data["remember_me"] = self.remember_var.get()
-            if data["remember_me"]:
-                data["username"] = username
-            else:
-                data["username"] = ""
-            self.pwd_mgr._save(data)
+        # Vérification bcrypt (et éventuelle mise à niveau du coût) hors du thread Tk
+        busy = busy_label(self.auth_progress_lbl, [self.login_btn], "Verifying...")
+        self.pwd_mgr.login_async(
+            self.login_win, username, pw, self.remember_var.get(), self._on_login_result, busy=busy
+        )
 
-            self.login_win.destroy()
-            self.deiconify()
-            # Lancer auto-attendance si dans session
-            self._schedule_auto_attendance()
+    def _on_login_result(self, ok: bool):
+        if not self.login_win.winfo_exists():
+            return
+        if ok:
+            self._enter_main_window()
         else:
             retry = messagebox.askyesno(
                 "Incorrect Credentials",
@@ -282,11 +441,7 @@ class FaceAttendanceApp(tk.Tk):
                 self.login_pass_ent.delete(0, tk.END)
 
     def _on_forgot_from_login(self):
-        success = self.pwd_mgr.recover_password(self.login_win)
-        if success:
-            self.login_win.destroy()
-            self.deiconify()
-            self._schedule_auto_attendance()
+        self.pwd_mgr.recover_password(self.login_win, on_success=self._enter_main_window)
 
     def _build_main_interface(self):
         header_frame = tk.Frame(self, bg="#f0f0f0")
@@ -322,28 +477,49 @@ class FaceAttendanceApp(tk.Tk):
         self.status_new_lbl = tk.Label(right, text="", fg="green")
         self.status_new_lbl.pack(pady=10)
         tk.Button(right, text="Capture Faces", command=self._on_capture_faces).pack(fill="x", padx=50, pady=5)
-        tk.Button(right, text="Train Model", command=self._on_train_model).pack(fill="x", padx=50, pady=5)
+        self.train_btn = tk.Button(right, text="Train Model", command=self._on_train_model)
+        self.train_btn.pack(fill="x", padx=50, pady=5)
+
+        # Aperçu caméra intégré, cadence plafonnée (config "preview": {"fps": 5, "width": 400})
+        preview_cfg = self.app_config.get("preview", {})
+        self.preview_buffer = PreviewBuffer(fps=float(preview_cfg.get("fps", 5)))
+        self.preview_panel = PreviewPanel(right, self.preview_buffer, width=int(preview_cfg.get("width", 400)))
+        self.preview_panel.pack(expand=True, fill="both", padx=10, pady=10)
 
         # Attendance panel (gauche)
         tk.Label(left, text="Attendance", bg="#dfb", font=("Arial",16)).pack(fill="x")
-        self.tv = ttk.Treeview(left, columns=("Name","Time"), show="tree headings")
-        self.tv.heading('#0', text='ID')
-        self.tv.heading('Name', text='Name')
-        self.tv.heading('Time', text='First Seen')
-        self.tv.column('#0', width=80)
-        self.tv.column('Name', width=120)
-        self.tv.column('Time', width=120)
-        self.tv.pack(expand=True, fill="both", padx=10, pady=10)
+        # Liste paginée : coût Tk borné même pour un amphi de 500 étudiants
+        self.attendance_panel = AttendancePanel(left, page_size=int(self.app_config.get("attendance_page_size", 50)))
+        self.attendance_panel.pack(expand=True, fill="both", padx=10, pady=10)
         self.start_btn = tk.Button(left, text="Start Attendance", command=self._on_start_attendance)
         self.start_btn.pack(fill="x", padx=50, pady=5)
+        tk.Button(left, text="Stop Attendance", command=self._on_stop_attendance).pack(fill="x", padx=50, pady=5)
 
         menubar = tk.Menu(self)
         schedule_menu = tk.Menu(menubar, tearoff=0)
         schedule_menu.add_command(label="Load Schedule", command=self._on_load_schedule)
+        schedule_menu.add_command(label="Load Rosters", command=self._on_load_rosters)
         menubar.add_cascade(label="Schedule", menu=schedule_menu)
+        model_menu = tk.Menu(menubar, tearoff=0)
+        model_menu.add_command(label="Migrate Training Images", command=self._on_migrate_training_images)
+        menubar.add_cascade(label="Model", menu=model_menu)
+        # Activable à chaud : pris en compte à la prochaine session / capture / entraînement
+        diag_menu = tk.Menu(menubar, tearoff=0)
+        self.profile_vars = {}
+        for target, label in (("record", "Profile Attendance Sessions"),
+                              ("capture", "Profile Face Capture"),
+                              ("train", "Profile Training")):
+            var = tk.BooleanVar(value=diagnostics.is_enabled(target))
+            diag_menu.add_checkbutton(
+                label=label, variable=var,
+                command=lambda t=target, v=var: diagnostics.set_enabled(t, v.get())
+            )
+            self.profile_vars[target] = var
+        menubar.add_cascade(label="Diagnostics", menu=diag_menu)
         help_menu = tk.Menu(menubar, tearoff=0)
         help_menu.add_command(label="Change Password", command=lambda: self.pwd_mgr.change_password(self))
         help_menu.add_command(label="Forgot Password", command=lambda: self.pwd_mgr.recover_password(self))
+        help_menu.add_command(label="Calibrate Password Hashing", command=self._on_calibrate_hashing)
         help_menu.add_separator()
         help_menu.add_command(label="Exit", command=self.destroy)
         menubar.add_cascade(label="Help", menu=help_menu)
@@ -352,22 +528,97 @@ class FaceAttendanceApp(tk.Tk):
         # Désactiver Start jusqu'à ce que planning chargé
         self._update_start_button_state()
 
+    UI_DRAIN_INTERVAL_MS = 100
+
+    def _drain_ui_queue(self):
+        """
+        Applique par lots les événements postés par les threads de prise d'appel :
+        une seule insertion Treeview et un seul changement de statut par passage.
+        """
+        rows = []
+        status = None
+        for kind, payload in self.ui_queue.drain():
+            if kind == 'clear':
+                rows = []
+                self.attendance_panel.clear()
+            elif kind == 'mark':
+                rows.append(payload)
+            elif kind == 'status':
+                status = payload
+            elif kind == 'error':
+                self.attendance_panel.add_rows(rows)
+                rows = []
+                messagebox.showerror(payload[0], payload[1], parent=self)
+            elif kind == 'train_done':
+                self.train_btn.config(text="Train Model", state="normal")
+        self.attendance_panel.add_rows(rows)
+        if status is not None:
+            self.status_new_lbl.config(text=status[0], fg=status[1])
+        self.after(self.UI_DRAIN_INTERVAL_MS, self._drain_ui_queue)
+
     def _update_clock(self):
         self.clock_lbl.config(text=time.strftime("%H:%M:%S"))
         self.clock_lbl.after(1000, self._update_clock)
 
+    def _on_calibrate_hashing(self):
+        """
+        Recalibre le coût bcrypt sur cette machine ; le hash stocké est mis à niveau au prochain login.
+        """
+        target_ms = simpledialog.askinteger(
+            "Calibrate Password Hashing",
+            "Target hashing time per login (ms):",
+            initialvalue=int(PasswordManager.DEFAULT_TARGET_SECONDS * 1000),
+            minvalue=50, maxvalue=2000,
+            parent=self
+        )
+        if not target_ms:
+            return
+
+        def done(rounds):
+            self.status_new_lbl.config(
+                text=f"bcrypt cost set to {rounds} (applied at next login)", fg="green"
+            )
+
+        self.status_new_lbl.config(text="Calibrating password hashing...", fg="black")
+        self.pwd_mgr.set_target_latency(target_ms / 1000.0, parent=self, on_done=done)
+
     def _on_capture_faces(self):
         user_id = self.id_entry.get().strip()
         name = self.name_entry.get().strip()
-        success = self.trainer.capture_images(user_id, name)
+        # Abonnement à la caméra 0 partagée : possible même pendant une prise d'appel
+        camera = self.recognition_ctx.acquire_camera(0)
+        if camera is None:
+            messagebox.showerror("Error", "Unable to open camera")
+            return
+        success = self.trainer.capture_images(user_id, name, camera=camera)
         if success:
             self.status_new_lbl.config(text=f"Captured images for ID {user_id}", fg="green")
         else:
             self.status_new_lbl.config(text="Capture failed", fg="red")
 
     def _on_train_model(self):
-        # Entraîne LBPH
-        self.trainer.train_model("TrainingImageLabel/Trainer.yml", self.status_new_lbl)
+        # Entraîne LBPH en arrière-plan ; le même bouton annule l'entraînement en cours
+        if self.train_job.is_running():
+            self.train_job.cancel()
+            self.train_btn.config(text="Cancelling...", state="disabled")
+            return
+        if self.train_job.start():
+            self.train_btn.config(text="Cancel Training")
+
+    def _on_migrate_training_images(self):
+        # Ramène les images existantes à la taille canonique puis réentraîne
+        if self.train_job.is_running():
+            messagebox.showwarning("Training", "Wait for the current training to finish.")
+            return
+        w, h = self.preprocessor.size
+        if not messagebox.askyesno(
+            "Migrate Training Images",
+            f"Resize all training images to {w}x{h} and retrain the model?"
+        ):
+            return
+        # Migration puis réentraînement dans le thread de TrainingJob (progression via ui_queue)
+        if self.train_job.start(migrate=True):
+            self.train_btn.config(text="Cancel Training")
 
     def _on_load_schedule(self):
         path = filedialog.askopenfilename(
@@ -386,6 +637,21 @@ class FaceAttendanceApp(tk.Tk):
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to load schedule:\n{e}")
 
+    def _on_load_rosters(self):
+        path = filedialog.askopenfilename(
+            title="Select rosters CSV (SessionName,ID)",
+            filetypes=[("CSV files","*.csv"),("All files","*.*")]
+        )
+        if path:
+            try:
+                self.schedule_mgr.load_rosters(path)
+                self.rosters_path = path
+                self._save_config()
+                messagebox.showinfo("Rosters Loaded", f"Rosters loaded for {len(self.schedule_mgr.rosters)} courses.")
+                self._prebuild_galleries()
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to load rosters:\n{e}")
+
     def _update_start_button_state(self):
         # Désactive start si pas de planning
         if self.schedule_mgr.df is None:
@@ -393,6 +659,11 @@ class FaceAttendanceApp(tk.Tk):
         else:
             self.start_btn.config(state="normal")
 
+    def _on_stop_attendance(self):
+        # Remplace la touche 'q' de l'ancienne fenêtre cv2.imshow
+        for room in self.scheduler.active_rooms():
+            self.scheduler.stop_room(room)
+
     def _on_start_attendance(self):
         # Manuel, si planning chargé
         if self.schedule_mgr.df is None:
@@ -404,13 +675,10 @@ class FaceAttendanceApp(tk.Tk):
         now = datetime.datetime.now()
         sess = self.schedule_mgr.get_current_session(now)
         if sess is None:
-            today_sessions = self.schedule_mgr.get_today_sessions()
-            next_info = None
-            for s in today_sessions:
-                if s['StartTime'] and s['StartTime'] > now.time():
-                    next_info = f"Next session today at {s['StartTime'].strftime('%H:%M')}: {s.get('SessionName','')}"
-                    break
-            if not next_info:
+            next_dt, next_name = self.schedule_mgr.get_next_phase_start(now)
+            if next_dt and next_dt.date() == now.date():
+                next_info = f"Next session today at {next_dt.strftime('%H:%M')}: {next_name}"
+            else:
                 next_info = "No more sessions today."
             messagebox.showwarning("No Active Session", f"No session is active now.\n{next_info}")
             return
@@ -424,56 +692,70 @@ class FaceAttendanceApp(tk.Tk):
             if seconds < 10:
                 messagebox.showwarning("Short Time", "Less than 10 seconds remaining; skipping attendance.")
                 return
+            end_dt = datetime.datetime.combine(now.date(), phase_end)
+            if not self.scheduler.launch(sess.get('Room', ''), sess['SessionName'], end_dt):
+                messagebox.showwarning("Already Running", "Attendance is already being recorded for this room.")
+                return
             messagebox.showinfo("Starting Attendance", f"Recording attendance for \"{sess['SessionName']}\" until {phase_end.strftime('%H:%M')}. It will run automatically.")
-            # Lancer dans un thread pour ne pas bloquer l'UI
-            threading.Thread(
-                target=self.recorder.record_attendance,
-                args=(self.tv, self.status_new_lbl, seconds),
-                daemon=True
-            ).start()
 
-    def _schedule_auto_attendance(self):
+    def _camera_for_room(self, room: str) -> int:
         """
-        Planifie automatiquement l'appel selon le planning.
-        Calcule le prochain démarrage ou déclenche immédiatement si dans session.
+        Index de caméra associé à une salle (config.json : "rooms": {"B12": {"camera": 1}}).
+        """
+        room_cfg = self.app_config.get("rooms", {}).get(room or "", {})
+        return int(room_cfg.get("camera", 0))
+
+    def _launch_recorder(self, room, session_name, end_dt, stop_event):
+        """
+        Lanceur utilisé par SessionScheduler : démarre la prise d'appel dans un thread
+        pour ne pas bloquer l'UI et retourne ce thread.
         """
-        if self.schedule_mgr.df is None:
-            return
         now = datetime.datetime.now()
-        sess = self.schedule_mgr.get_current_session(now)
-        if sess and sess['status'] == 'ongoing':
-            self._trigger_attendance_if_in_session()
-            phase_end = sess['PhaseEnd']
-            end_dt = datetime.datetime.combine(now.date(), phase_end)
-            delay = (end_dt - now).total_seconds() + 1
-            if delay > 0:
-                # re-planifier après la fin de phase
-                self.after(int(delay*1000), self._schedule_auto_attendance)
+        seconds = (end_dt - now).total_seconds()
+        sess = self.schedule_mgr.get_current_session(now, room)
+        scheduled_start = None
+        if sess and sess.get('StartTime'):
+            scheduled_start = sess['StartTime'].strftime("%H:%M:%S")
+        th = threading.Thread(
+            target=self.recorder.record_attendance,
+            args=(self.ui_queue, seconds),
+            kwargs={
+                "camera_index": self._camera_for_room(room),
+                "stop_event": stop_event,
+                "session_name": session_name,
+                "room": room,
+                "scheduled_start": scheduled_start,
+                "roster": self.schedule_mgr.get_roster(session_name),
+                "preview": self.preview_buffer,
+                "tiling": self.app_config.get("rooms", {}).get(room or "", {}).get("tiled_detection")
+            },
+            daemon=True
+        )
+        th.start()
+        return th
+
+    def _schedule_auto_attendance(self):
+        """
+        (Re)construit la file d'événements du planificateur depuis le planning
+        et démarre la boucle de pompage sur le thread Tk.
+        """
+        if self.schedule_mgr.index is None:
             return
-        # Chercher prochain session
-        today = now.date()
-        next_dt = None
-        # Sessions aujourd'hui
-        for s in self.schedule_mgr.get_today_sessions():
-            if s['StartTime'] and s['StartTime'] > now.time():
-                next_dt = datetime.datetime.combine(today, s['StartTime'])
-                break
+        self.scheduler.reload()
+        self._pump_scheduler()
+
+    def _pump_scheduler(self):
+        """
+        Traite les événements échus puis se réarme pour le prochain (un seul after() en attente).
+        """
+        if self._scheduler_after_id is not None:
+            self.after_cancel(self._scheduler_after_id)
+            self._scheduler_after_id = None
+        self.scheduler.run_pending()
+        next_dt = self.scheduler.next_event_time()
         if next_dt is None:
-            # Chercher dans jours suivants
-            for day_offset in range(1, 8):
-                day = today + datetime.timedelta(days=day_offset)
-                df_day = self.schedule_mgr.df[self.schedule_mgr.df['Weekday'] == day.weekday()]
-                sessions = []
-                for _, row in df_day.iterrows():
-                    tm = row.get('StartTime_obj')
-                    if tm:
-                        sessions.append(tm)
-                if sessions:
-                    sessions.sort()
-                    next_dt = datetime.datetime.combine(day, sessions[0])
-                    break
-        if next_dt:
-            delay = (next_dt - now).total_seconds()
-            if delay <= 0:
-                delay = 1
-            self.after(int(delay*1000), self._schedule_auto_attendance)
+            return
+        delay = (next_dt - datetime.datetime.now()).total_seconds()
+        # Réveil au plus tard toutes les 10 min (veille, changement d'heure)
+        delay = min(max(delay, 0.5), 600)
+        self._scheduler_after_id = self.after(int(delay*1000), self._pump_scheduler)
@@ -0,0 +1,259 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from startup_profile import lazy_import
+from face_preprocessing import FacePreprocessor
+from face_trainer import FaceTrainer
+from recognition_context import LBPH_DEFAULTS, create_lbph_recognizer
+
+np = lazy_import("numpy")
+
+DEFAULT_MAX_FAR = 0.01  # taux de fausses acceptations toléré pour le choix automatique
+DEFAULT_MIN_ACCURACY = 0.8  # en dessous, --write refuse : l'appel ne reconnaîtrait presque personne
+
+
+def parse_grid(text: str):
+    """
+    "4x4,8x8" -> [(4, 4), (8, 8)] ; "8" équivaut à "8x8".
+    """
+    grids = []
+    for item in text.split(","):
+        x, _, y = item.lower().partition("x")
+        grids.append((int(x), int(y or x)))
+    return grids
+
+
+def make_configs(radii, neighbors, grids):
+    return [
+        {"radius": r, "neighbors": n, "grid_x": gx, "grid_y": gy}
+        for r in radii for n in neighbors for gx, gy in grids
+    ]
+
+
+def make_folds(ids, folds: int, seed: int = 0):
+    """
+    Validation croisée en ensemble ouvert : les étudiants sont répartis en `folds` groupes.
+    Au pli k, le groupe k sert d'imposteurs (absents du modèle, toutes leurs images sont
+    des requêtes) ; pour les autres, une image sur `folds` sert de requête, le reste
+    d'entraînement. Retourne [(train_idx, probe_idx, impostor_idx)].
+    """
+    by_serial = {}
+    for i, sid in enumerate(ids):
+        by_serial.setdefault(sid, []).append(i)
+    serials = sorted(by_serial)
+    random.Random(seed).shuffle(serials)
+    plan = []
+    for k in range(folds):
+        impostors = set(serials[k::folds])
+        train, probes, others = [], [], []
+        for sid in serials:
+            for j, i in enumerate(by_serial[sid]):
+                if sid in impostors:
+                    others.append(i)
+                elif j % folds == k:
+                    probes.append(i)
+                else:
+                    train.append(i)
+        plan.append((train, probes, others))
+    return plan
+
+
+def run_fold(config: dict, faces, ids, fold, workdir: str) -> dict:
+    """
+    Entraîne un modèle avec `config` sur un pli et interroge toutes ses requêtes.
+    Retourne les distances brutes (le seuil est appliqué ensuite, sans réentraîner).
+    """
+    train, probes, impostors = fold
+    recognizer = create_lbph_recognizer(config)
+    t = time.perf_counter()
+    recognizer.train([faces[i] for i in train], np.array([ids[i] for i in train]))
+    train_s = time.perf_counter() - t
+
+    fd, model_file = tempfile.mkstemp(suffix=".yml", dir=workdir)
+    os.close(fd)
+    recognizer.write(model_file)
+    model_mb = os.path.getsize(model_file) / (1024 * 1024)
+    os.remove(model_file)
+
+    queries = probes + impostors
+    predicted = np.empty(len(queries), dtype=np.int64)
+    distances = np.empty(len(queries))
+    t = time.perf_counter()
+    for n, i in enumerate(queries):
+        predicted[n], distances[n] = recognizer.predict(faces[i])
+    predict_s = time.perf_counter() - t
+    return {
+        "train_s": train_s,
+        "train_images": len(train),
+        "model_mb": model_mb,
+        "predict_ms": predict_s * 1000 / max(1, len(queries)),
+        "truth": np.array([ids[i] for i in probes] + [-1] * len(impostors)),
+        "predicted": predicted,
+        "distances": distances,
+    }
+
+
+def score(folds: list, threshold: float) -> dict:
+    """
+    accuracy : requêtes d'étudiants connus reconnues sous le bon SERIAL NO. ;
+    far : imposteurs acceptés (distance < seuil) ; misid : connus acceptés sous un autre SERIAL NO.
+    """
+    truth = np.concatenate([f["truth"] for f in folds])
+    predicted = np.concatenate([f["predicted"] for f in folds])
+    accepted = np.concatenate([f["distances"] for f in folds]) < threshold
+    known = truth >= 0
+    return {
+        "threshold": threshold,
+        "accuracy": float((accepted & known & (predicted == truth)).sum() / max(1, known.sum())),
+        "far": float((accepted & ~known).sum() / max(1, (~known).sum())),
+        "misid": float((accepted & known & (predicted != truth)).sum() / max(1, known.sum())),
+    }
+
+
+def sweep(faces, ids, configs, thresholds, folds: int = 3, workers: int = None, seed: int = 0):
+    """
+    Évalue chaque configuration sur chaque pli en parallèle (OpenCV relâche le GIL pendant
+    train/predict). Retourne une ligne par (configuration, seuil).
+    """
+    plan = make_folds(ids, folds, seed)
+    workdir = tempfile.mkdtemp(prefix="faceattend-sweep-")
+    try:
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+            jobs = [[pool.submit(run_fold, c, faces, ids, f, workdir) for f in plan] for c in configs]
+            rows = []
+            for config, fold_jobs in zip(configs, jobs):
+                results = [job.result() for job in fold_jobs]
+                cost = {
+                    "train_s": sum(r["train_s"] for r in results) / len(results),
+                    "model_mb": max(r["model_mb"] for r in results),
+                    "predict_ms": sum(r["predict_ms"] for r in results) / len(results),
+                }
+                for threshold in thresholds:
+                    rows.append(dict(config, **cost, **score(results, threshold)))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return rows
+
+
+def choose(rows, max_far: float = DEFAULT_MAX_FAR):
+    """
+    Meilleure exactitude parmi les lignes dont le FAR est sous max_far, puis predict le plus
+    rapide ; à défaut, la ligne au FAR le plus bas. Un FAR nul s'obtient toujours avec un
+    seuil assez bas : vérifier l'exactitude (acceptable()) avant d'écrire le choix.
+    """
+    eligible = [r for r in rows if r["far"] <= max_far]
+    if eligible:
+        return max(eligible, key=lambda r: (round(r["accuracy"], 4), -r["predict_ms"]))
+    return min(rows, key=lambda r: (r["far"], -r["accuracy"]))
+
+
+def acceptable(row: dict, max_far: float = DEFAULT_MAX_FAR,
+               min_accuracy: float = DEFAULT_MIN_ACCURACY) -> bool:
+    """
+    Vrai si la ligne respecte à la fois le FAR maximal et l'exactitude minimale.
+    """
+    return row["far"] <= max_far and row["accuracy"] >= min_accuracy
+
+
+def write_choice(config_path: str, row: dict):
+    """
+    Enregistre paramètres LBPH et seuil dans la section "recognition" de config.json,
+    en conservant les autres réglages.
+    """
+    cfg = {}
+    if os.path.isfile(config_path):
+        with open(config_path) as f:
+            cfg = json.load(f)
+    recognition = dict(cfg.get("recognition", {}))
+    recognition.update({k: row[k] for k in LBPH_DEFAULTS})
+    recognition["threshold"] = row["threshold"]
+    cfg["recognition"] = recognition
+    with open(config_path, "w") as f:
+        json.dump(cfg, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Balaye les paramètres LBPH (radius, neighbors, grille) et le seuil de "
+                    "reconnaissance par validation croisée sur TrainingImage/."
+    )
+    parser.add_argument("--dataset", default="TrainingImage")
+    parser.add_argument("--details", default="StudentDetails/StudentDetails.csv")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--radius", default="1,2", help="rayons LBP, ex. 1,2")
+    parser.add_argument("--neighbors", default="8",
+                        help="voisins LBP ; histogrammes en 2^neighbors, ne dépasser 8 qu'avec de petites grilles")
+    parser.add_argument("--grid", default="4x4,6x6,8x8", help="grilles, ex. 4x4,6x6,8x8")
+    parser.add_argument("--thresholds", default="50,60,70,80,90", help="seuils de distance testés")
+    parser.add_argument("--folds", type=int, default=3)
+    parser.add_argument("--workers", type=int, help="threads (défaut : nombre de CPU)")
+    parser.add_argument("--max-far", type=float, default=DEFAULT_MAX_FAR,
+                        help="FAR maximal pour le choix automatique")
+    parser.add_argument("--min-accuracy", type=float, default=DEFAULT_MIN_ACCURACY,
+                        help="exactitude minimale exigée pour --write")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--write", action="store_true",
+                        help="écrire la configuration choisie dans la section \"recognition\" de config.json")
+    parser.add_argument("--output", help="écrire toutes les lignes en JSON dans ce fichier")
+    args = parser.parse_args()
+
+    cfg = {}
+    if os.path.isfile(args.config):
+        with open(args.config) as f:
+            cfg = json.load(f)
+    trainer = FaceTrainer("haarcascade_frontalface_default.xml", args.dataset, args.details,
+                          FacePreprocessor.from_config(cfg.get("preprocessing")))
+    t = time.perf_counter()
+    faces, ids = trainer.collect_training_data()
+    if len(set(ids)) < args.folds:
+        parser.error(f"need at least {args.folds} students with images in {args.dataset}")
+    print(f"Loaded {len(faces)} images of {len(set(ids))} students ({time.perf_counter() - t:.1f} s)")
+
+    configs = make_configs(
+        [int(v) for v in args.radius.split(",")],
+        [int(v) for v in args.neighbors.split(",")],
+        parse_grid(args.grid),
+    )
+    thresholds = [float(v) for v in args.thresholds.split(",")]
+    t = time.perf_counter()
+    rows = sweep(faces, ids, configs, thresholds, args.folds, args.workers, args.seed)
+    print(f"{len(configs)} configurations x {args.folds} folds in {time.perf_counter() - t:.1f} s\n")
+
+    print(f"{'radius':>6} {'nb':>3} {'grid':>6} {'thr':>5} {'accuracy':>9} {'FAR':>7} {'misid':>7}"
+          f" {'model MB':>9} {'train s':>8} {'predict ms':>11}")
+    for r in rows:
+        print(f"{r['radius']:>6} {r['neighbors']:>3} {r['grid_x']:>3}x{r['grid_y']:<2} {r['threshold']:>5.0f}"
+              f" {r['accuracy']:>9.1%} {r['far']:>7.2%} {r['misid']:>7.2%}"
+              f" {r['model_mb']:>9.2f} {r['train_s']:>8.2f} {r['predict_ms']:>11.3f}")
+
+    best = choose(rows, args.max_far)
+    print(f"\nChosen: radius {best['radius']}, neighbors {best['neighbors']}, "
+          f"grid {best['grid_x']}x{best['grid_y']}, threshold {best['threshold']:.0f} "
+          f"(accuracy {best['accuracy']:.1%}, FAR {best['far']:.2%}, predict {best['predict_ms']:.3f} ms)")
+    if best["far"] > args.max_far:
+        print(f"Warning: no configuration reaches FAR <= {args.max_far:.2%}")
+    if best["accuracy"] < args.min_accuracy:
+        print(f"Warning: chosen accuracy is below {args.min_accuracy:.1%}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"rows": rows, "chosen": best}, f, indent=2)
+    if args.write:
+        if not acceptable(best, args.max_far, args.min_accuracy):
+            print(f"Not written: no configuration reaches accuracy >= {args.min_accuracy:.1%} "
+                  f"with FAR <= {args.max_far:.2%}; {args.config} is unchanged.")
+            raise SystemExit(1)
+        write_choice(args.config, best)
+        print(f"Written to {args.config} (\"recognition\").")
+        print(f"Warning: the threshold {best['threshold']:.0f} applies as soon as the app or the "
+              "recognition service restarts, but the saved Trainer.yml keeps its old LBPH "
+              "radius/neighbors/grid until it is retrained. Retrain now so the two match.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,17 @@
-from gui_app import FaceAttendanceApp
+import os
+import sys
+
+import startup_profile
+
+# Modules de l'application chronométrés individuellement (les dépendances lourdes sont différées)
+for _name in ("password_manager", "face_preprocessing", "face_trainer",
+              "attendance_recorder", "schedule_manager", "session_scheduler"):
+    startup_profile.timed_import(_name)
+gui_app = startup_profile.timed_import("gui_app")
 
 if __name__ == "__main__":
-    app = FaceAttendanceApp()
+    app = gui_app.FaceAttendanceApp()
+    if "--startup-report" in sys.argv or os.environ.get("FACEATTEND_STARTUP_REPORT"):
+        # Rapport affiché une fois le chargement différé terminé
+        app.after(3000, lambda: print(startup_profile.report()))
     app.mainloop()
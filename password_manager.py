@@ -1,9 +1,17 @@
 import os
 import json
-import bcrypt
+import math
+import threading
+import time
 import tkinter as tk
 from tkinter import messagebox, simpledialog
 
+from startup_profile import lazy_import
+from ui_bridge import busy_label
+
+# bcrypt n'est importé qu'au premier hachage / vérification
+bcrypt = lazy_import("bcrypt")
+
 class PasswordManager:
     """
     Gère un utilisateur unique avec :
@@ -11,9 +19,15 @@ class PasswordManager:
       - mot de passe (haché via bcrypt)
       - recovery_phrase (texte aléatoire affiché une seule fois lors de la configuration)
       - remember_me (optionnel)
+      - bcrypt_rounds (coût configuré, calibré sur la machine)
     Stocke ces données dans un JSON local.
+    Les hachages bcrypt ne tournent jamais sur le thread Tk : voir run_async().
     """
 
+    MIN_ROUNDS = 10
+    MAX_ROUNDS = 16
+    DEFAULT_TARGET_SECONDS = 0.25  # latence visée pour un hachage
+
     def __init__(self, storage_path: str):
         """
         storage_path: chemin vers le JSON, ex. "TrainingImageLabel/credentials.json"
@@ -41,35 +55,117 @@ class PasswordManager:
         with open(self.storage_path, "w") as f:
             json.dump(data, f, indent=2)
 
-    def set_initial_user(self, username: str, password: str):
+    # --- Exécution hors thread Tk -------------------------------------------
+
+    @staticmethod
+    def run_async(parent, work, on_done, busy=None):
         """
-        Appelé au premier lancement : crée username et mot de passe, génère une recovery phrase.
-        Affiche la recovery phrase à l'utilisateur (il doit la conserver).
+        Exécute work() dans un thread ; on_done(result, error) est rappelé sur le thread Tk
+        (via parent.after). busy(True/False) permet d'afficher l'état "en cours".
         """
-        # Hash du mot de passe avec bcrypt
-        pw_hash = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+        box = {}
 
+        def target():
+            try:
+                box["result"] = work()
+            except Exception as e:
+                box["error"] = e
+
+        th = threading.Thread(target=target, daemon=True)
+        if busy:
+            busy(True)
+        th.start()
+
+        def poll():
+            if th.is_alive():
+                parent.after(30, poll)
+                return
+            if busy:
+                busy(False)
+            on_done(box.get("result"), box.get("error"))
+
+        parent.after(30, poll)
+
+    # --- Coût bcrypt --------------------------------------------------------
+
+    @classmethod
+    def calibrate_rounds(cls, target_seconds: float = None) -> int:
+        """
+        Mesure bcrypt au coût minimal et retourne le coût (log2) dont la durée
+        approche target_seconds sur cette machine, borné à [MIN_ROUNDS, MAX_ROUNDS].
+        """
+        target = target_seconds or cls.DEFAULT_TARGET_SECONDS
+        salt = bcrypt.gensalt(rounds=cls.MIN_ROUNDS)
+        t = time.perf_counter()
+        bcrypt.hashpw(b"calibration", salt)
+        elapsed = max(time.perf_counter() - t, 1e-4)
+        # Chaque round supplémentaire double le temps
+        rounds = cls.MIN_ROUNDS + int(math.floor(math.log2(target / elapsed)))
+        return max(cls.MIN_ROUNDS, min(cls.MAX_ROUNDS, rounds))
+
+    @staticmethod
+    def hash_rounds(pw_hash: str):
+        """
+        Coût d'un hash bcrypt "$2b$12$...", ou None si illisible.
+        """
+        try:
+            return int(pw_hash.split("$")[2])
+        except (IndexError, ValueError):
+            return None
+
+    def _hash(self, password: str, rounds: int) -> str:
+        return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=rounds)).decode()
+
+    def _configured_rounds(self, data: dict) -> int:
+        return int(data.get("bcrypt_rounds") or self.hash_rounds(data.get("password_hash", "")) or 12)
+
+    # --- Compte ---------------------------------------------------------------
+
+    def set_initial_user(self, username: str, password: str, parent=None, on_done=None, busy=None):
+        """
+        Appelé au premier lancement : crée username et mot de passe, génère une recovery phrase.
+        Le coût bcrypt est calibré puis le mot de passe haché hors du thread Tk ;
+        la recovery phrase est ensuite affichée (l'utilisateur doit la conserver).
+        """
         # Générer une recovery phrase simple aléatoire : 4 mots hex
         recovery_phrase = " ".join(os.urandom(2).hex() for _ in range(4))
 
-        data = {
-            "username": username,
-            "password_hash": pw_hash,
-            "recovery_phrase": recovery_phrase,
-            "remember_me": False
-        }
-        self._save(data)
-        # Afficher la recovery phrase dans un messagebox
-        messagebox.showinfo(
-            "Account Created",
-            "Your account has been created.\n"
-            "Please save this recovery phrase somewhere safe:\n\n" +
-            recovery_phrase
-        )
+        def work():
+            rounds = self.calibrate_rounds()
+            # Hash du mot de passe avec bcrypt
+            pw_hash = self._hash(password, rounds)
+            data = {
+                "username": username,
+                "password_hash": pw_hash,
+                "recovery_phrase": recovery_phrase,
+                "remember_me": False,
+                "bcrypt_rounds": rounds
+            }
+            self._save(data)
+
+        def done(_, error):
+            if error is not None:
+                messagebox.showerror("Error", f"Cannot create account:\n{error}", parent=parent)
+                return
+            # Afficher la recovery phrase dans un messagebox
+            messagebox.showinfo(
+                "Account Created",
+                "Your account has been created.\n"
+                "Please save this recovery phrase somewhere safe:\n\n" +
+                recovery_phrase,
+                parent=parent
+            )
+            if on_done:
+                on_done()
+
+        self.run_async(parent or tk._default_root, work, done, busy)
 
-    def verify_login(self, username: str, password: str) -> bool:
+    def verify_login(self, username: str, password: str, remember_me: bool = None) -> bool:
         """
         Vérifie que username et password correspondent aux données stockées.
+        Si le coût configuré a changé, le hash est recalculé de façon transparente.
+        Si remember_me est fourni, il est enregistré dans la même écriture.
+        Bloquant : à appeler via login_async() depuis l'interface.
         """
         try:
             data = self._load()
@@ -78,13 +174,59 @@ class PasswordManager:
 
         if username != data.get("username", ""):
             return False
-        stored_hash = data.get("password_hash", "").encode()
-        return bcrypt.checkpw(password.encode(), stored_hash)
+        stored_hash = data.get("password_hash", "")
+        if not bcrypt.checkpw(password.encode(), stored_hash.encode()):
+            return False
+
+        changed = False
+        rounds = self._configured_rounds(data)
+        if self.hash_rounds(stored_hash) != rounds:
+            data["password_hash"] = self._hash(password, rounds)
+            changed = True
+        if remember_me is not None:
+            data["remember_me"] = bool(remember_me)
+            data["username"] = username if remember_me else ""
+            changed = True
+        if changed:
+            self._save(data)
+        return True
+
+    def login_async(self, parent, username: str, password: str, remember_me: bool, on_done, busy=None):
+        """
+        verify_login() hors du thread Tk ; on_done(ok: bool) rappelé sur le thread Tk.
+        """
+        self.run_async(
+            parent,
+            lambda: self.verify_login(username, password, remember_me),
+            lambda ok, error: on_done(bool(ok) and error is None),
+            busy
+        )
+
+    def set_target_latency(self, target_seconds: float, parent=None, on_done=None, busy=None):
+        """
+        Recalibre le coût bcrypt pour la latence visée. Le hash stocké sera mis à niveau
+        au prochain login réussi.
+        """
+        def work():
+            rounds = self.calibrate_rounds(target_seconds)
+            data = self._load()
+            data["bcrypt_rounds"] = rounds
+            self._save(data)
+            return rounds
+
+        def done(rounds, error):
+            if error is not None:
+                messagebox.showerror("Error", f"Calibration failed:\n{error}", parent=parent)
+            elif on_done:
+                on_done(rounds)
+
+        self.run_async(parent or tk._default_root, work, done, busy)
 
     def change_password(self, parent_window=None):
         """
         Fenêtre Tkinter pour changer le mot de passe (après login).
         Demande ancien mot de passe, nouveau + confirmation, puis nouvelle recovery phrase.
+        Vérification et hachage bcrypt se font hors du thread Tk.
         """
         def save():
             old = old_ent.get().strip()
@@ -97,39 +239,53 @@ class PasswordManager:
                 messagebox.showerror("Error", "Cannot load credentials.", parent=pwd_win)
                 return
 
-            # Vérifier ancien mot de passe
-            if not bcrypt.checkpw(old.encode(), data["password_hash"].encode()):
-                messagebox.showerror("Error", "Old password incorrect", parent=pwd_win)
-                return
-            if not new:
-                messagebox.showerror("Error", "New password cannot be empty", parent=pwd_win)
-                return
-            if new != conf:
-                messagebox.showerror("Error", "Passwords do not match", parent=pwd_win)
-                return
+            def after_check(ok, error):
+                # Vérifier ancien mot de passe
+                if error is not None or not ok:
+                    messagebox.showerror("Error", "Old password incorrect", parent=pwd_win)
+                    return
+                if not new:
+                    messagebox.showerror("Error", "New password cannot be empty", parent=pwd_win)
+                    return
+                if new != conf:
+                    messagebox.showerror("Error", "Passwords do not match", parent=pwd_win)
+                    return
 
-            # Demander nouvelle recovery phrase
-            new_recovery = simpledialog.askstring(
-                "New Recovery Phrase",
-                "Enter a new recovery phrase (store it safely):",
-                parent=pwd_win
-            )
-            if not new_recovery:
-                messagebox.showwarning("Cancelled", "No recovery phrase set. Aborting.", parent=pwd_win)
-                return
+                # Demander nouvelle recovery phrase
+                new_recovery = simpledialog.askstring(
+                    "New Recovery Phrase",
+                    "Enter a new recovery phrase (store it safely):",
+                    parent=pwd_win
+                )
+                if not new_recovery:
+                    messagebox.showwarning("Cancelled", "No recovery phrase set. Aborting.", parent=pwd_win)
+                    return
 
-            # Mettre à jour
-            new_hash = bcrypt.hashpw(new.encode(), bcrypt.gensalt()).decode()
-            data["password_hash"] = new_hash
-            data["recovery_phrase"] = new_recovery.strip()
-            data["remember_me"] = False
-            self._save(data)
-            messagebox.showinfo("Success", "Password and recovery phrase updated", parent=pwd_win)
-            pwd_win.destroy()
+                def after_hash(new_hash, error):
+                    if error is not None:
+                        messagebox.showerror("Error", str(error), parent=pwd_win)
+                        return
+                    # Mettre à jour
+                    data["password_hash"] = new_hash
+                    data["recovery_phrase"] = new_recovery.strip()
+                    data["remember_me"] = False
+                    self._save(data)
+                    messagebox.showinfo("Success", "Password and recovery phrase updated", parent=pwd_win)
+                    pwd_win.destroy()
+
+                self.run_async(pwd_win, lambda: self._hash(new, self._configured_rounds(data)),
+                               after_hash, busy)
+
+            self.run_async(
+                pwd_win,
+                lambda: bcrypt.checkpw(old.encode(), data["password_hash"].encode()),
+                after_check,
+                busy
+            )
 
         pwd_win = tk.Toplevel(parent_window) if parent_window else tk.Toplevel()
         pwd_win.title("Change Password")
-        pwd_win.geometry("350x200")
+        pwd_win.geometry("350x220")
         pwd_win.resizable(False, False)
 
         tk.Label(pwd_win, text="Old Password:").pack(pady=(15,2))
@@ -144,12 +300,17 @@ class PasswordManager:
         conf_ent = tk.Entry(pwd_win, show="*")
         conf_ent.pack(fill="x", padx=20)
 
-        tk.Button(pwd_win, text="Save", command=save).pack(pady=15)
+        save_btn = tk.Button(pwd_win, text="Save", command=save)
+        save_btn.pack(pady=(15,2))
+        progress_lbl = tk.Label(pwd_win, text="", fg="#4A90E2")
+        progress_lbl.pack()
+        busy = busy_label(progress_lbl, [save_btn], "Working...")
 
-    def recover_password(self, parent_window=None) -> bool:
+    def recover_password(self, parent_window=None, on_success=None) -> bool:
         """
         Fenêtre pour récupérer/réinitialiser le mot de passe via la recovery phrase.
-        Retourne True si reset réussi (pour continuer vers l’app), False sinon.
+        Retourne True si le reset a été lancé ; le hachage se fait hors du thread Tk
+        et on_success() est rappelé une fois le nouveau mot de passe enregistré.
         """
         if not self.is_user_set():
             messagebox.showwarning("No User", "No user set yet.", parent=parent_window)
@@ -201,11 +362,19 @@ class PasswordManager:
             messagebox.showwarning("Cancelled", "No recovery phrase set. Aborting.", parent=parent_window)
             return False
 
-        # Mettre à jour
-        new_hash = bcrypt.hashpw(new.encode(), bcrypt.gensalt()).decode()
-        data["password_hash"] = new_hash
-        data["recovery_phrase"] = new_recovery.strip()
-        data["remember_me"] = False
-        self._save(data)
-        messagebox.showinfo("Success", "Password and recovery phrase have been reset", parent=parent_window)
+        def done(new_hash, error):
+            if error is not None:
+                messagebox.showerror("Error", str(error), parent=parent_window)
+                return
+            # Mettre à jour
+            data["password_hash"] = new_hash
+            data["recovery_phrase"] = new_recovery.strip()
+            data["remember_me"] = False
+            self._save(data)
+            messagebox.showinfo("Success", "Password and recovery phrase have been reset", parent=parent_window)
+            if on_success:
+                on_success()
+
+        self.run_async(parent_window or tk._default_root,
+                       lambda: self._hash(new, self._configured_rounds(data)), done)
         return True
@@ -0,0 +1,73 @@
+import struct
+from array import array
+
+
+class PresenceTimeline:
+    """
+    Présence d'un étudiant pendant une session, à la seconde près, en run-length :
+    une suite de plages [début, fin] (secondes depuis `origin`, bornes incluses).
+    Une reconnaissance à moins de gap_seconds de la fin de la dernière plage la prolonge
+    (regard baissé, visage masqué un instant) ; au-delà, une nouvelle plage commence.
+    mark() est en O(1) et la mémoire tient en 8 octets par plage : des centaines
+    d'étudiants sur une journée restent de l'ordre du kilo-octet chacun.
+    """
+
+    __slots__ = ("origin", "gap_seconds", "_runs")
+
+    def __init__(self, origin: float, gap_seconds: int = 30):
+        self.origin = origin
+        self.gap_seconds = gap_seconds
+        self._runs = array("I")  # [début0, fin0, début1, fin1, ...]
+
+    def mark(self, timestamp: float):
+        """
+        Enregistre une reconnaissance (temps epoch de capture de la frame).
+        Les frames arrivent dans l'ordre : une seconde déjà couverte est ignorée.
+        """
+        sec = int(timestamp - self.origin)
+        if sec < 0:
+            sec = 0
+        runs = self._runs
+        if runs and sec <= runs[-1] + self.gap_seconds:
+            if sec > runs[-1]:
+                runs[-1] = sec
+        else:
+            runs.append(sec)
+            runs.append(sec)
+
+    def runs(self):
+        """
+        [(début, fin)] en secondes depuis origin.
+        """
+        r = self._runs
+        return [(r[i], r[i + 1]) for i in range(0, len(r), 2)]
+
+    def __bool__(self):
+        return len(self._runs) > 0
+
+    def first_seen(self) -> float:
+        return self.origin + self._runs[0]
+
+    def last_seen(self) -> float:
+        return self.origin + self._runs[-1]
+
+    def seen_seconds(self) -> int:
+        """
+        Temps réellement passé en salle : somme des plages fin - début (écarts courts déjà
+        fusionnés). Une plage d'une seule reconnaissance compte 0 s : le total ne dépasse
+        jamais la durée de la session.
+        """
+        r = self._runs
+        return sum(r[i + 1] - r[i] for i in range(0, len(r), 2))
+
+    def to_bytes(self) -> bytes:
+        """
+        Encodage compact pour la base (uint32 little-endian, paires début/fin).
+        """
+        return struct.pack(f"<{len(self._runs)}I", *self._runs)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, origin: float, gap_seconds: int = 30):
+        timeline = cls(origin, gap_seconds)
+        timeline._runs.extend(struct.unpack(f"<{len(data) // 4}I", data))
+        return timeline
@@ -0,0 +1,104 @@
+import threading
+import time
+import tkinter as tk
+
+from startup_profile import lazy_import
+
+cv2 = lazy_import("cv2")
+Image = lazy_import("PIL.Image")
+ImageTk = lazy_import("PIL.ImageTk")
+
+
+class PreviewBuffer:
+    """
+    Emplacement unique (dernière image) entre le recorder et l'aperçu intégré.
+    Le recorder ne fait que déposer une référence à la frame et aux overlays quand
+    due() l'autorise (cadence plafonnée) : aucun dessin ni redimensionnement sur le
+    chemin de reconnaissance.
+    """
+
+    def __init__(self, fps: float = 5.0):
+        self.interval = 1.0 / max(fps, 0.1)
+        self._next_due = 0.0
+        self._lock = threading.Lock()
+        self._item = None
+        self._ended = False
+
+    def due(self) -> bool:
+        """
+        True si une nouvelle image doit être publiée (au plus `fps` fois par seconde).
+        """
+        now = time.monotonic()
+        if now >= self._next_due:
+            self._next_due = now + self.interval
+            return True
+        return False
+
+    def publish(self, frame, overlays):
+        """
+        overlays: [((x, y, w, h), label, (b, g, r))] en coordonnées de la frame complète.
+        La frame ne doit plus être modifiée par l'appelant après publication.
+        """
+        with self._lock:
+            self._item = (frame, overlays)
+            self._ended = False
+
+    def end(self):
+        """
+        Fin de session : l'aperçu revient à l'état inactif.
+        """
+        with self._lock:
+            self._item = None
+            self._ended = True
+
+    def take(self):
+        """
+        Retourne ('frame', (frame, overlays)), ('end', None) ou (None, None) ; vide l'emplacement.
+        """
+        with self._lock:
+            if self._item is not None:
+                item, self._item = self._item, None
+                return 'frame', item
+            if self._ended:
+                self._ended = False
+                return 'end', None
+            return None, None
+
+
+class PreviewPanel(tk.Label):
+    """
+    Aperçu intégré à la fenêtre principale. Interroge le PreviewBuffer à la même
+    cadence plafonnée ; seules les images affichées sont réduites et annotées.
+    """
+
+    IDLE_TEXT = "No camera preview"
+
+    def __init__(self, master, buffer: PreviewBuffer, width: int = 400, **kwargs):
+        super().__init__(master, text=self.IDLE_TEXT, bg="#222222", fg="#aaaaaa", **kwargs)
+        self.buffer = buffer
+        self.width = width
+        self._photo = None
+        self._poll_ms = max(int(buffer.interval * 1000), 20)
+        self.after(self._poll_ms, self._poll)
+
+    def _poll(self):
+        kind, item = self.buffer.take()
+        if kind == 'frame':
+            self._show(*item)
+        elif kind == 'end':
+            self._photo = None
+            self.config(image="", text=self.IDLE_TEXT)
+        self.after(self._poll_ms, self._poll)
+
+    def _show(self, frame, overlays):
+        h, w = frame.shape[:2]
+        scale = self.width / float(w)
+        small = cv2.resize(frame, (self.width, max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+        for (x, y, bw, bh), label, color in overlays:
+            x1, y1 = int(x * scale), int(y * scale)
+            x2, y2 = int((x + bw) * scale), int((y + bh) * scale)
+            cv2.rectangle(small, (x1, y1), (x2, y2), color, 1)
+            cv2.putText(small, label, (x1, y2 + 14), cv2.FONT_HERSHEY_SIMPLEX, 0.45, color, 1, cv2.LINE_AA)
+        rgb = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+        self._photo = ImageTk.PhotoImage(Image.fromarray(rgb))
+        self.config(image=self._photo, text="")
@@ -0,0 +1,214 @@
+import os, csv, threading
+
+from startup_profile import lazy_import
+from camera_grabber import FrameGrabber, open_camera
+
+cv2 = lazy_import("cv2")
+
+
+# Paramètres LBPH des nouveaux modèles (section "recognition" de config.json, choisie
+# avec lbph_sweep.py). La grille fixe la longueur des histogrammes, donc le coût de predict.
+# Un modèle lu sur disque garde les paramètres avec lesquels il a été entraîné.
+LBPH_DEFAULTS = {"radius": 1, "neighbors": 8, "grid_x": 8, "grid_y": 8}
+_lbph_params = dict(LBPH_DEFAULTS)
+
+
+def configure_lbph(cfg: dict):
+    """
+    Applique les paramètres LBPH de la section "recognition" de config.json
+    (les clés absentes gardent les valeurs d'OpenCV).
+    """
+    cfg = cfg or {}
+    _lbph_params.clear()
+    _lbph_params.update({k: int(cfg.get(k, v)) for k, v in LBPH_DEFAULTS.items()})
+
+
+def lbph_params() -> dict:
+    return dict(_lbph_params)
+
+
+def create_lbph_recognizer(params: dict = None):
+    """
+    Crée un LBPHFaceRecognizer (API opencv-contrib récente ou ancienne) avec les
+    paramètres configurés, ou `params` s'il est fourni (balayage de lbph_sweep).
+    Lève AttributeError si le module face n'est pas disponible.
+    """
+    p = dict(_lbph_params)
+    p.update(params or {})
+    try:
+        return cv2.face.LBPHFaceRecognizer_create(
+            radius=p["radius"], neighbors=p["neighbors"], grid_x=p["grid_x"], grid_y=p["grid_y"]
+        )
+    except AttributeError:
+        return cv2.createLBPHFaceRecognizer(p["radius"], p["neighbors"], p["grid_x"], p["grid_y"])
+
+
+class RecognitionContext:
+    """
+    Contexte de reconnaissance résident, partagé entre les sessions :
+      - recognizer LBPH (Trainer.yml), rechargé seulement si le mtime du modèle change,
+      - table SERIAL NO. -> (ID, NAME) de StudentDetails.csv, idem sur son mtime,
+      - détecteur Haarcascade,
+      - caméras laissées ouvertes entre deux sessions, chacune possédée par un FrameGrabber
+        partagé (dernière frame diffusée aux abonnés, réglages par caméra de camera_settings).
+    warm_up_async() charge le tout en arrière-plan (pendant l'écran de login),
+    pour qu'une session planifiée commence à capturer immédiatement.
+    """
+
+    def __init__(self, haar_path: str, model_path: str, details_csv: str,
+                 camera_settings: dict = None):
+        """
+        camera_settings: {"0": {"width", "height", "fps", "buffer_size", "format"}} (section "cameras").
+        """
+        self.haar_path = haar_path
+        self.camera_settings = camera_settings or {}
+        self.model_path = model_path
+        self.details_csv = details_csv
+        self.recognizer = None
+        self.detector = None
+        self.students = {}  # { serial(int): (id_str, name_str) }
+        self._model_mtime = None
+        self._details_mtime = None
+        self._cameras = {}  # { index: FrameGrabber }
+        self._lock = threading.RLock()
+        self._model_lock = threading.Lock()
+        self._reload_thread = None
+        self.warm_thread = None
+
+    @staticmethod
+    def _mtime(path):
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return None
+
+    def warm_up_async(self, camera_indexes=(0,)):
+        """
+        Lance warm_up() dans un thread daemon et le retourne.
+        """
+        self.warm_thread = threading.Thread(
+            target=self.warm_up, args=(tuple(camera_indexes),), daemon=True
+        )
+        self.warm_thread.start()
+        return self.warm_thread
+
+    def warm_up(self, camera_indexes=(0,)):
+        """
+        Charge détecteur, modèle, détails et ouvre les caméras. Les erreurs sont
+        ignorées ici : elles seront signalées au démarrage de la session.
+        """
+        try:
+            self.ensure_loaded()
+        except Exception:
+            pass
+        for idx in camera_indexes:
+            self.acquire_camera(idx)
+
+    def ensure_loaded(self):
+        """
+        (Re)charge ce qui a changé sur disque. Lève FileNotFoundError si le modèle
+        ou StudentDetails.csv est absent, ValueError si StudentDetails.csv est illisible.
+        """
+        with self._lock:
+            if self.detector is None:
+                if not os.path.isfile(self.haar_path):
+                    raise FileNotFoundError(self.haar_path)
+                self.detector = cv2.CascadeClassifier(self.haar_path)
+
+        self._load_model()
+
+        with self._lock:
+            details_mtime = self._mtime(self.details_csv)
+            if details_mtime is None:
+                raise FileNotFoundError(self.details_csv)
+            if details_mtime != self._details_mtime:
+                self.students = self._read_details()
+                self._details_mtime = details_mtime
+
+    def _load_model(self):
+        """
+        Lit Trainer.yml (plusieurs centaines de Mo pour une grosse galerie) hors de
+        self._lock, qui n'est tenu que pour échanger la référence : caméras et lookup
+        restent disponibles pendant la lecture. _model_lock évite deux lectures simultanées.
+        """
+        with self._model_lock:
+            model_mtime = self._mtime(self.model_path)
+            if model_mtime is None:
+                raise FileNotFoundError(self.model_path)
+            if self.recognizer is not None and model_mtime == self._model_mtime:
+                return
+            recognizer = create_lbph_recognizer()
+            recognizer.read(self.model_path)
+            with self._lock:
+                self.recognizer = recognizer
+                self._model_mtime = model_mtime
+
+    def model_stale(self) -> bool:
+        """
+        Vrai si Trainer.yml a changé depuis le dernier chargement (simple stat, sans verrou).
+        """
+        return self._mtime(self.model_path) != self._model_mtime
+
+    def reload_async(self):
+        """
+        Recharge en arrière-plan ce qui a changé sur disque, sauf si un rechargement est
+        déjà en cours. Les erreurs sont ignorées (le modèle courant reste en place).
+        """
+        with self._lock:
+            if self._reload_thread is not None and self._reload_thread.is_alive():
+                return
+            self._reload_thread = threading.Thread(target=self._reload_quietly, daemon=True)
+            self._reload_thread.start()
+
+    def _reload_quietly(self):
+        try:
+            self.ensure_loaded()
+        except Exception:
+            pass
+
+    def _read_details(self) -> dict:
+        students = {}
+        try:
+            with open(self.details_csv, newline='') as f:
+                for row in csv.DictReader(f):
+                    students[int(row["SERIAL NO."])] = (row["ID"], row["NAME"])
+        except (KeyError, ValueError, TypeError) as e:
+            raise ValueError(f"Invalid {self.details_csv}: {e}")
+        return students
+
+    def lookup(self, serial: int):
+        """
+        Retourne (ID, NAME) pour un SERIAL NO., ou None.
+        """
+        return self.students.get(serial)
+
+    def acquire_camera(self, index: int = 0):
+        """
+        Retourne le FrameGrabber de la caméra `index` (ouverte au besoin, puis gardée
+        ouverte), ou None.
+        """
+        with self._lock:
+            cam = self._cameras.get(index)
+            if cam is not None and cam.isOpened():
+                return cam
+            settings = self.camera_settings.get(str(index), {})
+            capture = open_camera(index, settings)
+            if capture is None:
+                return None
+            cam = FrameGrabber(index, capture, settings)
+            self._cameras[index] = cam
+            return cam
+
+    def release_camera(self, index: int = 0):
+        """
+        Libère la caméra `index` (ex. avant une capture d'enrôlement).
+        """
+        with self._lock:
+            cam = self._cameras.pop(index, None)
+            if cam is not None:
+                cam.release()
+
+    def close(self):
+        with self._lock:
+            for idx in list(self._cameras):
+                self.release_camera(idx)
@@ -0,0 +1,240 @@
+import csv
+import json
+import os
+import struct
+import time
+
+from startup_profile import lazy_import
+
+np = lazy_import("numpy")
+
+# En-tête : magie, taille du JSON de métadonnées, JSON
+MAGIC = b"FAEV1\n"
+_HEADER_LEN = struct.Struct("<I")
+# Un enregistrement par visage détecté (24 octets) :
+#   t (s depuis started_at, float32), track (uint32),
+#   serial + distance de la galerie du cours (-1 / inf si pas de galerie),
+#   serial + distance du modèle complet (-1 / inf si non interrogé).
+_RECORD = struct.Struct("<fIifif")
+END_TRACK = 0xFFFFFFFF  # enregistrement de fin de session (t = durée)
+_DTYPE = [("t", "<f4"), ("track", "<u4"), ("g_serial", "<i4"), ("g_conf", "<f4"),
+          ("serial", "<i4"), ("conf", "<f4")]
+NO_SERIAL, NO_CONF = -1, float("inf")
+
+
+class SimpleTracker:
+    """
+    Associe les boîtes d'une frame à celles de la frame précédente (IoU glouton)
+    pour donner un numéro de piste stable à chaque visage.
+    """
+
+    def __init__(self, min_iou: float = 0.3):
+        self.min_iou = min_iou
+        self._prev = []  # [(track, (x, y, w, h))]
+        self._next_track = 1
+
+    @staticmethod
+    def _iou(a, b) -> float:
+        ax, ay, aw, ah = a
+        bx, by, bw, bh = b
+        iw = min(ax + aw, bx + bw) - max(ax, bx)
+        ih = min(ay + ah, by + bh) - max(ay, by)
+        if iw <= 0 or ih <= 0:
+            return 0.0
+        inter = iw * ih
+        return inter / float(aw * ah + bw * bh - inter)
+
+    def assign(self, boxes):
+        """
+        Retourne un numéro de piste par boîte (même ordre que `boxes`).
+        """
+        free = list(self._prev)
+        tracks, current = [], []
+        for box in boxes:
+            box = tuple(int(v) for v in box)
+            best, best_iou = None, self.min_iou
+            for i, (track, prev) in enumerate(free):
+                iou = self._iou(box, prev)
+                if iou >= best_iou:
+                    best, best_iou = i, iou
+            if best is None:
+                track = self._next_track
+                self._next_track += 1
+            else:
+                track = free.pop(best)[0]
+            tracks.append(track)
+            current.append((track, box))
+        self._prev = current
+        return tracks
+
+
+class EventLogWriter:
+    """
+    Journal binaire append-only des reconnaissances d'une session
+    (<dir>/<date>_<session_id>.evlog). L'écriture est tamponnée ; un enregistrement
+    tronqué en fin de fichier (arrêt brutal) est ignoré à la relecture.
+    started_at (epoch) doit être l'origine des PresenceTimeline de la session, pour que
+    evaluate() retrouve exactement les mêmes secondes que le direct.
+    """
+
+    def __init__(self, directory: str, session_id: int, meta: dict, started_at: float = None):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{meta.get('date', 'session')}_{session_id}.evlog")
+        self.started_at = time.time() if started_at is None else started_at
+        meta = dict(meta, session_id=session_id, started_at=self.started_at)
+        header = json.dumps(meta).encode()
+        self._file = open(self.path, "ab")
+        self._file.write(MAGIC + _HEADER_LEN.pack(len(header)) + header)
+        self.tracker = SimpleTracker()
+        self.events = 0
+
+    def write(self, captured_at: float, track: int, g_serial: int = NO_SERIAL,
+              g_conf: float = NO_CONF, serial: int = NO_SERIAL, conf: float = NO_CONF):
+        self._file.write(_RECORD.pack(captured_at - self.started_at, track,
+                                      int(g_serial), float(g_conf), int(serial), float(conf)))
+        self.events += 1
+
+    def close(self, ended_at: float = None):
+        ended_at = time.time() if ended_at is None else ended_at
+        self._file.write(_RECORD.pack(ended_at - self.started_at, END_TRACK,
+                                      NO_SERIAL, NO_CONF, NO_SERIAL, NO_CONF))
+        self._file.close()
+
+
+def read_log(path: str):
+    """
+    Retourne (meta, events) où events est un tableau numpy structuré (champs de _DTYPE),
+    sans l'enregistrement de fin ; meta["ended_at"] est renseigné si la session a été close.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path}: not a recognition event log")
+    offset = len(MAGIC)
+    (header_len,) = _HEADER_LEN.unpack_from(data, offset)
+    offset += _HEADER_LEN.size
+    meta = json.loads(data[offset:offset + header_len])
+    offset += header_len
+    count = (len(data) - offset) // _RECORD.size
+    events = np.frombuffer(data, dtype=_DTYPE, count=count, offset=offset)
+    ends = events["track"] == END_TRACK
+    if ends.any():
+        meta["ended_at"] = meta["started_at"] + float(events["t"][ends][-1])
+    return meta, events[~ends]
+
+
+def evaluate(meta: dict, events, threshold: float = 70, min_present_seconds: float = 10,
+             end_time: float = None, gap_seconds: float = None) -> dict:
+    """
+    Rejoue la règle de présence de record_attendance sur un journal, vectorisé :
+      - un visage est reconnu par la galerie si sa distance < threshold, sinon par le
+        modèle complet (si celui-ci a été interrogé en direct) ;
+      - un étudiant est présent si ses reconnaissances couvrent au moins min_present_seconds
+        depuis la première (first_seen) ;
+      - durée = temps vu, comme la PresenceTimeline : secondes de reconnaissance regroupées
+        en plages, les écarts d'au plus gap_seconds (meta["presence_gap_seconds"]) fusionnés.
+    end_time (epoch) rejoue la session comme si elle s'était arrêtée plus tôt : les
+    reconnaissances postérieures sont ignorées (par défaut meta["ended_at"]).
+    Limite : en direct, le modèle complet n'est interrogé que si la galerie a échoué au seuil
+    d'origine ; avec un seuil plus strict, ces visages restent non reconnus.
+    Retourne {serial: {"first_seen", "last_seen", "present", "duration"}} (temps epoch).
+    """
+    if gap_seconds is None:
+        gap_seconds = meta.get("presence_gap_seconds", 30)
+    started = meta["started_at"]
+    end = end_time or meta.get("ended_at")
+    use_g = (events["g_serial"] >= 0) & (events["g_conf"] < threshold)
+    sid = np.where(use_g, events["g_serial"], events["serial"])
+    conf = np.where(use_g, events["g_conf"], events["conf"])
+    ok = (sid >= 0) & (conf < threshold)
+    if end is not None:
+        ok &= events["t"] <= end - started
+    sid, t = sid[ok], events["t"][ok].astype("f8")
+    if not len(sid):
+        return {}
+    serials, inverse = np.unique(sid, return_inverse=True)
+    first = np.full(len(serials), np.inf)
+    last = np.full(len(serials), -np.inf)
+    np.minimum.at(first, inverse, t)
+    np.maximum.at(last, inverse, t)
+    # Plages de présence : secondes triées par étudiant, coupure au-delà de gap_seconds
+    order = np.lexsort((t, inverse))
+    # Comme PresenceTimeline.mark : secondes entières depuis l'origine, bornées à 0
+    who, sec = inverse[order], np.maximum(np.floor(t[order]), 0).astype("i8")
+    starts = np.ones(len(sec), dtype=bool)
+    starts[1:] = (who[1:] != who[:-1]) | (sec[1:] - sec[:-1] > gap_seconds)
+    ends = np.roll(starts, -1)
+    seen = np.zeros(len(serials), dtype="i8")
+    np.add.at(seen, who[starts], sec[ends] - sec[starts])  # même convention que seen_seconds()
+    result = {}
+    for serial, f, l, s in zip(serials.tolist(), first.tolist(), last.tolist(), seen.tolist()):
+        present = (l - f) >= min_present_seconds
+        result[serial] = {
+            "first_seen": started + f,
+            "last_seen": started + l,
+            "present": present,
+            "duration": int(s) if present else 0,
+        }
+    return result
+
+
+def _read_details(details_csv: str) -> dict:
+    students = {}
+    if details_csv and os.path.isfile(details_csv):
+        with open(details_csv, newline='') as f:
+            for row in csv.DictReader(f):
+                students[int(row["SERIAL NO."])] = (row["ID"], row["NAME"])
+    return students
+
+
+def main():
+    import argparse
+    import datetime
+
+    parser = argparse.ArgumentParser(
+        description="Réévalue les présences d'après les journaux de reconnaissance (.evlog)."
+    )
+    parser.add_argument("logs", nargs="+", help="fichiers .evlog ou dossiers (Attendance/events)")
+    parser.add_argument("--threshold", default="70", help="seuil(s) de distance LBPH, ex. 60,70,80")
+    parser.add_argument("--min-present", default="10", help="durée(s) minimale(s) en secondes, ex. 5,10")
+    parser.add_argument("--gap", type=float, help="écart fusionné dans les durées (défaut : celui de la session)")
+    parser.add_argument("--details", default="StudentDetails/StudentDetails.csv")
+    parser.add_argument("--list", action="store_true", help="lister les étudiants présents")
+    args = parser.parse_args()
+
+    paths = []
+    for p in args.logs:
+        if os.path.isdir(p):
+            paths.extend(os.path.join(p, f) for f in sorted(os.listdir(p)) if f.endswith(".evlog"))
+        else:
+            paths.append(p)
+    students = _read_details(args.details)
+    thresholds = [float(x) for x in args.threshold.split(",")]
+    minimums = [float(x) for x in args.min_present.split(",")]
+
+    for path in paths:
+        t0 = time.perf_counter()
+        meta, events = read_log(path)
+        load_ms = (time.perf_counter() - t0) * 1000
+        live = evaluate(meta, events, meta.get("threshold", 70), meta.get("min_present_seconds", 10))
+        live_present = {s for s, r in live.items() if r["present"] and (not students or s in students)}
+        print(f"{os.path.basename(path)}: {meta.get('session_name', '')} {meta.get('room', '')} "
+              f"{len(events)} events, read in {load_ms:.1f} ms, live rule: {len(live_present)} present")
+        for threshold in thresholds:
+            for minimum in minimums:
+                t = time.perf_counter()
+                res = evaluate(meta, events, threshold, minimum, gap_seconds=args.gap)
+                elapsed = (time.perf_counter() - t) * 1000
+                present = {s for s, r in res.items() if r["present"] and (not students or s in students)}
+                print(f"  threshold {threshold:>5.1f}  min {minimum:>4.0f}s  present {len(present):>4}"
+                      f"  (+{len(present - live_present)} / -{len(live_present - present)})"
+                      f"  {elapsed:.2f} ms")
+                if args.list:
+                    for s in sorted(present, key=lambda s: res[s]["first_seen"]):
+                        sid, name = students.get(s, (str(s), ""))
+                        first = datetime.datetime.fromtimestamp(res[s]["first_seen"]).strftime("%H:%M:%S")
+                        print(f"    {sid:<10}{name:<20}{first}  {res[s]['duration']}s")
+
+
+if __name__ == "__main__":
+    main()
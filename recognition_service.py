@@ -0,0 +1,258 @@
+import os, json, socket, socketserver, struct, threading, time
+
+from startup_profile import lazy_import
+from face_preprocessing import FacePreprocessor
+from recognition_context import RecognitionContext, configure_lbph
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+# Trame : ">II" (taille de l'en-tête JSON, taille des données binaires), en-tête, données.
+_FRAME = struct.Struct(">II")
+MAX_PAYLOAD = 256 * 1024 * 1024
+
+
+def _recv_exact(sock, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(min(n - len(buf), 1 << 20))
+        if not chunk:
+            raise ConnectionError("connection closed")
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+def send_message(sock, header: dict, payload: bytes = b""):
+    data = json.dumps(header).encode()
+    sock.sendall(_FRAME.pack(len(data), len(payload)) + data + payload)
+
+
+def recv_message(sock):
+    header_len, payload_len = _FRAME.unpack(_recv_exact(sock, _FRAME.size))
+    if header_len > MAX_PAYLOAD or payload_len > MAX_PAYLOAD:
+        raise ValueError("message too large")
+    header = json.loads(_recv_exact(sock, header_len))
+    payload = _recv_exact(sock, payload_len) if payload_len else b""
+    return header, payload
+
+
+def encode_images(images, fmt: str = "raw"):
+    """
+    Sérialise une liste d'images numpy pour une requête : retourne (items, payload).
+    fmt: "raw" (octets bruts) ou "jpg"/"png" (compressé, pour les frames couleur).
+    """
+    items, chunks = [], []
+    for img in images:
+        if fmt == "raw":
+            data = np.ascontiguousarray(img, dtype=np.uint8).tobytes()
+            items.append({"shape": list(img.shape), "nbytes": len(data)})
+        else:
+            ok, enc = cv2.imencode("." + fmt, img)
+            if not ok:
+                raise ValueError("image encoding failed")
+            data = enc.tobytes()
+            items.append({"nbytes": len(data)})
+        chunks.append(data)
+    return items, b"".join(chunks)
+
+
+def decode_images(items, payload: bytes, fmt: str):
+    images, offset = [], 0
+    for item in items:
+        n = int(item["nbytes"])
+        data = payload[offset:offset + n]
+        offset += n
+        if fmt == "raw":
+            images.append(np.frombuffer(data, dtype=np.uint8).reshape(item["shape"]))
+        else:
+            images.append(cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_UNCHANGED))
+    return images
+
+
+class RecognitionEngine:
+    """
+    Modèle chargé une seule fois (RecognitionContext résident) et partagé par tous les clients.
+    recognize(kind, images) accepte des crops de visage ("faces") ou des frames entières
+    ("frames", détection Haarcascade puis reconnaissance de chaque visage).
+    """
+
+    def __init__(self, context: RecognitionContext, preprocessor: FacePreprocessor,
+                 threshold: float = 70):
+        self.context = context
+        self.preprocessor = preprocessor
+        self.threshold = threshold
+        # CascadeClassifier / LBPH ne sont pas garantis thread-safe
+        self._lock = threading.Lock()
+
+    def _identify(self, gray_face):
+        sid, conf = self.context.recognizer.predict(self.preprocessor.prepare(gray_face))
+        student = self.context.lookup(sid) if conf < self.threshold else None
+        if student is None:
+            return {"id": None, "name": "Unknown", "confidence": float(conf)}
+        return {"id": student[0], "name": student[1], "confidence": float(conf)}
+
+    @staticmethod
+    def _gray(img):
+        return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+
+    def recognize(self, kind: str, images):
+        """
+        Retourne (résultats, timing) ; un résultat par image (liste de visages pour "frames").
+        """
+        timing = {"detect_ms": 0.0, "predict_ms": 0.0}
+        results = []
+        with self._lock:
+            self.context.ensure_loaded()
+            for img in images:
+                gray = self._gray(img)
+                if kind == "faces":
+                    t = time.perf_counter()
+                    results.append(self._identify(gray))
+                    timing["predict_ms"] += (time.perf_counter() - t) * 1000
+                    continue
+                t = time.perf_counter()
+                boxes = self.context.detector.detectMultiScale(
+                    gray, scaleFactor=1.1, minNeighbors=6, minSize=(100,100)
+                )
+                timing["detect_ms"] += (time.perf_counter() - t) * 1000
+                faces = []
+                t = time.perf_counter()
+                for (x, y, w, h) in boxes:
+                    res = self._identify(gray[y:y+h, x:x+w])
+                    res["box"] = [int(x), int(y), int(w), int(h)]
+                    faces.append(res)
+                timing["predict_ms"] += (time.perf_counter() - t) * 1000
+                results.append(faces)
+        return results, timing
+
+
+class _Handler(socketserver.BaseRequestHandler):
+
+    def handle(self):
+        engine = self.server.engine
+        while True:
+            try:
+                header, payload = recv_message(self.request)
+            except (ConnectionError, ValueError, struct.error):
+                return
+            t0 = time.perf_counter()
+            try:
+                op = header.get("op")
+                if op == "ping":
+                    response = {"ok": True}
+                elif op == "recognize":
+                    kind = header.get("kind", "faces")
+                    if kind not in ("faces", "frames"):
+                        raise ValueError(f"unknown kind: {kind}")
+                    t = time.perf_counter()
+                    images = decode_images(header["items"], payload, header.get("format", "raw"))
+                    decode_ms = (time.perf_counter() - t) * 1000
+                    results, timing = engine.recognize(kind, images)
+                    timing["decode_ms"] = decode_ms
+                    response = {"ok": True, "results": results, "timing": timing}
+                else:
+                    raise ValueError(f"unknown op: {op}")
+            except Exception as e:
+                response = {"ok": False, "error": str(e)}
+            response.setdefault("timing", {})["total_ms"] = (time.perf_counter() - t0) * 1000
+            send_message(self.request, response)
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+    class _UnixServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+
+
+def make_server(engine: RecognitionEngine, port: int = 8765, unix_path: str = None):
+    """
+    Serveur local : socket UNIX si unix_path est donné, sinon TCP sur 127.0.0.1 uniquement.
+    """
+    if unix_path:
+        if os.path.exists(unix_path):
+            os.remove(unix_path)
+        server = _UnixServer(unix_path, _Handler)
+    else:
+        server = _TCPServer(("127.0.0.1", port), _Handler)
+    server.engine = engine
+    return server
+
+
+class RecognitionClient:
+    """
+    Client du service : une connexion persistante, requêtes par lots.
+    """
+
+    def __init__(self, port: int = 8765, unix_path: str = None, timeout: float = 30.0):
+        if unix_path:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.settimeout(timeout)
+            self.sock.connect(unix_path)
+        else:
+            self.sock = socket.create_connection(("127.0.0.1", port), timeout=timeout)
+
+    def _call(self, header: dict, payload: bytes = b""):
+        send_message(self.sock, header, payload)
+        response, _ = recv_message(self.sock)
+        if not response.get("ok"):
+            raise RuntimeError(response.get("error", "recognition service error"))
+        return response
+
+    def ping(self) -> bool:
+        return self._call({"op": "ping"}).get("ok", False)
+
+    def recognize_faces(self, gray_faces):
+        """
+        Lot de crops de visage en niveaux de gris -> ([{id, name, confidence}], timing).
+        """
+        items, payload = encode_images(gray_faces, "raw")
+        resp = self._call({"op": "recognize", "kind": "faces", "format": "raw", "items": items}, payload)
+        return resp["results"], resp["timing"]
+
+    def recognize_frames(self, frames, fmt: str = "jpg"):
+        """
+        Lot de frames BGR -> ([[{id, name, confidence, box}]], timing).
+        """
+        items, payload = encode_images(frames, fmt)
+        resp = self._call({"op": "recognize", "kind": "frames", "format": fmt, "items": items}, payload)
+        return resp["results"], resp["timing"]
+
+    def close(self):
+        self.sock.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Service local de reconnaissance FaceAttend.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="chemin de socket UNIX (au lieu de TCP localhost)")
+    parser.add_argument("--haar", default="haarcascade_frontalface_default.xml")
+    parser.add_argument("--model", default="TrainingImageLabel/Trainer.yml")
+    parser.add_argument("--details", default="StudentDetails/StudentDetails.csv")
+    parser.add_argument("--config", default="config.json")
+    args = parser.parse_args()
+
+    cfg = {}
+    if os.path.isfile(args.config):
+        with open(args.config) as f:
+            cfg = json.load(f)
+    recognition_cfg = cfg.get("recognition", {})
+    configure_lbph(recognition_cfg)
+    ctx = RecognitionContext(args.haar, args.model, args.details)
+    ctx.ensure_loaded()
+    engine = RecognitionEngine(ctx, FacePreprocessor.from_config(cfg.get("preprocessing")),
+                               threshold=recognition_cfg.get("threshold", 70))
+    server = make_server(engine, args.port, args.unix)
+    where = args.unix or f"127.0.0.1:{args.port}"
+    print(f"FaceAttend recognition service listening on {where}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
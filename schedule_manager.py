@@ -1,5 +1,156 @@
-import pandas as pd
+import csv
 import datetime
+from bisect import bisect_right
+
+from startup_profile import lazy_import
+
+# pandas n'est importé qu'au chargement d'un planning
+pd = lazy_import("pandas")
+
+
+def _to_seconds(t: datetime.time) -> int:
+    return t.hour * 3600 + t.minute * 60 + t.second
+
+
+class ScheduleIndex:
+    """
+    Index compilé du planning : pour chaque jour (0-6) et chaque salle, des tableaux triés
+    de phases [début, fin) en secondes depuis minuit. Une session avec pause est découpée en
+    trois phases : 'ongoing' (avant pause), 'break', 'ongoing' (après pause).
+    Les requêtes (phase courante, prochain début de phase) sont des recherches bisect,
+    sans pandas. Les sessions d'une même salle peuvent se chevaucher (groupes, cours longs) :
+    un tableau des fins maximales cumulées borne le retour en arrière depuis la bisection.
+    """
+
+    def __init__(self, sessions):
+        """
+        sessions: itérable de dicts {Weekday, SessionName, Room, Group,
+                  StartTime, EndTime, BreakStart, BreakEnd} (datetime.time ou None).
+        """
+        # { weekday: { room: (starts, ends, max_ends, phases) } }, max_ends[i] = max(ends[:i+1])
+        self._phases = {d: {} for d in range(7)}
+        # { weekday: [session dicts triés par StartTime] }
+        self._sessions = {d: [] for d in range(7)}
+        # { weekday: (starts triés, phases) } pour les phases 'ongoing', toutes salles confondues
+        self._ongoing_starts = {}
+        # { weekday: { room: (starts triés, phases) } } pour les phases 'ongoing' d'une salle
+        self._room_ongoing_starts = {d: {} for d in range(7)}
+
+        by_room = {d: {} for d in range(7)}
+        for order, sess in enumerate(sessions):
+            wd = sess['Weekday']
+            if wd is None:
+                continue
+            self._sessions[wd].append(sess)
+            st, et = sess['StartTime'], sess['EndTime']
+            if st is None or et is None:
+                continue
+            bs, be = sess.get('BreakStart'), sess.get('BreakEnd')
+            room_phases = by_room[wd].setdefault(sess.get('Room', ''), [])
+            if bs and be:
+                room_phases.append(self._phase('ongoing', sess, st, bs, order))
+                room_phases.append(self._phase('break', sess, bs, be, order))
+                room_phases.append(self._phase('ongoing', sess, be, et, order))
+            else:
+                room_phases.append(self._phase('ongoing', sess, st, et, order))
+
+        for wd in range(7):
+            self._sessions[wd].sort(key=lambda s: (s['StartTime'] or datetime.time(0, 0)))
+            all_ongoing = []
+            for room, phases in by_room[wd].items():
+                phases = [p for p in phases if p['end_s'] > p['start_s']]
+                phases.sort(key=lambda p: p['start_s'])
+                max_ends, running = [], 0
+                for p in phases:
+                    running = max(running, p['end_s'])
+                    max_ends.append(running)
+                self._phases[wd][room] = (
+                    [p['start_s'] for p in phases],
+                    [p['end_s'] for p in phases],
+                    max_ends,
+                    phases
+                )
+                ongoing = [p for p in phases if p['status'] == 'ongoing']
+                self._room_ongoing_starts[wd][room] = ([p['start_s'] for p in ongoing], ongoing)
+                all_ongoing.extend(ongoing)
+            all_ongoing.sort(key=lambda p: p['start_s'])
+            self._ongoing_starts[wd] = ([p['start_s'] for p in all_ongoing], all_ongoing)
+
+    @staticmethod
+    def _phase(status, sess, start, end, order):
+        return {
+            'status': status,
+            'session': sess,
+            'order': order,  # rang de la ligne dans le CSV
+            'start': start,
+            'end': end,
+            'start_s': _to_seconds(start),
+            'end_s': _to_seconds(end)
+        }
+
+    def rooms(self, weekday: int):
+        return list(self._phases[weekday].keys())
+
+    def all_rooms(self):
+        rooms = set()
+        for wd in range(7):
+            rooms.update(self._phases[wd].keys())
+        return sorted(rooms)
+
+    def sessions_for(self, weekday: int):
+        return list(self._sessions[weekday])
+
+    def phases_for(self, weekday: int, room: str = None):
+        """
+        Retourne les phases du jour (triées par début) pour une salle, ou toutes salles.
+        """
+        if room is not None:
+            entry = self._phases[weekday].get(room)
+            return list(entry[3]) if entry else []
+        phases = []
+        for _, _, _, room_phases in self._phases[weekday].values():
+            phases.extend(room_phases)
+        phases.sort(key=lambda p: p['start_s'])
+        return phases
+
+    def phase_at(self, weekday: int, seconds: int, room: str = None):
+        """
+        Retourne la phase contenant `seconds` (ou None). Si plusieurs sessions se
+        chevauchent (dans une salle, ou entre salles si room est None), celle qui vient
+        en premier dans le CSV l'emporte, comme avant la compilation du planning.
+        """
+        rooms = [room] if room is not None else self._phases[weekday].keys()
+        best = None
+        for r in rooms:
+            entry = self._phases[weekday].get(r)
+            if not entry:
+                continue
+            starts, ends, max_ends, phases = entry
+            i = bisect_right(starts, seconds) - 1
+            # Aucune phase avant i ne se termine après `seconds` dès que max_ends[i] <= seconds
+            while i >= 0 and max_ends[i] > seconds:
+                if seconds < ends[i] and (best is None or phases[i]['order'] < best['order']):
+                    best = phases[i]
+                i -= 1
+        return best
+
+    def next_ongoing_start(self, now: datetime.datetime, room: str = None, max_days: int = 7):
+        """
+        Retourne (datetime, phase) du prochain début de phase 'ongoing' strictement
+        après `now`, en cherchant jusqu'à max_days jours plus loin. (None, None) sinon.
+        """
+        seconds = _to_seconds(now.time())
+        for day_offset in range(max_days + 1):
+            day = now.date() + datetime.timedelta(days=day_offset)
+            if room is None:
+                starts, phases = self._ongoing_starts[day.weekday()]
+            else:
+                starts, phases = self._room_ongoing_starts[day.weekday()].get(room, ([], []))
+            i = bisect_right(starts, seconds) if day_offset == 0 else 0
+            if i < len(phases):
+                return datetime.datetime.combine(day, phases[i]['start']), phases[i]
+        return None, None
+
 
 class ScheduleManager:
     """
@@ -8,6 +159,9 @@ class ScheduleManager:
       - Day: weekday name (Monday, Tuesday, ...) ou chiffre 0 (Monday) à 6 (Sunday).
       - StartTime/EndTime: "HH:MM" 24h.
       - BreakStart/BreakEnd: facultatif, "HH:MM" ou vide.
+      - Room/Group: facultatif, pour les plannings multi-salles / multi-groupes.
+    Au chargement, le planning est compilé en ScheduleIndex ; les requêtes n'utilisent plus pandas.
+    Des rosters (CSV SessionName,ID) peuvent être rattachés aux sessions via load_rosters().
     """
 
     WEEKDAY_NAME_TO_INT = {
@@ -17,6 +171,8 @@ class ScheduleManager:
 
     def __init__(self):
         self.df = None  # DataFrame pandas chargé
+        self.index = None  # ScheduleIndex compilé depuis df
+        self.rosters = {}  # { SessionName: set(ID) }
 
     def load_from_csv(self, csv_path: str):
         """
@@ -69,8 +225,58 @@ class ScheduleManager:
             df['BreakStart_obj'] = None
             df['BreakEnd_obj'] = None
 
+        self.index = self._compile(df)
         self.df = df
 
+    @staticmethod
+    def _compile(df) -> ScheduleIndex:
+        """
+        Compile le DataFrame en ScheduleIndex (une seule passe, au chargement).
+        """
+        def opt_str(val):
+            return '' if pd.isna(val) else str(val).strip()
+
+        def opt_time(val):
+            return val if isinstance(val, datetime.time) else None
+
+        sessions = []
+        for row in df.to_dict('records'):
+            wd = row['Weekday']
+            sessions.append({
+                'Weekday': None if pd.isna(wd) else int(wd),
+                'SessionName': opt_str(row.get('SessionName')),
+                'Room': opt_str(row.get('Room')),
+                'Group': opt_str(row.get('Group')),
+                'StartTime': opt_time(row['StartTime_obj']),
+                'EndTime': opt_time(row['EndTime_obj']),
+                'BreakStart': opt_time(row['BreakStart_obj']),
+                'BreakEnd': opt_time(row['BreakEnd_obj'])
+            })
+        return ScheduleIndex(sessions)
+
+    def load_rosters(self, csv_path: str):
+        """
+        Charge les inscriptions par cours. CSV attendu : colonnes SessionName, ID
+        (une ligne par étudiant inscrit). Lève ValueError si format incorrect.
+        """
+        rosters = {}
+        with open(csv_path, newline='') as f:
+            reader = csv.DictReader(f)
+            fields = {c.strip() for c in (reader.fieldnames or [])}
+            if not {'SessionName', 'ID'}.issubset(fields):
+                raise ValueError("Roster CSV must contain columns: {'SessionName', 'ID'}")
+            for row in reader:
+                row = {k.strip(): (v or '').strip() for k, v in row.items() if k}
+                if row['SessionName'] and row['ID']:
+                    rosters.setdefault(row['SessionName'], set()).add(row['ID'])
+        self.rosters = rosters
+
+    def get_roster(self, session_name: str):
+        """
+        Retourne l'ensemble des ID inscrits à `session_name`, ou None si pas de roster.
+        """
+        return self.rosters.get(session_name)
+
     def get_today_sessions(self):
         """
         Retourne une liste de dicts pour les sessions d'aujourd'hui,
@@ -84,80 +290,68 @@ class ScheduleManager:
             'BreakEnd': datetime.time or None
           }
         """
-        if self.df is None:
+        if self.index is None:
             return []
         today_weekday = datetime.date.today().weekday()
-        df_today = self.df[self.df['Weekday'] == today_weekday]
-        sessions = []
-        for _, row in df_today.iterrows():
-            sessions.append({
-                'SessionName': str(row.get('SessionName','')).strip(),
-                'StartTime': row['StartTime_obj'],
-                'EndTime': row['EndTime_obj'],
-                'BreakStart': row.get('BreakStart_obj'),
-                'BreakEnd': row.get('BreakEnd_obj')
-            })
-        sessions.sort(key=lambda s: (s['StartTime'] or datetime.time(0,0)))
-        return sessions
+        return [
+            {
+                'SessionName': sess['SessionName'],
+                'StartTime': sess['StartTime'],
+                'EndTime': sess['EndTime'],
+                'BreakStart': sess['BreakStart'],
+                'BreakEnd': sess['BreakEnd']
+            }
+            for sess in self.index.sessions_for(today_weekday)
+        ]
 
-    def get_current_session(self, now: datetime.datetime=None):
+    def get_current_session(self, now: datetime.datetime=None, room: str=None):
         """
         Si l'heure courante est dans une session (hors pause), retourne un dict:
           { 'status':'ongoing', 'SessionName':..., 'PhaseEnd':..., 'ResumeTime':... }
         Si dans la pause, retourne:
           { 'status':'break', 'SessionName':..., 'BreakStart':..., 'BreakEnd':..., 'ResumeTime':... }
-        Sinon retourne None.
+        Sinon retourne None. `room` restreint la recherche à une salle.
         """
-        if self.df is None:
+        if self.index is None:
             return None
         if now is None:
             now = datetime.datetime.now()
-        today_weekday = now.date().weekday()
-        current_time = now.time()
-        df_today = self.df[self.df['Weekday'] == today_weekday]
-        for _, row in df_today.iterrows():
-            st = row['StartTime_obj']
-            et = row['EndTime_obj']
-            if st is None or et is None:
-                continue
-            # Si hors intervalle total, sauter
-            if current_time < st or current_time >= et:
-                continue
-            bs = row.get('BreakStart_obj')
-            be = row.get('BreakEnd_obj')
-            # Si pause définie et on est dans la pause
-            if bs and be and bs <= current_time < be:
-                return {
-                    'status': 'break',
-                    'SessionName': str(row.get('SessionName','')).strip(),
-                    'BreakStart': bs,
-                    'BreakEnd': be,
-                    'ResumeTime': be
-                }
-            # Si hors pause
-            if bs and be:
-                # Avant la pause
-                if st <= current_time < bs:
-                    return {
-                        'status': 'ongoing',
-                        'SessionName': str(row.get('SessionName','')).strip(),
-                        'PhaseEnd': bs
-                    }
-                # Après la pause
-                if be <= current_time < et:
-                    return {
-                        'status': 'ongoing',
-                        'SessionName': str(row.get('SessionName','')).strip(),
-                        'PhaseEnd': et
-                    }
-            else:
-                # Pas de pause, et dans [st,et)
-                return {
-                    'status': 'ongoing',
-                    'SessionName': str(row.get('SessionName','')).strip(),
-                    'PhaseEnd': et
-                }
-        return None
+        phase = self.index.phase_at(now.date().weekday(), _to_seconds(now.time()), room)
+        if phase is None:
+            return None
+        sess = phase['session']
+        if phase['status'] == 'break':
+            return {
+                'status': 'break',
+                'SessionName': sess['SessionName'],
+                'Room': sess['Room'],
+                'StartTime': sess['StartTime'],
+                'BreakStart': phase['start'],
+                'BreakEnd': phase['end'],
+                'ResumeTime': phase['end']
+            }
+        return {
+            'status': 'ongoing',
+            'SessionName': sess['SessionName'],
+            'Room': sess['Room'],
+            'StartTime': sess['StartTime'],
+            'PhaseEnd': phase['end']
+        }
+
+    def get_next_phase_start(self, now: datetime.datetime=None, room: str=None):
+        """
+        Retourne (datetime, SessionName) du prochain début de phase de cours
+        (début de session ou reprise après pause) dans les 7 prochains jours,
+        ou (None, None) si le planning est vide.
+        """
+        if self.index is None:
+            return None, None
+        if now is None:
+            now = datetime.datetime.now()
+        dt, phase = self.index.next_ongoing_start(now, room)
+        if dt is None:
+            return None, None
+        return dt, phase['session']['SessionName']
 
     def time_until(self, future_time: datetime.time, now: datetime.datetime=None):
         """
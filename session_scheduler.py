@@ -0,0 +1,267 @@
+import datetime
+import heapq
+import itertools
+import threading
+
+
+class SystemClock:
+    """
+    Horloge réelle (datetime.now).
+    """
+
+    def now(self) -> datetime.datetime:
+        return datetime.datetime.now()
+
+
+class SimulatedClock:
+    """
+    Horloge simulée : le temps n'avance que via set()/advance().
+    Permet de rejouer une semaine de planning en quelques secondes.
+    """
+
+    def __init__(self, start: datetime.datetime):
+        self._now = start
+
+    def now(self) -> datetime.datetime:
+        return self._now
+
+    def set(self, when: datetime.datetime):
+        if when > self._now:
+            self._now = when
+
+    def advance(self, seconds: float):
+        self._now += datetime.timedelta(seconds=seconds)
+
+
+class SessionScheduler:
+    """
+    Planificateur multi-salles basé sur un tas d'événements (heapq).
+      - Un événement 'start' ou 'stop' par phase de cours, indexé par salle (= caméra).
+      - Lancement dédupliqué : une seule prise d'appel active par salle, que le départ
+        soit manuel (launch) ou automatique.
+      - Indépendant de Tk : l'appelant pompe run_pending() et se réveille à next_event_time().
+
+    launcher(room, session_name, end_dt, stop_event) doit démarrer la prise d'appel et
+    retourner un objet avec is_alive() (ex. threading.Thread), ou None en cas d'échec.
+    La prise d'appel doit s'arrêter quand stop_event est positionné.
+    """
+
+    MIN_PHASE_SECONDS = 10  # en dessous, on ne lance pas de prise d'appel
+
+    def __init__(self, schedule_mgr, launcher, clock=None):
+        self.schedule_mgr = schedule_mgr
+        self.launcher = launcher
+        self.clock = clock or SystemClock()
+        self._heap = []
+        self._seq = itertools.count()
+        self._generation = 0
+        self._active = {}  # { room: (session_name, end_dt, handle, stop_event) }
+        self._lock = threading.RLock()
+        self.history = []  # [(datetime, kind, room, session_name)]
+        self.duplicates_skipped = 0
+
+    # --- Gestion du tas ---------------------------------------------------
+
+    def _push(self, when, kind, room):
+        # À date égale, les 'stop' passent avant les 'start' (phases enchaînées)
+        priority = 0 if kind == 'stop' else 1
+        heapq.heappush(self._heap, (when, priority, next(self._seq), self._generation, kind, room))
+
+    def _push_next_start(self, room, after: datetime.datetime):
+        dt, _ = self.schedule_mgr.get_next_phase_start(after, room)
+        if dt is not None:
+            self._push(dt, 'start', room)
+
+    def reload(self):
+        """
+        (Re)construit le tas à partir du planning courant. Les événements déjà
+        en file sont invalidés ; les prises d'appel en cours ne sont pas coupées.
+        """
+        with self._lock:
+            self._generation += 1
+            self._heap = []
+            index = self.schedule_mgr.index
+            if index is None:
+                return
+            now = self.clock.now()
+            for room in index.all_rooms():
+                sess = self.schedule_mgr.get_current_session(now, room)
+                if sess and sess['status'] == 'ongoing':
+                    self._push(now, 'start', room)
+                else:
+                    self._push_next_start(room, now)
+
+    def next_event_time(self):
+        """
+        Date du prochain événement en file, ou None.
+        """
+        with self._lock:
+            while self._heap and self._heap[0][3] != self._generation:
+                heapq.heappop(self._heap)
+            return self._heap[0][0] if self._heap else None
+
+    def run_pending(self):
+        """
+        Traite tous les événements échus à clock.now(). Retourne le nombre traité.
+        """
+        processed = 0
+        with self._lock:
+            now = self.clock.now()
+            while self._heap and self._heap[0][0] <= now:
+                when, _, _, gen, kind, room = heapq.heappop(self._heap)
+                if gen != self._generation:
+                    continue
+                if kind == 'start':
+                    self._on_start(room, when)
+                else:
+                    self._on_stop(room, when)
+                processed += 1
+        return processed
+
+    # --- Événements -------------------------------------------------------
+
+    def _on_start(self, room, when):
+        sess = self.schedule_mgr.get_current_session(when, room)
+        if sess is None or sess['status'] != 'ongoing':
+            self._push_next_start(room, when)
+            return
+        end_dt = datetime.datetime.combine(when.date(), sess['PhaseEnd'])
+        # Réexaminer la salle à la fin de la phase (traité après le 'stop') : une session
+        # qui chevauche celle-ci y prend le relais, sinon on attend le départ suivant.
+        self._push(end_dt, 'start', room)
+        if self.launch(room, sess['SessionName'], end_dt):
+            self._push(end_dt, 'stop', room)
+
+    def _on_stop(self, room, when):
+        active = self._active.get(room)
+        if active is None:
+            return
+        session_name, end_dt, _, stop_event = active
+        if end_dt > when:
+            # Une nouvelle phase a été lancée entre-temps dans cette salle
+            return
+        stop_event.set()
+        del self._active[room]
+        self.history.append((when, 'stop', room, session_name))
+
+    # --- API publique -----------------------------------------------------
+
+    def is_active(self, room) -> bool:
+        with self._lock:
+            active = self._active.get(room)
+            if active is None:
+                return False
+            handle = active[2]
+            if handle is not None and hasattr(handle, "is_alive") and not handle.is_alive():
+                del self._active[room]
+                return False
+            return True
+
+    def active_rooms(self):
+        with self._lock:
+            return [room for room in list(self._active) if self.is_active(room)]
+
+    def launch(self, room, session_name, end_dt) -> bool:
+        """
+        Lance une prise d'appel pour `room` jusqu'à end_dt, sauf si une autre est déjà
+        active dans cette salle. Sert aussi pour les départs manuels.
+        """
+        with self._lock:
+            now = self.clock.now()
+            if (end_dt - now).total_seconds() < self.MIN_PHASE_SECONDS:
+                return False
+            if self.is_active(room):
+                self.duplicates_skipped += 1
+                return False
+            stop_event = threading.Event()
+            handle = self.launcher(room, session_name, end_dt, stop_event)
+            if handle is None:
+                return False
+            self._active[room] = (session_name, end_dt, handle, stop_event)
+            self.history.append((now, 'start', room, session_name))
+            return True
+
+    def stop_room(self, room) -> bool:
+        """
+        Arrête la prise d'appel active d'une salle sans toucher à la file d'événements.
+        """
+        with self._lock:
+            active = self._active.pop(room, None)
+            if active is None:
+                return False
+            active[3].set()
+            self.history.append((self.clock.now(), 'stop', room, active[0]))
+            return True
+
+    def stop_all(self):
+        """
+        Arrête toutes les prises d'appel actives et vide la file.
+        """
+        with self._lock:
+            self._generation += 1
+            self._heap = []
+            for room, (session_name, _, _, stop_event) in list(self._active.items()):
+                stop_event.set()
+                self.history.append((self.clock.now(), 'stop', room, session_name))
+            self._active.clear()
+
+    def replay(self, until: datetime.datetime):
+        """
+        Mode simulé : avance l'horloge d'événement en événement jusqu'à `until`
+        et retourne l'historique. Nécessite un SimulatedClock.
+        """
+        if not isinstance(self.clock, SimulatedClock):
+            raise ValueError("replay() requires a SimulatedClock")
+        while True:
+            nxt = self.next_event_time()
+            if nxt is None or nxt > until:
+                break
+            self.clock.set(nxt)
+            self.run_pending()
+        self.clock.set(until)
+        return list(self.history)
+
+
+class _SimulatedRun:
+    """
+    Poignée factice utilisée par la relecture simulée : active jusqu'au stop.
+    """
+
+    def __init__(self, stop_event):
+        self._stop_event = stop_event
+
+    def is_alive(self):
+        return not self._stop_event.is_set()
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    from schedule_manager import ScheduleManager
+
+    parser = argparse.ArgumentParser(description="Rejoue un planning avec une horloge simulée.")
+    parser.add_argument("schedule_csv")
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--start", help="YYYY-MM-DD (défaut : lundi de cette semaine)")
+    args = parser.parse_args()
+
+    mgr = ScheduleManager()
+    mgr.load_from_csv(args.schedule_csv)
+    if args.start:
+        start = datetime.datetime.strptime(args.start, "%Y-%m-%d")
+    else:
+        today = datetime.date.today()
+        start = datetime.datetime.combine(today - datetime.timedelta(days=today.weekday()), datetime.time(0, 0))
+
+    clock = SimulatedClock(start)
+    scheduler = SessionScheduler(
+        mgr, lambda room, name, end_dt, stop_event: _SimulatedRun(stop_event), clock=clock
+    )
+    t0 = time.perf_counter()
+    scheduler.reload()
+    history = scheduler.replay(start + datetime.timedelta(days=args.days))
+    elapsed = time.perf_counter() - t0
+    for when, kind, room, name in history:
+        print(f"{when:%a %Y-%m-%d %H:%M}  {kind:<5}  {room or '-':<8}  {name}")
+    print(f"{len(history)} events replayed in {elapsed*1000:.1f} ms "
+          f"({scheduler.duplicates_skipped} duplicate launches skipped)")
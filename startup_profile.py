@@ -0,0 +1,91 @@
+import importlib
+import sys
+import threading
+import time
+
+# Référence de temps : import de ce module (au tout début de main.py)
+_T0 = time.perf_counter()
+_lock = threading.Lock()
+_imports = []     # [(module_name, seconds, offset_since_start, lazy)]
+_milestones = []  # [(label, offset_since_start)]
+
+
+class _LazyModule:
+    """
+    Proxy de module : l'import réel n'a lieu qu'au premier accès à un attribut.
+    Le coût de l'import est enregistré pour le rapport de démarrage.
+    """
+
+    def __init__(self, name: str):
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_module", None)
+
+    def _load(self):
+        module = self._module
+        if module is None:
+            with _lock:
+                module = self._module
+                if module is None:
+                    already = self._name in sys.modules
+                    t = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    if not already:
+                        _imports.append((self._name, time.perf_counter() - t, t - _T0, True))
+                    object.__setattr__(self, "_module", module)
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name: str):
+    """
+    Retourne un proxy pour `name` (ex. cv2 = lazy_import("cv2")).
+    Si le module est déjà importé, le retourne directement.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    return _LazyModule(name)
+
+
+def timed_import(name: str):
+    """
+    Import immédiat d'un module, chronométré pour le rapport.
+    """
+    t = time.perf_counter()
+    module = importlib.import_module(name)
+    _imports.append((name, time.perf_counter() - t, t - _T0, False))
+    return module
+
+
+def mark(label: str) -> float:
+    """
+    Enregistre un jalon (ex. "login_visible") et retourne le temps écoulé depuis le démarrage.
+    """
+    offset = time.perf_counter() - _T0
+    _milestones.append((label, offset))
+    return offset
+
+
+def elapsed() -> float:
+    return time.perf_counter() - _T0
+
+
+def report() -> str:
+    """
+    Rapport texte : coût de chaque import (eager/lazy) et jalons de démarrage.
+    """
+    lines = ["Startup report", "--------------"]
+    lines.append(f"{'module':<28}{'mode':<7}{'cost (ms)':>10}{'at (ms)':>10}")
+    for name, secs, offset, lazy in sorted(_imports, key=lambda r: r[2]):
+        mode = "lazy" if lazy else "eager"
+        lines.append(f"{name:<28}{mode:<7}{secs*1000:>10.1f}{offset*1000:>10.1f}")
+    if _milestones:
+        lines.append("")
+        for label, offset in _milestones:
+            lines.append(f"{label:<35}{offset*1000:>10.1f} ms")
+    return "\n".join(lines)
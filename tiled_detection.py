@@ -0,0 +1,121 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from startup_profile import lazy_import
+
+cv2 = lazy_import("cv2")
+
+
+def merge_boxes(boxes, overlap: float = 0.5):
+    """
+    Fusionne les doublons aux jointures des tuiles : parmi deux boîtes dont
+    l'intersection couvre plus de `overlap` de la plus petite, seule la plus grande
+    est gardée (une tuile voisine ne voit souvent qu'une partie du visage).
+    """
+    kept = []
+    for box in sorted(boxes, key=lambda b: b[2] * b[3], reverse=True):
+        x, y, w, h = box
+        duplicate = False
+        for kx, ky, kw, kh in kept:
+            iw = min(x + w, kx + kw) - max(x, kx)
+            ih = min(y + h, ky + kh) - max(y, ky)
+            if iw > 0 and ih > 0 and iw * ih > overlap * min(w * h, kw * kh):
+                duplicate = True
+                break
+        if not duplicate:
+            kept.append(box)
+    return kept
+
+
+class TiledDetector:
+    """
+    Détection Haarcascade par tuiles pour les grandes salles (caméras haute résolution).
+    La frame est découpée en rows x cols tuiles qui se chevauchent ; chaque rangée a sa
+    propre plage de tailles de visage (min_sizes, du fond de la salle vers la caméra :
+    petits visages en haut de l'image, grands en bas). Les tuiles sont détectées en
+    parallèle (OpenCV relâche le GIL ; un CascadeClassifier par thread), puis les
+    doublons aux jointures sont fusionnés.
+    Configuration par salle dans config.json :
+      "rooms": {"Amphi A": {"camera": 2, "tiled_detection":
+                {"rows": 3, "cols": 4, "min_sizes": [24, 40, 64], "overlap": 0.25}}}
+    """
+
+    def __init__(self, haar_path: str, rows: int = 2, cols: int = 3, min_sizes=None,
+                 max_scale: float = 4.0, overlap: float = 0.25, scale_factor: float = 1.1,
+                 min_neighbors: int = 6, workers: int = None):
+        self.haar_path = haar_path
+        self.rows = max(1, int(rows))
+        self.cols = max(1, int(cols))
+        # Taille minimale par rangée ; une seule valeur s'applique à toutes les rangées
+        sizes = list(min_sizes or [100])
+        self.min_sizes = [int(sizes[min(r, len(sizes) - 1)]) for r in range(self.rows)]
+        self.max_scale = max_scale
+        self.overlap = overlap
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.workers = workers or min(self.rows * self.cols, os.cpu_count() or 1)
+        self._local = threading.local()
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="tile")
+        self._tiles_for = {}  # { (h, w): [(x0, y0, x1, y1, min_size, max_size)] }
+
+    @classmethod
+    def from_config(cls, haar_path: str, cfg: dict):
+        keys = ("rows", "cols", "min_sizes", "max_scale", "overlap",
+                "scale_factor", "min_neighbors", "workers")
+        return cls(haar_path, **{k: cfg[k] for k in keys if k in cfg})
+
+    def _classifier(self):
+        # CascadeClassifier n'est pas garanti thread-safe : un par thread du pool
+        clf = getattr(self._local, "classifier", None)
+        if clf is None:
+            clf = cv2.CascadeClassifier(self.haar_path)
+            self._local.classifier = clf
+        return clf
+
+    def tiles(self, height: int, width: int):
+        """
+        Tuiles (x0, y0, x1, y1, min_size, max_size) pour une frame de cette taille.
+        Le chevauchement d'une rangée couvre au moins son plus grand visage, pour
+        qu'aucun visage ne soit coupé sur toutes les tuiles.
+        """
+        key = (height, width)
+        if key not in self._tiles_for:
+            tile_h, tile_w = height / self.rows, width / self.cols
+            tiles = []
+            for r in range(self.rows):
+                min_size = self.min_sizes[r]
+                max_size = int(min_size * self.max_scale)
+                pad_y = max(int(tile_h * self.overlap / 2), max_size // 2)
+                pad_x = max(int(tile_w * self.overlap / 2), max_size // 2)
+                for c in range(self.cols):
+                    x0 = max(0, int(c * tile_w) - pad_x)
+                    y0 = max(0, int(r * tile_h) - pad_y)
+                    x1 = min(width, int((c + 1) * tile_w) + pad_x)
+                    y1 = min(height, int((r + 1) * tile_h) + pad_y)
+                    tiles.append((x0, y0, x1, y1, min_size, max_size))
+            self._tiles_for[key] = tiles
+        return self._tiles_for[key]
+
+    def _detect_tile(self, gray, tile):
+        x0, y0, x1, y1, min_size, max_size = tile
+        found = self._classifier().detectMultiScale(
+            gray[y0:y1, x0:x1], scaleFactor=self.scale_factor, minNeighbors=self.min_neighbors,
+            minSize=(min_size, min_size), maxSize=(max_size, max_size)
+        )
+        return [(int(x) + x0, int(y) + y0, int(w), int(h)) for (x, y, w, h) in found]
+
+    def detectMultiScale(self, gray, **_ignored):
+        """
+        Même usage que CascadeClassifier.detectMultiScale : liste de (x, y, w, h)
+        en coordonnées de la frame complète. Les paramètres d'appel sont ignorés
+        (ceux de la configuration par rangée s'appliquent).
+        """
+        h, w = gray.shape[:2]
+        boxes = []
+        for found in self._pool.map(lambda t: self._detect_tile(gray, t), self.tiles(h, w)):
+            boxes.extend(found)
+        return merge_boxes(boxes)
+
+    def close(self):
+        self._pool.shutdown(wait=False)
@@ -0,0 +1,93 @@
+import os
+import threading
+
+import diagnostics
+from face_trainer import FaceTrainer, TrainingCancelled
+from recognition_context import RecognitionContext
+from ui_bridge import UIUpdateQueue
+
+
+class TrainingJob:
+    """
+    Entraînement LBPH en arrière-plan : le thread Tk n'est jamais bloqué.
+    Progression, fin et erreurs passent par la UIUpdateQueue ; cancel() interrompt
+    l'entraînement entre deux lots (l'ancien Trainer.yml reste en place).
+    Le nouveau modèle est écrit de façon atomique puis chargé dans le RecognitionContext
+    résident : les recorders actifs basculent dessus à la frame suivante, sans
+    fermer la caméra ni perdre les présences en cours.
+    start(migrate=True) ramène d'abord TrainingImage/ à la taille canonique
+    (FaceTrainer.migrate_training_images), dans le même thread, avant de réentraîner.
+    """
+
+    def __init__(self, trainer: FaceTrainer, model_path: str, ui: UIUpdateQueue,
+                 context: RecognitionContext = None):
+        self.trainer = trainer
+        self.model_path = model_path
+        self.ui = ui
+        self.context = context
+        self._thread = None
+        self._cancel = threading.Event()
+        self._migrate = False
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, migrate: bool = False) -> bool:
+        """
+        Lance l'entraînement, précédé de la migration des images si `migrate` ;
+        retourne False si un entraînement est déjà en cours.
+        """
+        if self.is_running():
+            return False
+        self._cancel.clear()
+        self._migrate = migrate
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return True
+
+    def cancel(self):
+        self._cancel.set()
+
+    def _progress(self, done: int, total: int):
+        pct = f" ({done * 100 // total}%)" if total else ""
+        self.ui.status(f"Training... {done}/{total} images{pct}", "black")
+
+    def _migrate_progress(self, done: int, total: int):
+        self.ui.status(f"Migrating training images... {done}/{total}", "black")
+
+    def _run(self):
+        stats = None
+        prof = diagnostics.start("train")
+        try:
+            if not os.path.isfile(self.trainer.haar_path):
+                self.ui.error("Missing File", f"{self.trainer.haar_path} not found. Please place the XML in the folder.")
+                return
+            if self._migrate:
+                self.ui.status("Migrating training images...", "black")
+                migrated = self.trainer.migrate_training_images(
+                    progress=self._migrate_progress, cancel_event=self._cancel
+                )
+                self.ui.status(f"Migrated {migrated} images, retraining...", "black")
+            else:
+                self.ui.status("Training...", "black")
+            stats = self.trainer.build_model(
+                self.model_path, progress=self._progress, cancel_event=self._cancel, prof=prof
+            )
+            if self.context is not None:
+                # Charger ici (hors thread d'enregistrement) le modèle que les recorders vont adopter
+                try:
+                    self.context.ensure_loaded()
+                except Exception:
+                    pass
+            self.ui.status(FaceTrainer.training_summary(stats), "green")
+        except TrainingCancelled:
+            self.ui.status("Training cancelled, previous model kept", "black")
+        except RuntimeError as e:
+            self.ui.error("Error", str(e))
+        except ValueError:
+            self.ui.error("No Data", "No images to train. Please register first.")
+        except Exception as e:
+            self.ui.error("Error", f"Training failed: {e}")
+        finally:
+            prof.finish()
+            self.ui.training_done(stats)
@@ -0,0 +1,61 @@
+import queue
+import tkinter as tk
+
+
+class UIUpdateQueue:
+    """
+    File thread-safe pour le trafic recorder -> interface.
+    Les threads de prise d'appel n'appellent jamais Tk directement : ils postent des
+    événements ici, et le mainloop Tk les vide par lots via after() (voir drain()).
+    Événements : ('clear', None), ('mark', (id, name, time)), ('status', (text, fg)),
+    ('error', (title, message)), ('train_done', stats | None).
+    """
+
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+
+    def post(self, kind: str, payload=None):
+        self._queue.put((kind, payload))
+
+    def clear_attendance(self):
+        self.post('clear')
+
+    def add_mark(self, id_str: str, name_str: str, tstamp: str):
+        self.post('mark', (id_str, name_str, tstamp))
+
+    def status(self, text: str, fg: str = "black"):
+        self.post('status', (text, fg))
+
+    def error(self, title: str, message: str):
+        self.post('error', (title, message))
+
+    def training_done(self, stats=None):
+        self.post('train_done', stats)
+
+    def drain(self, max_items: int = 500):
+        """
+        Retire jusqu'à max_items événements (à appeler depuis le thread Tk).
+        """
+        events = []
+        try:
+            while len(events) < max_items:
+                events.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return events
+
+
+def busy_label(label, widgets, text: str):
+    """
+    Fabrique un callback busy(on) pour les travaux en arrière-plan (ex. PasswordManager.run_async) :
+    affiche `text` dans `label` et désactive `widgets` pendant le travail.
+    Sans effet si la fenêtre a été fermée entre-temps.
+    """
+    def busy(on):
+        try:
+            label.config(text=text if on else "")
+            for w in widgets:
+                w.config(state="disabled" if on else "normal")
+        except tk.TclError:
+            pass
+    return busy